@@ -1,24 +1,76 @@
 import json
-from typing import List
-from pydantic import BaseModel, Field
+import asyncio
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field, ValidationError
 from models import Task, ProgramRequirements
+from utils.batching import MicroBatcher
 from utils.gemini_client import GeminiClient
+from utils.process_pool import get_process_pool
+from utils.validation_rules import DEFAULT_RULES, Rule, RuleFinding, ValidationContext, run_rules
 
 class ValidationSchema(BaseModel):
     warnings: List[str] = Field(description="List of potential issues or warnings")
 
+class IndexedValidationSchema(ValidationSchema):
+    program_index: int = Field(description="Index of the program in the input list")
+
+class ValidationBatchSchema(BaseModel):
+    programs: List[IndexedValidationSchema]
+
+# (tasks, requirements, rule findings) for one program
+ReviewItem = Tuple[List[Task], ProgramRequirements, List[RuleFinding]]
+
 class ChecklistValidatorAgent:
-    def __init__(self, client: GeminiClient):
+    # Response cache TTL (seconds). Validation depends only on the timeline and requirements passed in.
+    CACHE_TTL = 24 * 3600
+
+    # Max programs sent in one batched request
+    MAX_BATCH = 5
+
+    def __init__(self, client: GeminiClient, rules: Optional[List[Rule]] = None, batch_window: float = 0):
         self.client = client
+        # Checks run locally on every call; Gemini is only asked about findings a rule marks ambiguous
+        self.rules = list(DEFAULT_RULES) if rules is None else rules
+        # With a batch window, concurrent reviews that do need Gemini are collected into one request
+        self.batcher = MicroBatcher(self._areview_batch, window=batch_window, max_batch=self.MAX_BATCH) if batch_window > 0 else None
 
-    def validate(self, tasks: List[Task], requirements: ProgramRequirements) -> List[str]:
-        """
-        Reviews the generated tasks against requirements to find gaps or issues.
-        """
-        prompt = f"""
+    def _run_rules(self, tasks: List[Task], requirements: ProgramRequirements,
+                   deadline: Optional[date]) -> List[RuleFinding]:
+        try:
+            return run_rules(ValidationContext(tasks, requirements, deadline), self.rules)
+        except Exception as e:
+            print(f"Error running validation rules: {e}")
+            return [RuleFinding("", ambiguous=True, detail="Automatic checks failed; review the whole timeline")]
+
+    def _build_prompt(self, tasks: List[Task], requirements: ProgramRequirements,
+                      findings: List[RuleFinding]) -> str:
+        return f"""
         You are a helpful application advisor reviewing a student's application timeline.
         Your job is to spot potential issues and explain them in simple, friendly language.
-        
+        {self._program_section(tasks, requirements, findings)}
+        {self._instructions()}"""
+
+    def _build_batch_prompt(self, items: List[ReviewItem]) -> str:
+        programs = "\n".join(
+            f"""
+        ### Program {i}
+        {self._program_section(tasks, requirements, findings)}"""
+            for i, (tasks, requirements, findings) in enumerate(items)
+        )
+        return f"""
+        You are a helpful application advisor reviewing the application timelines of {len(items)} programs.
+        Your job is to spot potential issues and explain them in simple, friendly language.
+        Review each program on its own.
+        {programs}
+        {self._instructions()}
+        Return one entry per program, with program_index set to the number of the program the warnings are for.
+        """
+
+    def _program_section(self, tasks: List[Task], requirements: ProgramRequirements,
+                         findings: List[RuleFinding]) -> str:
+        ambiguous = [f for f in findings if f.ambiguous]
+        return f"""
         **Program Requirements:**
         - Required Documents: {requirements.required_documents if requirements.required_documents else 'Not specified - may need to verify on official website'}
         - Test Requirements: {requirements.test_requirements if requirements.test_requirements else 'Not specified - may need to verify on official website'}
@@ -27,14 +79,16 @@ class ChecklistValidatorAgent:
         **Generated Timeline Tasks:**
         {[f"{task.due_date}: {task.title}" for task in tasks]}
         
+        **Points our automatic checks could not settle:**
+        {[finding.detail for finding in ambiguous]}
+        """
+
+    def _instructions(self) -> str:
+        return """
         **Your Task:**
-        Review the timeline and identify any issues. Write warnings as if you're talking to a student directly.
-        
-        **Look for these common issues:**
-        - Tasks scheduled too close together
-        - Not enough time for certain activities (e.g., LORs need 3-4 weeks)
-        - Missing requirements that should be verified
-        - Any dates that seem off
+        Look only at the points above and decide whether each one is a real issue for this timeline.
+        Write a warning for each real issue as if you're talking to a student directly; skip the ones that are fine.
+        Deadlines, task spacing and recommendation letter lead times have already been checked.
         
         **Examples of GOOD warnings (student-friendly):**
         - "⏰ Heads up! You've scheduled tasks after the deadline. Make sure all tasks are completed before then."
@@ -53,19 +107,164 @@ class ChecklistValidatorAgent:
         2. Use emojis (⏰ 📋 ⚠️ 💡) to make warnings scannable
         3. Focus on ACTIONABLE advice - what should the student do?
         4. If requirements were unclear, suggest checking the official university website
-        5. If everything looks good, you can return a positive encouragement or empty list
+        5. If none of the points is a real issue, return an empty list
         6. Keep warnings concise (1-2 sentences max each)
         
         Return a list of warnings (or empty list if no issues found).
         """
 
+    def _merge(self, findings: List[RuleFinding], llm_warnings: List[str]) -> List[str]:
+        return [f.warning for f in findings if not f.ambiguous and f.warning] + llm_warnings
+
+    def _fallback(self, findings: List[RuleFinding]) -> List[str]:
+        # Without the model, surface the ambiguous findings as they are
+        return [f.warning for f in findings if f.warning] or ["Error validating checklist"]
+
+    def _review(self, tasks: List[Task], requirements: ProgramRequirements, findings: List[RuleFinding]) -> List[str]:
+        if not any(f.ambiguous for f in findings):
+            return self._merge(findings, [])
         try:
             response_text = self.client.generate_content(
-                prompt=prompt,
-                response_schema=ValidationSchema
+                prompt=self._build_prompt(tasks, requirements, findings),
+                response_schema=ValidationSchema,
+                cache_ttl=self.CACHE_TTL
+            )
+            data = json.loads(response_text)
+            return self._merge(findings, data.get('warnings', []))
+        except Exception as e:
+            print(f"Error in ChecklistValidatorAgent: {e}")
+            return self._fallback(findings)
+
+    async def _areview(self, tasks: List[Task], requirements: ProgramRequirements, findings: List[RuleFinding]) -> List[str]:
+        if not any(f.ambiguous for f in findings):
+            return self._merge(findings, [])
+        try:
+            response_text = await self.client.agenerate_content(
+                prompt=self._build_prompt(tasks, requirements, findings),
+                response_schema=ValidationSchema,
+                cache_ttl=self.CACHE_TTL
             )
             data = json.loads(response_text)
-            return data.get('warnings', [])
+            return self._merge(findings, data.get('warnings', []))
         except Exception as e:
             print(f"Error in ChecklistValidatorAgent: {e}")
-            return ["Error validating checklist"]
+            return self._fallback(findings)
+
+    def validate(self, tasks: List[Task], requirements: ProgramRequirements,
+                 deadline: Optional[date] = None) -> List[str]:
+        """
+        Reviews the generated tasks against requirements to find gaps or issues.
+        """
+        return self._review(tasks, requirements, self._run_rules(tasks, requirements, deadline))
+
+    async def avalidate(self, tasks: List[Task], requirements: ProgramRequirements,
+                        deadline: Optional[date] = None) -> List[str]:
+        """
+        Async version of validate().
+        """
+        findings = self._run_rules(tasks, requirements, deadline)
+        if self.batcher is not None and any(f.ambiguous for f in findings):
+            return await self.batcher.submit((tasks, requirements, findings))
+        return await self._areview(tasks, requirements, findings)
+
+    def _pending_reviews(self, items: List[ReviewItem]) -> Tuple[Dict[int, List[str]], List[int]]:
+        """
+        Resolves items that need no model call (no ambiguous findings, or a cached answer)
+        and returns them with the indices that still need Gemini.
+        """
+        cached = [self.client.get_cached(self._build_prompt(*item), response_schema=ValidationSchema)
+                  if any(f.ambiguous for f in item[2]) else None
+                  for item in items]
+        return self._resolve_cached(items, cached)
+
+    async def _apending_reviews(self, items: List[ReviewItem]) -> Tuple[Dict[int, List[str]], List[int]]:
+        """
+        Async version of _pending_reviews().
+        """
+        async def lookup(item: ReviewItem) -> Optional[str]:
+            if not any(f.ambiguous for f in item[2]):
+                return None
+            return await self.client.aget_cached(self._build_prompt(*item), response_schema=ValidationSchema)
+
+        cached = await asyncio.gather(*(lookup(item) for item in items))
+        return self._resolve_cached(items, cached)
+
+    def _resolve_cached(self, items: List[ReviewItem], cached: List[Optional[str]]) -> Tuple[Dict[int, List[str]], List[int]]:
+        results, pending = {}, []
+        for i, ((_, _, findings), response_text) in enumerate(zip(items, cached)):
+            if not any(f.ambiguous for f in findings):
+                results[i] = self._merge(findings, [])
+                continue
+            try:
+                results[i] = self._merge(findings, json.loads(response_text).get('warnings', []))
+            except (TypeError, ValueError, AttributeError):
+                pending.append(i)
+        return results, pending
+
+    def _split_batch(self, data: Dict, items: List[ReviewItem], pending: List[int],
+                     results: Dict[int, List[str]]):
+        """
+        Validates each entry of a batched response, caching it as if it had been reviewed on its own.
+        Entries that are missing or don't match the schema are left out of results.
+        """
+        for entry in data.get("programs", []):
+            try:
+                parsed = IndexedValidationSchema.model_validate(entry)
+            except ValidationError:
+                continue
+            if not 0 <= parsed.program_index < len(pending) or pending[parsed.program_index] in results:
+                continue
+            index = pending[parsed.program_index]
+            tasks, requirements, findings = items[index]
+            self.client.store_cached(self._build_prompt(tasks, requirements, findings),
+                                     json.dumps({"warnings": parsed.warnings}),
+                                     response_schema=ValidationSchema, cache_ttl=self.CACHE_TTL)
+            results[index] = self._merge(findings, parsed.warnings)
+
+    def validate_batch(self, items: List[Tuple[List[Task], ProgramRequirements, Optional[date]]]) -> List[List[str]]:
+        """
+        Validates several (tasks, requirements, deadline) entries. Rules run per program;
+        the programs that need Gemini share one request, and entries the batched
+        answer gets wrong are reviewed one by one.
+        """
+        reviews = [(tasks, reqs, self._run_rules(tasks, reqs, deadline)) for tasks, reqs, deadline in items]
+        results, pending = self._pending_reviews(reviews)
+        if len(pending) > 1:
+            try:
+                response_text = self.client.generate_content(
+                    prompt=self._build_batch_prompt([reviews[i] for i in pending]),
+                    response_schema=ValidationBatchSchema,
+                    cache_ttl=self.CACHE_TTL
+                )
+                self._split_batch(json.loads(response_text), reviews, pending, results)
+            except Exception as e:
+                print(f"Error in ChecklistValidatorAgent batch: {e}")
+        for i in range(len(reviews)):
+            if i not in results:
+                results[i] = self._review(*reviews[i])
+        return [results[i] for i in range(len(reviews))]
+
+    async def avalidate_batch(self, items: List[Tuple[List[Task], ProgramRequirements, Optional[date]]]) -> List[List[str]]:
+        """
+        Async version of validate_batch().
+        """
+        reviews = [(tasks, reqs, self._run_rules(tasks, reqs, deadline)) for tasks, reqs, deadline in items]
+        return await self._areview_batch(reviews)
+
+    async def _areview_batch(self, items: List[ReviewItem]) -> List[List[str]]:
+        results, pending = await self._apending_reviews(items)
+        if len(pending) > 1:
+            try:
+                response_text = await self.client.agenerate_content(
+                    prompt=self._build_batch_prompt([items[i] for i in pending]),
+                    response_schema=ValidationBatchSchema,
+                    cache_ttl=self.CACHE_TTL
+                )
+                # Batched answers grow with the batch; decode large ones off the event loop
+                self._split_batch(await get_process_pool().aloads(response_text), items, pending, results)
+            except Exception as e:
+                print(f"Error in ChecklistValidatorAgent batch: {e}")
+        missing = [i for i in range(len(items)) if i not in results]
+        reviewed = await asyncio.gather(*(self._areview(*items[i]) for i in missing))
+        results.update(zip(missing, reviewed))
+        return [results[i] for i in range(len(items))]
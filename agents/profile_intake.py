@@ -1,8 +1,9 @@
 import json
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict
+from pydantic import BaseModel, Field, create_model
+from typing import Any, List, Dict
 from models import StudentProfile
 from utils.gemini_client import GeminiClient
+from utils.profile_normalizer import normalize_profile
 
 class TestScore(BaseModel):
     name: str = Field(description="Name of the test (e.g., GRE, TOEFL)")
@@ -18,44 +19,106 @@ class StudentProfileSchema(BaseModel):
     test_scores: List[TestScore] = Field(default_factory=list, description="List of test scores")
 
 class ProfileIntakeAgent:
+    # Response cache TTL (seconds). Normalizing the same raw profile always gives the same result.
+    CACHE_TTL = 7 * 24 * 3600
+
     def __init__(self, client: GeminiClient):
         self.client = client
+        self.stats = {"rules_only": 0, "llm_assisted": 0}
 
-    def process(self, raw_data: dict) -> StudentProfile:
-        """
-        Normalizes raw student data into a structured StudentProfile using Gemini.
-        """
-        prompt = f"""
-        You are an expert education counselor. Analyze the following raw student profile data and extract a structured profile.
+    def _schema_for(self, fields: List[str]) -> type:
+        # Only the unresolved fields are asked for, so the answer stays small
+        return create_model(
+            "StudentProfileSchema",
+            **{name: (StudentProfileSchema.model_fields[name].annotation, StudentProfileSchema.model_fields[name])
+               for name in StudentProfileSchema.model_fields if name in fields}
+        )
+
+    def _build_prompt(self, unresolved: Dict[str, Any], resolved: Dict[str, Any]) -> str:
+        return f"""
+        You are an expert education counselor. Some fields of a student profile could not be normalized automatically.
+        Return normalized values for ONLY these fields.
         Normalize GPA to 4.0 scale if possible, or keep as is if unsure.
-        Standardize country names.
+        Standardize country names. Write degrees as "<level> in <Subject>" and intakes as "<Season> <Year>".
+        
+        Raw Values:
+        {json.dumps(unresolved, indent=2, default=str)}
         
-        Raw Data:
-        {json.dumps(raw_data, indent=2)}
+        Already Normalized (for context):
+        {json.dumps(resolved, indent=2, default=str)}
         """
+
+    def _merge(self, resolved: Dict[str, Any], unresolved: Dict[str, Any], response_text: str) -> StudentProfile:
+        # Rule-resolved fields always win over the model's answer
+        data = {k: v for k, v in json.loads(response_text).items() if k in unresolved}
+        
+        # Convert list of TestScore back to dict for StudentProfile
+        test_scores_dict = dict(resolved.get('test_scores', {}))
+        for ts in data.pop('test_scores', None) or []:
+            # The output from Gemini is JSON, so it will be a list of dicts
+            if isinstance(ts, dict):
+                test_scores_dict[ts.get('name')] = ts.get('score')
         
+        return StudentProfile(**dict(resolved, **data, test_scores=test_scores_dict))
+
+    def _lenient(self, resolved: Dict[str, Any], unresolved: Dict[str, Any]) -> StudentProfile:
+        """
+        Fills unresolved fields with their raw values when Gemini is unavailable.
+        Raises if the GPA is unusable, since everything downstream depends on it.
+        """
+        data = dict(resolved)
+        if "gpa" in unresolved:
+            data["gpa"] = float(unresolved["gpa"])
+        for name in ("target_degree", "budget", "target_intake"):
+            if name in unresolved:
+                data[name] = str(unresolved[name] or "")
+        if "target_countries" in unresolved:
+            countries = unresolved["target_countries"] or []
+            data["target_countries"] = countries if isinstance(countries, list) else [str(countries)]
+        return StudentProfile(**data)
+
+    def _fast_path(self, raw_data: dict):
+        resolved, unresolved = normalize_profile(raw_data)
+        if not unresolved:
+            self.stats["rules_only"] += 1
+            return resolved, unresolved, StudentProfile(**resolved)
+        self.stats["llm_assisted"] += 1
+        return resolved, unresolved, None
+
+    def process(self, raw_data: dict) -> StudentProfile:
+        """
+        Normalizes raw student data into a structured StudentProfile. Local rules handle
+        GPA scales, country and degree names, intakes and test scores; Gemini is only
+        asked about the fields they cannot resolve.
+        """
+        resolved, unresolved, profile = self._fast_path(raw_data)
+        if profile is not None:
+            return profile
         try:
             response_text = self.client.generate_content(
-                prompt=prompt,
-                response_schema=StudentProfileSchema
+                prompt=self._build_prompt(unresolved, resolved),
+                response_schema=self._schema_for(list(unresolved)),
+                cache_ttl=self.CACHE_TTL
+            )
+            return self._merge(resolved, unresolved, response_text)
+        except Exception as e:
+            print(f"Error in ProfileIntakeAgent: {e}")
+            return self._lenient(resolved, unresolved)
+
+    async def aprocess(self, raw_data: dict) -> StudentProfile:
+        """
+        Async version of process().
+        """
+        resolved, unresolved, profile = self._fast_path(raw_data)
+        if profile is not None:
+            return profile
+        try:
+            response_text = await self.client.agenerate_content(
+                prompt=self._build_prompt(unresolved, resolved),
+                response_schema=self._schema_for(list(unresolved)),
+                cache_ttl=self.CACHE_TTL
             )
-            data = json.loads(response_text)
-            
-            # Convert list of TestScore back to dict for StudentProfile
-            test_scores_dict = {}
-            for ts in data.get('test_scores', []):
-                # Handle case where data might be dict or object depending on how json.loads behaves with pydantic schema output
-                # The output from Gemini is JSON, so it will be a list of dicts
-                if isinstance(ts, dict):
-                    test_scores_dict[ts.get('name')] = ts.get('score')
-            
-            # Remove test_scores from data to avoid double passing
-            if 'test_scores' in data:
-                del data['test_scores']
-                
-            return StudentProfile(test_scores=test_scores_dict, **data)
+            return self._merge(resolved, unresolved, response_text)
         except Exception as e:
             print(f"Error in ProfileIntakeAgent: {e}")
-            # Fallback: try to map directly if LLM fails, or re-raise
-            # For MVP, we'll just re-raise or return a partial profile
-            raise e
+            return self._lenient(resolved, unresolved)
@@ -1,22 +1,56 @@
 import json
-from typing import List
+from typing import List, Optional
 from models import StudentProfile, Program
 from utils.gemini_client import GeminiClient
-from pydantic import BaseModel, Field
+from utils.program_catalog import ProgramCatalog, CatalogEntry
+from utils.program_ranker import ProgramRanker, ProgramMatch
+from pydantic import BaseModel
+
+class RankedProgram(BaseModel):
+    name: str
+    university: str
+    country: str
+    tuition_range: str
+    application_deadline: str
+    eligibility_criteria: str
+    match_reasoning: str
+
+class ProgramList(BaseModel):
+    programs: List[RankedProgram]
+
+class MatchReason(BaseModel):
+    index: int
+    match_reasoning: str
+
+class MatchReasonList(BaseModel):
+    reasons: List[MatchReason]
+
+# How ranker features are described in locally written match reasoning
+FEATURE_LABELS = {"gpa": "GPA", "tests": "test scores", "budget": "budget", "country": "country preference",
+                  "interests": "interests", "backlogs": "backlog policy", "research": "research profile"}
 
 class ProgramSearchAgent:
-    def __init__(self, client: GeminiClient):
+    # Response cache TTL (seconds). Recommendations should refresh daily as deadlines move.
+    CACHE_TTL = 24 * 3600
+
+    # Most catalog candidates scored per search
+    CANDIDATE_LIMIT = 5000
+    FALLBACK_UNIVERSITY = "University (AI search unavailable)"
+
+    def __init__(self, client: GeminiClient, catalog: Optional[ProgramCatalog] = None,
+                 ranker: Optional[ProgramRanker] = None, top_k: int = 3):
         self.client = client
+        # Local catalog answered first; Gemini is only asked when it has too few fresh matches
+        self.catalog = catalog
+        self.ranker = ranker if ranker is not None else ProgramRanker()
+        # Number of programs recommended
+        self.top_k = max(1, top_k)
 
-    def search(self, profile: StudentProfile) -> List[Program]:
-        """
-        Uses Gemini AI to generate relevant program recommendations based on student profile.
-        """
-        
-        prompt = f"""
+    def _build_prompt(self, profile: StudentProfile) -> str:
+        return f"""
         You are an expert study abroad counselor with extensive knowledge of Master's programs worldwide.
         
-        Generate EXACTLY 3 realistic Master's program recommendations for this student:
+        Generate EXACTLY {self.top_k} realistic Master's program recommendations for this student:
         
         **Student Profile:**
         - Target Degree: {profile.target_degree}
@@ -27,7 +61,7 @@ class ProgramSearchAgent:
         - Target Intake: {profile.target_intake}
         - Test Scores: {profile.test_scores if profile.test_scores else 'Not provided'}
         
-        **Generate 3 real, well-known programs that:**
+        **Generate {self.top_k} real, well-known programs that:**
         1. Match the student's target degree field
         2. Are in their target countries
         3. Align with their budget range
@@ -49,41 +83,198 @@ class ProgramSearchAgent:
         - Consider budget constraints
         - Provide realistic deadlines (typically 3-8 months from now)
         
-        Return as JSON with a "programs" array containing exactly 3 programs.
+        Return as JSON with a "programs" array containing exactly {self.top_k} programs.
         """
 
+    def _to_programs(self, response_text: str, profile: StudentProfile) -> List[Program]:
+        data = json.loads(response_text)
+        results = []
+        for p_data in data.get('programs', [])[:self.top_k]:  # Ensure max top_k
+            results.append(Program(**p_data))
+        
+        if len(results) == 0:
+            # Fallback if AI fails
+            return self._get_fallback_programs(profile)
+        
+        return results
+
+    def _candidates(self, profile: StudentProfile) -> List[CatalogEntry]:
+        if self.catalog is None:
+            return []
         try:
-            class RankedProgram(BaseModel):
-                name: str
-                university: str
-                country: str
-                tuition_range: str
-                application_deadline: str
-                eligibility_criteria: str
-                match_reasoning: str
-
-            class ProgramList(BaseModel):
-                programs: List[RankedProgram]
-
-            response_text = self.client.generate_content(
-                prompt=prompt,
-                response_schema=ProgramList
-            )
-            
-            data = json.loads(response_text)
-            results = []
-            for p_data in data.get('programs', [])[:3]:  # Ensure max 3
-                results.append(Program(**p_data))
-            
-            if len(results) == 0:
-                # Fallback if AI fails
-                return self._get_fallback_programs(profile)
-            
-            return results
+            # Budget is scored by the ranker rather than filtered out
+            return self.catalog.search(profile, limit=self.CANDIDATE_LIMIT, within_budget=False)
+        except Exception as e:
+            print(f"Error searching program catalog: {e}")
+            return []
 
+    async def _acandidates(self, profile: StudentProfile) -> List[CatalogEntry]:
+        if self.catalog is None:
+            return []
+        try:
+            return await self.catalog.asearch(profile, limit=self.CANDIDATE_LIMIT, within_budget=False)
         except Exception as e:
-            print(f"Error in ProgramSearchAgent: {e}")
-            return self._get_fallback_programs(profile)
+            print(f"Error searching program catalog: {e}")
+            return []
+
+    def _rank(self, profile: StudentProfile, programs: List[Program], keywords: List[str]) -> List[ProgramMatch]:
+        return self.ranker.rank(profile, programs, k=self.top_k, keywords=keywords)
+
+    def _found(self, programs: List[Program]) -> List[Program]:
+        return [p for p in programs if p.university != self.FALLBACK_UNIVERSITY]
+
+    def _merge(self, profile: StudentProfile, fresh: List[CatalogEntry], programs: List[Program]) -> List[ProgramMatch]:
+        """
+        Stores Gemini's programs in the catalog and ranks them together with the fresh catalog hits.
+        """
+        found = self._found(programs)
+        if self.catalog is not None and found:
+            try:
+                self.catalog.upsert(found, source="llm", keywords=" ".join(profile.interests))
+            except Exception as e:
+                print(f"Error updating program catalog: {e}")
+        return self._rank_merged(profile, fresh, found)
+
+    async def _amerge(self, profile: StudentProfile, fresh: List[CatalogEntry], programs: List[Program]) -> List[ProgramMatch]:
+        found = self._found(programs)
+        if self.catalog is not None and found:
+            try:
+                await self.catalog.aupsert(found, source="llm", keywords=" ".join(profile.interests))
+            except Exception as e:
+                print(f"Error updating program catalog: {e}")
+        return self._rank_merged(profile, fresh, found)
+
+    def _rank_merged(self, profile: StudentProfile, fresh: List[CatalogEntry], found: List[Program]) -> List[ProgramMatch]:
+        candidates = {(e.program.university.lower(), e.program.name.lower()): (e.program, e.keywords) for e in fresh}
+        for program in found:
+            candidates.setdefault((program.university.lower(), program.name.lower()), (program, ""))
+        pairs = list(candidates.values())
+        return self._rank(profile, [p for p, _ in pairs], [k for _, k in pairs])
+
+    def _build_reasoning_prompt(self, profile: StudentProfile, matches: List[ProgramMatch]) -> str:
+        programs = "\n".join(
+            f"{i}. {m.program.name} at {m.program.university} ({m.program.country}), tuition {m.program.tuition_range}, "
+            f"eligibility: {m.program.eligibility_criteria}. Match scores (0-1): "
+            + ", ".join(f"{k} {v:.2f}" for k, v in m.breakdown.items())
+            for i, m in enumerate(matches)
+        )
+        return f"""
+        You are an expert study abroad counselor. These programs were ranked for a student by a scoring engine.
+        Do not re-rank them. For each one, write match_reasoning: 1-2 sentences telling the student why it
+        fits, grounded in the match scores (mention any weak area honestly).
+
+        **Student Profile:**
+        - Target Degree: {profile.target_degree}
+        - Target Countries: {', '.join(profile.target_countries)}
+        - GPA: {profile.gpa}/4.0
+        - Interests: {', '.join(profile.interests)}
+        - Budget: {profile.budget}
+        - Test Scores: {profile.test_scores if profile.test_scores else 'Not provided'}
+
+        **Programs:**
+        {programs}
+
+        Return JSON with a "reasons" array of {{"index": <program number>, "match_reasoning": "..."}}.
+        """
+
+    def _local_reasoning(self, match: ProgramMatch) -> str:
+        ranked = sorted(match.breakdown.items(), key=lambda item: -item[1])
+        reasons = [f"Strong fit on {FEATURE_LABELS[ranked[0][0]]} and {FEATURE_LABELS[ranked[1][0]]}"]
+        weakest, value = ranked[-1]
+        if value < 0.5:
+            reasons.append(f"weaker on {FEATURE_LABELS[weakest]}")
+        return f"{'; '.join(reasons)} (match score {match.score:.0%})."
+
+    def _needs_reasoning(self, matches: List[ProgramMatch]) -> List[ProgramMatch]:
+        # Programs fresh from Gemini already carry reasoning; catalog hits were written for someone else
+        return [m for m in matches if not m.program.match_reasoning]
+
+    def _apply_reasons(self, matches: List[ProgramMatch], pending: List[ProgramMatch], response_text: Optional[str]) -> List[Program]:
+        reasons = {}
+        if response_text is not None:
+            try:
+                reasons = {r["index"]: r["match_reasoning"] for r in json.loads(response_text).get("reasons", [])}
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"Error reading match reasoning: {e}")
+        for i, match in enumerate(pending):
+            match.program.match_reasoning = reasons.get(i) or self._local_reasoning(match)
+        return [m.program for m in matches]
+
+    def _explain(self, profile: StudentProfile, matches: List[ProgramMatch]) -> List[Program]:
+        pending = self._needs_reasoning(matches)
+        response_text = None
+        if pending:
+            try:
+                response_text = self.client.generate_content(
+                    prompt=self._build_reasoning_prompt(profile, pending),
+                    response_schema=MatchReasonList,
+                    cache_ttl=self.CACHE_TTL
+                )
+            except Exception as e:
+                print(f"Error in ProgramSearchAgent reasoning: {e}")
+        return self._apply_reasons(matches, pending, response_text)
+
+    async def _aexplain(self, profile: StudentProfile, matches: List[ProgramMatch]) -> List[Program]:
+        pending = self._needs_reasoning(matches)
+        response_text = None
+        if pending:
+            try:
+                response_text = await self.client.agenerate_content(
+                    prompt=self._build_reasoning_prompt(profile, pending),
+                    response_schema=MatchReasonList,
+                    cache_ttl=self.CACHE_TTL
+                )
+            except Exception as e:
+                print(f"Error in ProgramSearchAgent reasoning: {e}")
+        return self._apply_reasons(matches, pending, response_text)
+
+    def search(self, profile: StudentProfile) -> List[Program]:
+        """
+        Returns the top_k programs for the student profile. Catalog candidates are scored by
+        the ranker; Gemini is asked for programs only when there are too few fresh candidates,
+        and otherwise just writes match_reasoning for the winners.
+        """
+        entries = self._candidates(profile)
+        fresh = [e for e in entries if not e.stale]
+        matches = self._rank(profile, [e.program for e in fresh], [e.keywords for e in fresh])
+        if len(matches) < self.top_k:
+            try:
+                response_text = self.client.generate_content(
+                    prompt=self._build_prompt(profile),
+                    response_schema=ProgramList,
+                    cache_ttl=self.CACHE_TTL
+                )
+                matches = self._merge(profile, fresh, self._to_programs(response_text, profile))
+
+            except Exception as e:
+                print(f"Error in ProgramSearchAgent: {e}")
+                matches = self._rank(profile, [e.program for e in entries], [e.keywords for e in entries])
+            if not matches:
+                return self._get_fallback_programs(profile)
+        return self._explain(profile, matches)
+
+    async def asearch(self, profile: StudentProfile) -> List[Program]:
+        """
+        Async version of search().
+        """
+        entries = await self._acandidates(profile)
+        fresh = [e for e in entries if not e.stale]
+        matches = self._rank(profile, [e.program for e in fresh], [e.keywords for e in fresh])
+        if len(matches) < self.top_k:
+            try:
+                response_text = await self.client.agenerate_content(
+                    prompt=self._build_prompt(profile),
+                    response_schema=ProgramList,
+                    cache_ttl=self.CACHE_TTL
+                )
+                matches = await self._amerge(profile, fresh, self._to_programs(response_text, profile))
+
+            except Exception as e:
+                print(f"Error in ProgramSearchAgent: {e}")
+                matches = self._rank(profile, [e.program for e in entries], [e.keywords for e in entries])
+            if not matches:
+                return self._get_fallback_programs(profile)
+        return await self._aexplain(profile, matches)
     
     def _get_fallback_programs(self, profile: StudentProfile) -> List[Program]:
         """Fallback generic programs if AI fails"""
@@ -92,7 +283,7 @@ class ProgramSearchAgent:
         return [
             Program(
                 name=f"Master's in {degree_field}",
-                university="University (AI search unavailable)",
+                university=self.FALLBACK_UNIVERSITY,
                 country=profile.target_countries[0] if profile.target_countries else "USA",
                 tuition_range=profile.budget,
                 application_deadline="2025-12-31",
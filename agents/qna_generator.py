@@ -1,24 +1,27 @@
 import json
-from typing import List
+from typing import Any, AsyncIterator, Dict, Iterator, List
 from models import StudentProfile, Program, QNAPair
 from utils.gemini_client import GeminiClient
+from utils.json_stream import JSONArrayStream
 
 class QNAGeneratorAgent:
     """Generates curated Q&A pairs based on student profile and shortlisted programs"""
     
+    # Response cache TTL (seconds). General advice for a given context rarely changes.
+    CACHE_TTL = 7 * 24 * 3600
+
+    # Number of pairs shown to the student
+    PAIR_COUNT = 5
+
     def __init__(self, client: GeminiClient):
         self.client = client
     
-    def generate_questions(self, profile: StudentProfile, programs: List[Program]) -> List[QNAPair]:
-        """
-        Generates exactly 5 relevant Q&A pairs for the student's journey.
-        Single API call - safe for free tier.
-        """
+    def _build_prompt(self, profile: StudentProfile, programs: List[Program]) -> str:
         # Extract key info
         countries = list(set([p.country for p in programs[:3]]))  # Top 3 countries
         program_names = [p.name for p in programs[:2]]  # Top 2 programs
         
-        prompt = f"""
+        return f"""
         You are an expert MS application advisor. Generate EXACTLY 5 most relevant Q&A pairs 
         for a student at this stage of their application journey.
         
@@ -67,65 +70,138 @@ class QNAGeneratorAgent:
         
         **Important**: Generate questions relevant to {countries} and the degree {profile.target_degree}. Return ONLY the JSON object, nothing else.
         """
+
+    def _to_pairs(self, response_text: str) -> List[QNAPair]:
+        response_text = response_text.strip()
+        
+        # Clean response (remove markdown code blocks if present)
+        if response_text.startswith('```'):
+            # Extract JSON from markdown code block
+            lines = response_text.split('\n')
+            response_text = '\n'.join([line for line in lines if not line.startswith('```')])
+            response_text = response_text.strip()
+        
+        data = json.loads(response_text)
+        
+        qna_pairs = [self._to_pair(item) for item in data.get('qna_pairs', [])[:self.PAIR_COUNT]]  # Ensure exactly 5
+        
+        # If less than 5, add generic fallback
+        while len(qna_pairs) < self.PAIR_COUNT:
+            qna_pairs.append(self._filler_pair())
         
+        return qna_pairs[:self.PAIR_COUNT]  # Return exactly 5
+
+    def _to_pair(self, item: dict) -> QNAPair:
+        return QNAPair(
+            question=item.get('question', '')[:30],  # Enforce 30 char limit
+            answer=item.get('answer', ''),
+            category=item.get('category', 'general')
+        )
+
+    def _filler_pair(self) -> QNAPair:
+        return QNAPair(
+            question="Application tips?",
+            answer="Start early, get strong LORs, tailor SOP to each program. Review deadlines weekly. Source: General knowledge",
+            category="general"
+        )
+
+    def _remaining_pairs(self, sent: int) -> List[QNAPair]:
+        # Top up a stream that ended early: the generic pair if some arrived, the safe fallbacks if none did
+        if sent == 0:
+            return self._get_fallback_pairs()
+        return [self._filler_pair() for _ in range(self.PAIR_COUNT - sent)]
+
+    def generate_questions(self, profile: StudentProfile, programs: List[Program]) -> List[QNAPair]:
+        """
+        Generates exactly 5 relevant Q&A pairs for the student's journey.
+        Single API call - safe for free tier.
+        """
         try:
             # Use GeminiClient's generate_content method without schema
-            response_text = self.client.generate_content(prompt=prompt).strip()
-            
-            # Clean response (remove markdown code blocks if present)
-            if response_text.startswith('```'):
-                # Extract JSON from markdown code block
-                lines = response_text.split('\n')
-                response_text = '\n'.join([line for line in lines if not line.startswith('```')])
-                response_text = response_text.strip()
-            
-            data = json.loads(response_text)
+            response_text = self.client.generate_content(prompt=self._build_prompt(profile, programs), cache_ttl=self.CACHE_TTL)
+            return self._to_pairs(response_text)
             
-            qna_pairs = []
-            for item in data.get('qna_pairs', [])[:5]:  # Ensure exactly 5
-                qna_pairs.append(QNAPair(
-                    question=item.get('question', '')[:30],  # Enforce 30 char limit
-                    answer=item.get('answer', ''),
-                    category=item.get('category', 'general')
-                ))
-            
-            # If less than 5, add generic fallback
-            while len(qna_pairs) < 5:
-                qna_pairs.append(QNAPair(
-                    question="Application tips?",
-                    answer="Start early, get strong LORs, tailor SOP to each program. Review deadlines weekly. Source: General knowledge",
-                    category="general"
-                ))
-            
-            return qna_pairs[:5]  # Return exactly 5
+        except Exception as e:
+            print(f"Error in QNAGeneratorAgent: {e}")
+            return self._get_fallback_pairs()
+
+    async def agenerate_questions(self, profile: StudentProfile, programs: List[Program]) -> List[QNAPair]:
+        """
+        Async version of generate_questions().
+        """
+        try:
+            response_text = await self.client.agenerate_content(prompt=self._build_prompt(profile, programs), cache_ttl=self.CACHE_TTL)
+            return self._to_pairs(response_text)
             
         except Exception as e:
             print(f"Error in QNAGeneratorAgent: {e}")
-            # Return safe fallback questions
-            return [
-                QNAPair(
-                    question="When to start applying?",
-                    answer="Start 6-8 months before deadline. Research programs, prepare documents, draft SOP early. Source: General knowledge",
-                    category="general"
-                ),
-                QNAPair(
-                    question="Strong SOP tips?",
-                    answer="Highlight research interests, career goals, and why this program. Be specific and authentic. Source: General knowledge",
-                    category="sop"
-                ),
-                QNAPair(
-                    question="LOR best practices?",
-                    answer="Request from professors who know you well. Give 4-6 weeks notice. Provide resume and project details. Source: General knowledge",
-                    category="documents"
-                ),
-                QNAPair(
-                    question="Test scores needed?",
-                    answer="Check each program's requirements. GRE often optional, TOEFL/IELTS for non-native English speakers. Source: General knowledge",
-                    category="tests"
-                ),
-                QNAPair(
-                    question="Application checklist?",
-                    answer="Transcripts, SOP, LORs, test scores, CV, application fee. Verify program-specific requirements. Source: General knowledge",
-                    category="documents"
-                )
-            ]
+            return self._get_fallback_pairs()
+
+    def stream_questions(self, profile: StudentProfile, programs: List[Program]) -> Iterator[QNAPair]:
+        """
+        Yields each Q&A pair as soon as the model has finished writing it.
+        Always yields exactly 5 pairs, topping up with fallbacks if the stream fails.
+        """
+        parser = JSONArrayStream('qna_pairs')
+        sent = 0
+        try:
+            for chunk in self.client.generate_content_stream(prompt=self._build_prompt(profile, programs), cache_ttl=self.CACHE_TTL):
+                for item in parser.feed(chunk):
+                    if sent < self.PAIR_COUNT and isinstance(item, dict):
+                        sent += 1
+                        yield self._to_pair(item)
+        except Exception as e:
+            print(f"Error in QNAGeneratorAgent: {e}")
+        yield from self._remaining_pairs(sent)
+
+    async def astream_questions(self, profile: StudentProfile, programs: List[Program]) -> AsyncIterator[QNAPair]:
+        """
+        Async version of stream_questions().
+        """
+        parser = JSONArrayStream('qna_pairs')
+        sent = 0
+        try:
+            async for chunk in self.client.agenerate_content_stream(prompt=self._build_prompt(profile, programs), cache_ttl=self.CACHE_TTL):
+                for item in parser.feed(chunk):
+                    if sent < self.PAIR_COUNT and isinstance(item, dict):
+                        sent += 1
+                        yield self._to_pair(item)
+        except Exception as e:
+            print(f"Error in QNAGeneratorAgent: {e}")
+        for pair in self._remaining_pairs(sent):
+            yield pair
+
+    def is_fallback(self, pairs: List[Dict[str, Any]]) -> bool:
+        """True if any of the (serialized) pairs is a canned fallback or filler rather than generated."""
+        canned = {p.question for p in self._get_fallback_pairs()} | {self._filler_pair().question}
+        return any(pair.get("question") in canned for pair in pairs)
+
+    def _get_fallback_pairs(self) -> List[QNAPair]:
+        """Safe fallback questions if AI fails"""
+        return [
+            QNAPair(
+                question="When to start applying?",
+                answer="Start 6-8 months before deadline. Research programs, prepare documents, draft SOP early. Source: General knowledge",
+                category="general"
+            ),
+            QNAPair(
+                question="Strong SOP tips?",
+                answer="Highlight research interests, career goals, and why this program. Be specific and authentic. Source: General knowledge",
+                category="sop"
+            ),
+            QNAPair(
+                question="LOR best practices?",
+                answer="Request from professors who know you well. Give 4-6 weeks notice. Provide resume and project details. Source: General knowledge",
+                category="documents"
+            ),
+            QNAPair(
+                question="Test scores needed?",
+                answer="Check each program's requirements. GRE often optional, TOEFL/IELTS for non-native English speakers. Source: General knowledge",
+                category="tests"
+            ),
+            QNAPair(
+                question="Application checklist?",
+                answer="Transcripts, SOP, LORs, test scores, CV, application fee. Verify program-specific requirements. Source: General knowledge",
+                category="documents"
+            )
+        ]
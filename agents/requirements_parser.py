@@ -1,30 +1,71 @@
 import json
-from pydantic import BaseModel, Field
-from typing import List, Optional
+import asyncio
+from pydantic import BaseModel, Field, ValidationError
+from typing import Dict, List, Optional, Tuple
 from models import ProgramRequirements
+from utils.batching import MicroBatcher
 from utils.gemini_client import GeminiClient
+from utils.process_pool import get_process_pool
 
 class RequirementsSchema(BaseModel):
     required_documents: List[str] = Field(description="List of required documents (SOP, LORs, etc.)")
     test_requirements: List[str] = Field(description="List of required tests (GRE, TOEFL, etc.)")
     special_notes: Optional[str] = Field(description="Any special instructions or notes")
 
+class IndexedRequirementsSchema(RequirementsSchema):
+    program_index: int = Field(description="Index of the program in the input list")
+
+class RequirementsBatchSchema(BaseModel):
+    programs: List[IndexedRequirementsSchema]
+
 class RequirementsParserAgent:
-    def __init__(self, client: GeminiClient):
+    # Response cache TTL (seconds). Parsing the same page text always gives the same requirements.
+    CACHE_TTL = 7 * 24 * 3600
+
+    # Max programs sent in one batched request
+    MAX_BATCH = 5
+
+    # Page text kept per program (the fetch step may merge several crawled pages)
+    MAX_CONTENT_CHARS = 12000
+
+    # Placeholder document returned when parsing fails
+    ERROR_DOCUMENT = "Error parsing requirements"
+
+    def __init__(self, client: GeminiClient, batch_window: float = 0):
         self.client = client
+        # With a batch window, concurrent aparse() calls are collected into one request
+        self.batcher = MicroBatcher(self.aparse_batch, window=batch_window, max_batch=self.MAX_BATCH) if batch_window > 0 else None
 
-    def parse(self, program_name: str, raw_text: str) -> ProgramRequirements:
-        """
-        Extracts structured requirements from raw text using Gemini.
-        """
-        prompt = f"""
+    def _build_prompt(self, program_name: str, raw_text: str) -> str:
+        return f"""
         You are an expert at extracting university admission requirements from web content.
         
         **Program:** {program_name}
         
         **Web Content:**
-        {raw_text[:8000]}  
+        {raw_text[:self.MAX_CONTENT_CHARS]}  
+        {self._instructions()}"""
+
+    def _build_batch_prompt(self, items: List[Tuple[str, str]]) -> str:
+        programs = "\n".join(
+            f"""
+        **Program {i}:** {program_name}
         
+        **Web Content:**
+        {raw_text[:self.MAX_CONTENT_CHARS]}
+        """
+            for i, (program_name, raw_text) in enumerate(items)
+        )
+        return f"""
+        You are an expert at extracting university admission requirements from web content.
+        The content of {len(items)} programs follows; handle each one on its own.
+        {programs}
+        {self._instructions()}
+        Return one entry per program, with program_index set to the number of the program it describes.
+        """
+
+    def _instructions(self) -> str:
+        return """
         **Your Task:**
         Extract the following information. If something is not clearly stated, leave it empty rather than guessing.
         
@@ -44,18 +85,136 @@ class RequirementsParserAgent:
         - Don't add generic requirements that aren't explicitly stated
         """
 
+    def _error_requirements(self, program_name: str, error: Exception) -> ProgramRequirements:
+        return ProgramRequirements(
+            program_name=program_name,
+            required_documents=[self.ERROR_DOCUMENT],
+            test_requirements=[],
+            special_notes=f"Failed to parse: {str(error)}"
+        )
+
+    def is_error(self, requirements: ProgramRequirements) -> bool:
+        """True for the placeholder returned when parsing failed."""
+        return requirements.required_documents == [self.ERROR_DOCUMENT]
+
+    def parse(self, program_name: str, raw_text: str) -> ProgramRequirements:
+        """
+        Extracts structured requirements from raw text using Gemini.
+        """
         try:
             response_text = self.client.generate_content(
-                prompt=prompt,
-                response_schema=RequirementsSchema
+                prompt=self._build_prompt(program_name, raw_text),
+                response_schema=RequirementsSchema,
+                cache_ttl=self.CACHE_TTL
             )
             data = json.loads(response_text)
             return ProgramRequirements(program_name=program_name, **data)
         except Exception as e:
             print(f"Error in RequirementsParserAgent: {e}")
-            return ProgramRequirements(
-                program_name=program_name,
-                required_documents=["Error parsing requirements"],
-                test_requirements=[],
-                special_notes=f"Failed to parse: {str(e)}"
+            return self._error_requirements(program_name, e)
+
+    async def aparse(self, program_name: str, raw_text: str) -> ProgramRequirements:
+        """
+        Async version of parse().
+        """
+        if self.batcher is not None and await self.client.aget_cached(self._build_prompt(program_name, raw_text), response_schema=RequirementsSchema) is None:
+            return await self.batcher.submit((program_name, raw_text))
+        return await self._aparse_one(program_name, raw_text)
+
+    async def _aparse_one(self, program_name: str, raw_text: str) -> ProgramRequirements:
+        try:
+            response_text = await self.client.agenerate_content(
+                prompt=self._build_prompt(program_name, raw_text),
+                response_schema=RequirementsSchema,
+                cache_ttl=self.CACHE_TTL
             )
+            data = json.loads(response_text)
+            return ProgramRequirements(program_name=program_name, **data)
+        except Exception as e:
+            print(f"Error in RequirementsParserAgent: {e}")
+            return self._error_requirements(program_name, e)
+
+    def _cached_results(self, items: List[Tuple[str, str]]) -> Dict[int, ProgramRequirements]:
+        cached = [self.client.get_cached(self._build_prompt(program_name, raw_text), response_schema=RequirementsSchema)
+                  for program_name, raw_text in items]
+        return self._parse_cached(items, cached)
+
+    async def _acached_results(self, items: List[Tuple[str, str]]) -> Dict[int, ProgramRequirements]:
+        cached = await asyncio.gather(*(
+            self.client.aget_cached(self._build_prompt(program_name, raw_text), response_schema=RequirementsSchema)
+            for program_name, raw_text in items
+        ))
+        return self._parse_cached(items, cached)
+
+    def _parse_cached(self, items: List[Tuple[str, str]], cached: List[Optional[str]]) -> Dict[int, ProgramRequirements]:
+        results = {}
+        for i, ((program_name, _), response_text) in enumerate(zip(items, cached)):
+            if response_text is not None:
+                try:
+                    results[i] = ProgramRequirements(program_name=program_name, **json.loads(response_text))
+                except (ValueError, TypeError):
+                    pass
+        return results
+
+    def _split_batch(self, data: Dict, items: List[Tuple[str, str]], pending: List[int],
+                     results: Dict[int, ProgramRequirements]):
+        """
+        Validates each entry of a batched response, caching it as if it had been parsed on its own.
+        Entries that are missing or don't match the schema are left out of results.
+        """
+        for entry in data.get("programs", []):
+            try:
+                parsed = IndexedRequirementsSchema.model_validate(entry)
+            except ValidationError:
+                continue
+            if not 0 <= parsed.program_index < len(pending) or pending[parsed.program_index] in results:
+                continue
+            index = pending[parsed.program_index]
+            program_name, raw_text = items[index]
+            fields = parsed.model_dump(exclude={"program_index"})
+            self.client.store_cached(self._build_prompt(program_name, raw_text), json.dumps(fields),
+                                     response_schema=RequirementsSchema, cache_ttl=self.CACHE_TTL)
+            results[index] = ProgramRequirements(program_name=program_name, **fields)
+
+    def parse_batch(self, items: List[Tuple[str, str]]) -> List[ProgramRequirements]:
+        """
+        Parses several (program_name, raw_text) pairs with one Gemini request.
+        Programs the batched answer gets wrong are re-parsed one by one.
+        """
+        results = self._cached_results(items)
+        pending = [i for i in range(len(items)) if i not in results]
+        if len(pending) > 1:
+            try:
+                response_text = self.client.generate_content(
+                    prompt=self._build_batch_prompt([items[i] for i in pending]),
+                    response_schema=RequirementsBatchSchema,
+                    cache_ttl=self.CACHE_TTL
+                )
+                self._split_batch(json.loads(response_text), items, pending, results)
+            except Exception as e:
+                print(f"Error in RequirementsParserAgent batch: {e}")
+        for i in range(len(items)):
+            if i not in results:
+                results[i] = self.parse(*items[i])
+        return [results[i] for i in range(len(items))]
+
+    async def aparse_batch(self, items: List[Tuple[str, str]]) -> List[ProgramRequirements]:
+        """
+        Async version of parse_batch().
+        """
+        results = await self._acached_results(items)
+        pending = [i for i in range(len(items)) if i not in results]
+        if len(pending) > 1:
+            try:
+                response_text = await self.client.agenerate_content(
+                    prompt=self._build_batch_prompt([items[i] for i in pending]),
+                    response_schema=RequirementsBatchSchema,
+                    cache_ttl=self.CACHE_TTL
+                )
+                self._split_batch(await get_process_pool().aloads(response_text), items, pending, results)
+            except Exception as e:
+                print(f"Error in RequirementsParserAgent batch: {e}")
+        missing = [i for i in range(len(items)) if i not in results]
+        parsed = await asyncio.gather(*(self._aparse_one(*items[i]) for i in missing))
+        results.update(zip(missing, parsed))
+        return [results[i] for i in range(len(items))]
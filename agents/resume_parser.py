@@ -1,23 +1,26 @@
 import json
 from typing import Dict, Any
 from utils.gemini_client import GeminiClient
+from utils.rate_limiter import PRIORITY_INTERACTIVE
 
 class ResumeParserAgent:
     """Extracts student profile information from resume text."""
     
+    # Response cache TTL (seconds). Students often re-submit the same resume text.
+    CACHE_TTL = 7 * 24 * 3600
+    # Longest resume text sent to the model; longer input is rejected rather than cut
+    MAX_TEXT_CHARS = 10000
+
     def __init__(self, client: GeminiClient):
         self.client = client
         
-    def parse(self, resume_text: str) -> Dict[str, Any]:
-        """
-        Parses resume text and extracts structured profile data.
-        """
+    def _build_prompt(self, resume_text: str) -> str:
         prompt = """
         You are an expert admission counselor. Extract the following student profile information from the resume text below.
         
         **Resume Text:**
         """
-        prompt += resume_text[:10000]
+        prompt += resume_text[:self.MAX_TEXT_CHARS]
         prompt += """
         
         **Extract these fields:**
@@ -44,36 +47,73 @@ class ResumeParserAgent:
         
         If a field is not found, use reasonable defaults (0 or empty string/list).
         """
+        return prompt
+
+    def _to_profile_data(self, response_text: str) -> Dict[str, Any]:
+        response_text = response_text.strip()
+        print(f"[DEBUG] Raw response: {response_text[:200]}...")  # Debug first 200 chars
         
-        try:
-            response_text = self.client.generate_content(prompt=prompt).strip()
-            print(f"[DEBUG] Raw response: {response_text[:200]}...")  # Debug first 200 chars
-            
-            # Clean response - handle multiple markdown formats
-            if response_text.startswith('```'):
-                lines = response_text.split('\n')
-                response_text = '\n'.join([line for line in lines if not line.startswith('```')])
-                response_text = response_text.strip()
-            
-            # Remove any "json" language identifier
-            if response_text.startswith('json'):
-                response_text = response_text[4:].strip()
-                
-            print(f"[DEBUG] Cleaned response: {response_text[:200]}...")  # Debug after cleaning
+        # Clean response - handle multiple markdown formats
+        if response_text.startswith('```'):
+            lines = response_text.split('\n')
+            response_text = '\n'.join([line for line in lines if not line.startswith('```')])
+            response_text = response_text.strip()
+        
+        # Remove any "json" language identifier
+        if response_text.startswith('json'):
+            response_text = response_text[4:].strip()
             
-            data = json.loads(response_text)
+        print(f"[DEBUG] Cleaned response: {response_text[:200]}...")  # Debug after cleaning
+        
+        data = json.loads(response_text)
+        
+        # Ensure all required fields exist with defaults
+        return {
+            'gpa': data.get('gpa', 0.0),
+            'undergrad_major': data.get('undergrad_major', ''),
+            'work_experience_years': data.get('work_experience_years', 0.0),
+            'backlogs': data.get('backlogs', 0),
+            'research_papers': data.get('research_papers', 0),
+            'test_scores': data.get('test_scores', {}),
+            'interests': data.get('interests', []),
+            'target_degree': data.get('target_degree', '')
+        }
+
+    def parse(self, resume_text: str) -> Dict[str, Any]:
+        """
+        Parses resume text and extracts structured profile data.
+        """
+        response_text = ""
+        try:
+            response_text = self.client.generate_content(
+                prompt=self._build_prompt(resume_text),
+                cache_ttl=self.CACHE_TTL,
+                priority=PRIORITY_INTERACTIVE
+            )
+            return self._to_profile_data(response_text)
             
-            # Ensure all required fields exist with defaults
-            return {
-                'gpa': data.get('gpa', 0.0),
-                'undergrad_major': data.get('undergrad_major', ''),
-                'work_experience_years': data.get('work_experience_years', 0.0),
-                'backlogs': data.get('backlogs', 0),
-                'research_papers': data.get('research_papers', 0),
-                'test_scores': data.get('test_scores', {}),
-                'interests': data.get('interests', []),
-                'target_degree': data.get('target_degree', '')
-            }
+        except json.JSONDecodeError as e:
+            print(f"JSON parsing error in ResumeParserAgent: {e}")
+            print(f"Problematic text: {response_text}")
+            return {}
+        except Exception as e:
+            print(f"Error in ResumeParserAgent: {e}")
+            import traceback
+            traceback.print_exc()
+            return {}
+
+    async def aparse(self, resume_text: str) -> Dict[str, Any]:
+        """
+        Async version of parse().
+        """
+        response_text = ""
+        try:
+            response_text = await self.client.agenerate_content(
+                prompt=self._build_prompt(resume_text),
+                cache_ttl=self.CACHE_TTL,
+                priority=PRIORITY_INTERACTIVE
+            )
+            return self._to_profile_data(response_text)
             
         except json.JSONDecodeError as e:
             print(f"JSON parsing error in ResumeParserAgent: {e}")
@@ -1,31 +1,35 @@
 import json
-from datetime import date
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Iterator, List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from models import StudentProfile, Program, ProgramRequirements, Task
 from utils.gemini_client import GeminiClient
+from utils.json_stream import JSONArrayStream
+from utils.timeline_engine import build_task_graph, schedule
 
-class TaskSchema(BaseModel):
-    title: str
-    description: str
-    due_date: str = Field(description="ISO date string YYYY-MM-DD")
-    dependency: Optional[str] = Field(description="Task that must be done before this one, or None")
+class TaskDescriptionSchema(BaseModel):
+    title: str = Field(description="Task title, copied exactly from the input")
+    description: str = Field(description="Friendly, specific 1-2 sentence description")
 
-class TimelineSchema(BaseModel):
-    tasks: List[TaskSchema]
+class TaskDescriptionsSchema(BaseModel):
+    tasks: List[TaskDescriptionSchema]
 
 class TimelinePlannerAgent:
-    def __init__(self, client: GeminiClient):
+    # Response cache TTL (seconds). Descriptions only depend on the task list and program.
+    CACHE_TTL = 7 * 24 * 3600
+
+    def __init__(self, client: GeminiClient, describe_with_llm: bool = False):
         self.client = client
+        # Dates always come from the local scheduling engine; Gemini can optionally
+        # rewrite the task descriptions to be more specific to the program
+        self.describe_with_llm = describe_with_llm
 
-    def plan(self, profile: StudentProfile, program: Program, requirements: ProgramRequirements) -> List[Task]:
+    def resolve_deadline(self, program: Program) -> Dict[str, Any]:
         """
-        Generates a timeline of tasks for a specific program application.
+        Works out the deadline to plan against, moving to the next intake if the
+        original one has passed or leaves too little time.
         """
-        from datetime import datetime, timedelta
-        
         today = date.today()
-        today_str = today.isoformat()
         
         # Parse the deadline
         try:
@@ -39,6 +43,7 @@ class TimelinePlannerAgent:
         
         # Check if deadline has passed or not enough time
         intake_adjusted = False
+        adjustment_reason = None
         original_deadline = program.application_deadline
         
         if time_until_deadline.days < 0:
@@ -52,91 +57,188 @@ class TimelinePlannerAgent:
             intake_adjusted = True
             adjustment_reason = f"Only {time_until_deadline.days} days until the {original_deadline} deadline - not enough time for a complete application"
         
-        adjusted_deadline = deadline.isoformat()
-        
-        prompt = f"""
-        You are an expert application advisor creating a realistic, backward-planned timeline.
-        
-        **CRITICAL RULES:**
-        1. ALL task dates MUST be BETWEEN today ({today_str}) and the deadline ({adjusted_deadline})
-        2. NO dates in the past - today is {today_str}
-        3. Work BACKWARDS from the deadline - final tasks should be closest to the deadline
-        4. Be realistic about how long each task takes (e.g., getting LORs takes 2-4 weeks)
-        5. Build in buffer time before the deadline (submit at least 2-3 days early)
-        6. Tasks should be in CHRONOLOGICAL ORDER (earliest date first)
-        
-        **Application Details:**
-        - Program: {program.name} at {program.university}
-        - Application Deadline: {adjusted_deadline}
-        - Today's Date: {today_str}
-        - Days Available: {(deadline - today).days} days
-        
-        **Requirements:**
-        - Required Documents: {requirements.required_documents if requirements.required_documents else 'Standard documents (transcripts, CV, SOP, LORs)'}
-        - Test Requirements: {requirements.test_requirements if requirements.test_requirements else 'Check if GRE/TOEFL needed'}
-        - Special Notes: {requirements.special_notes if requirements.special_notes else 'None'}
+        return {
+            "today": today,
+            "deadline": deadline,
+            "intake_adjusted": intake_adjusted,
+            "adjustment_reason": adjustment_reason
+        }
+
+    def _schedule(self, profile: StudentProfile, requirements: ProgramRequirements, window: Dict[str, Any]) -> List[Task]:
+        graph = build_task_graph(profile, requirements)
+        return schedule(graph, window["today"], window["deadline"])
+
+    def _with_intake_warning(self, tasks: List[Task], window: Dict[str, Any]) -> List[Task]:
+        # If we adjusted the intake, add a warning task
+        if window["intake_adjusted"]:
+            adjusted_deadline = window["deadline"].isoformat()
+            warning_task = Task(
+                title=f"⚠️ Intake Adjusted to {adjusted_deadline}",
+                description=f"{window['adjustment_reason']}. We've automatically planned for the next intake cycle ({adjusted_deadline}). Please verify this date with the university.",
+                due_date=window["today"].isoformat(),
+                dependency=None
+            )
+            tasks.insert(0, warning_task)
+        return tasks
+
+    def _build_description_prompt(self, program: Program, requirements: ProgramRequirements, tasks: List[Task]) -> str:
+        return f"""
+        You are a friendly application advisor. Rewrite the description of each task below so it is
+        specific to this program and encouraging, in 1-2 sentences. Do NOT change titles or dates.
         
-        **Student Context:**
-        - GPA: {profile.gpa}
-        - Target Degree: {profile.target_degree}
-        - Test Scores: {profile.test_scores if profile.test_scores else 'None provided - may need to schedule tests'}
+        **Program:** {program.name} at {program.university}
+        **Required Documents:** {requirements.required_documents}
+        **Test Requirements:** {requirements.test_requirements}
+        **Special Notes:** {requirements.special_notes or 'None'}
         
-        **Generate a timeline with tasks in chronological order (earliest first).** Include:
-        - Verifying specific requirements (if special_notes mentions checking official sources)
-        - Obtaining transcripts and certificates (2-3 weeks)
-        - Preparing CV/Resume (1-2 weeks)
-        - Drafting and finalizing Statement of Purpose (3-4 weeks total)
-        - Requesting and receiving Letters of Recommendation (plan 4-6 weeks from request to receipt)
-        - Taking required tests (only if test_requirements lists them OR student hasn't provided scores)
-        - Completing online application (1 week)
-        - Final review and submission (2-3 days before deadline)
+        **Tasks:**
+        {[f"{task.due_date}: {task.title} - {task.description}" for task in tasks]}
         
-        **Important:** 
-        - Only include tasks that are actually required
-        - Ensure ALL dates are between {today_str} and {adjusted_deadline}
-        - If a task would need to start before today, start it today or as soon as possible
+        Return one entry per task, with the title copied exactly.
         """
 
+    def _apply_descriptions(self, tasks: List[Task], response_text: str) -> List[Task]:
+        data = json.loads(response_text)
+        descriptions = {item.get('title'): item.get('description') for item in data.get('tasks', [])}
+        for task in tasks:
+            if descriptions.get(task.title):
+                task.description = descriptions[task.title]
+        return tasks
+
+    def _describe_next(self, tasks: List[Task], item: Any, start: int) -> Optional[int]:
+        """
+        Applies one streamed description to the first task at or after start with the
+        same title. Returns the position after that task, or None if nothing matched.
+        """
+        if not isinstance(item, dict):
+            return None
+        for i in range(start, len(tasks)):
+            if tasks[i].title == item.get('title'):
+                if item.get('description'):
+                    tasks[i].description = item['description']
+                return i + 1
+        return None
+
+    def _error_tasks(self, error: Exception, window: Dict[str, Any]) -> List[Task]:
+        return [Task(
+            title="Error", 
+            description=f"Failed to generate timeline: {str(error)}", 
+            due_date=window["deadline"].isoformat()
+        )]
+
+    def plan(self, profile: StudentProfile, program: Program, requirements: ProgramRequirements) -> List[Task]:
+        """
+        Generates a backward-planned timeline of tasks for a specific program application.
+        """
+        window = self.resolve_deadline(program)
         try:
-            response_text = self.client.generate_content(
-                prompt=prompt,
-                response_schema=TimelineSchema
-            )
-            data = json.loads(response_text)
-            tasks = []
-            
-            for t_data in data.get('tasks', []):
-                task = Task(**t_data)
-                # Validate task date
-                try:
-                    task_date = datetime.strptime(task.due_date, "%Y-%m-%d").date()
-                    if task_date < today:
-                        # If task is in the past, move it to today
-                        task.due_date = today_str
-                    elif task_date > deadline:
-                        # If task is after deadline, move it to deadline
-                        task.due_date = adjusted_deadline
-                except:
-                    pass  # Keep original date if parsing fails
-                
-                tasks.append(task)
-            
-            # If we adjusted the intake, add a warning task
-            if intake_adjusted:
-                warning_task = Task(
-                    title=f"⚠️ Intake Adjusted to {adjusted_deadline}",
-                    description=f"{adjustment_reason}. We've automatically planned for the next intake cycle ({adjusted_deadline}). Please verify this date with the university.",
-                    due_date=today_str,
-                    dependency=None
+            tasks = self._schedule(profile, requirements, window)
+        except Exception as e:
+            print(f"Error in TimelinePlannerAgent: {e}")
+            return self._error_tasks(e, window)
+
+        if self.describe_with_llm:
+            try:
+                response_text = self.client.generate_content(
+                    prompt=self._build_description_prompt(program, requirements, tasks),
+                    response_schema=TaskDescriptionsSchema,
+                    cache_ttl=self.CACHE_TTL
                 )
-                tasks.insert(0, warning_task)
-            
-            return tasks
-            
+                tasks = self._apply_descriptions(tasks, response_text)
+            except Exception as e:
+                # Keep the built-in descriptions
+                print(f"Error describing timeline in TimelinePlannerAgent: {e}")
+
+        return self._with_intake_warning(tasks, window)
+
+    async def aplan(self, profile: StudentProfile, program: Program, requirements: ProgramRequirements) -> List[Task]:
+        """
+        Async version of plan().
+        """
+        window = self.resolve_deadline(program)
+        try:
+            tasks = self._schedule(profile, requirements, window)
+        except Exception as e:
+            print(f"Error in TimelinePlannerAgent: {e}")
+            return self._error_tasks(e, window)
+
+        if self.describe_with_llm:
+            try:
+                response_text = await self.client.agenerate_content(
+                    prompt=self._build_description_prompt(program, requirements, tasks),
+                    response_schema=TaskDescriptionsSchema,
+                    cache_ttl=self.CACHE_TTL
+                )
+                tasks = self._apply_descriptions(tasks, response_text)
+            except Exception as e:
+                print(f"Error describing timeline in TimelinePlannerAgent: {e}")
+
+        return self._with_intake_warning(tasks, window)
+
+    def stream_plan(self, profile: StudentProfile, program: Program, requirements: ProgramRequirements) -> Iterator[Task]:
+        """
+        Yields the timeline task by task, in the same order plan() returns it.
+        With LLM descriptions, each task is yielded as soon as its description
+        has streamed in instead of after the whole response.
+        """
+        window = self.resolve_deadline(program)
+        try:
+            tasks = self._schedule(profile, requirements, window)
         except Exception as e:
             print(f"Error in TimelinePlannerAgent: {e}")
-            return [Task(
-                title="Error", 
-                description=f"Failed to generate timeline: {str(e)}", 
-                due_date=adjusted_deadline
-            )]
+            yield from self._error_tasks(e, window)
+            return
+
+        yield from self._with_intake_warning([], window)
+        sent = 0
+        if self.describe_with_llm:
+            parser = JSONArrayStream('tasks')
+            try:
+                for chunk in self.client.generate_content_stream(
+                    prompt=self._build_description_prompt(program, requirements, tasks),
+                    response_schema=TaskDescriptionsSchema,
+                    cache_ttl=self.CACHE_TTL
+                ):
+                    for item in parser.feed(chunk):
+                        described = self._describe_next(tasks, item, sent)
+                        if described is not None:
+                            yield from tasks[sent:described]
+                            sent = described
+            except Exception as e:
+                print(f"Error describing timeline in TimelinePlannerAgent: {e}")
+        yield from tasks[sent:]
+
+    async def astream_plan(self, profile: StudentProfile, program: Program, requirements: ProgramRequirements) -> AsyncIterator[Task]:
+        """
+        Async version of stream_plan().
+        """
+        window = self.resolve_deadline(program)
+        try:
+            tasks = self._schedule(profile, requirements, window)
+        except Exception as e:
+            print(f"Error in TimelinePlannerAgent: {e}")
+            for task in self._error_tasks(e, window):
+                yield task
+            return
+
+        for task in self._with_intake_warning([], window):
+            yield task
+        sent = 0
+        if self.describe_with_llm:
+            parser = JSONArrayStream('tasks')
+            try:
+                async for chunk in self.client.agenerate_content_stream(
+                    prompt=self._build_description_prompt(program, requirements, tasks),
+                    response_schema=TaskDescriptionsSchema,
+                    cache_ttl=self.CACHE_TTL
+                ):
+                    for item in parser.feed(chunk):
+                        described = self._describe_next(tasks, item, sent)
+                        if described is not None:
+                            for task in tasks[sent:described]:
+                                yield task
+                            sent = described
+            except Exception as e:
+                print(f"Error describing timeline in TimelinePlannerAgent: {e}")
+        for task in tasks[sent:]:
+            yield task
@@ -1,7 +1,17 @@
 import os
+import csv
+import sys
 import json
+import time
+import asyncio
+import argparse
 import dataclasses
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 from orchestrator import Orchestrator
+from utils.gemini_client import GeminiClient
+from utils.http_client import get_http_client
+from utils.process_pool import get_process_pool
+from utils.rate_limiter import PRIORITY_BATCH
 
 # Helper to serialize dataclasses
 class EnhancedJSONEncoder(json.JSONEncoder):
@@ -10,7 +20,129 @@ class EnhancedJSONEncoder(json.JSONEncoder):
             return dataclasses.asdict(o)
         return super().default(o)
 
-def main():
+
+def _parse_line(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def read_profiles(path: str) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """
+    Yields (id, raw profile) from a JSONL or CSV file. The id comes from an "id" field
+    or column, else the record's position in the file. Empty CSV cells are left out
+    so the profile defaults apply; list and test score cells use the same comma
+    separated text the form accepts (e.g. "Germany, USA", "GRE 320, TOEFL 105").
+    A JSONL line that isn't a JSON object yields (id, None) instead of stopping the batch.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            records = ({k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()} for row in csv.DictReader(f))
+        else:
+            records = (_parse_line(line) for line in f if line.strip())
+        for n, record in enumerate(records, 1):
+            if record is None:
+                print(f"Warning: record {n} of {path} is not a valid JSON object")
+                yield f"row-{n}", None
+                continue
+            yield str(record.pop("id", None) or f"row-{n}"), record
+
+
+def completed_ids(path: str) -> Set[str]:
+    """
+    Ids already planned successfully in an earlier run's output. The output file is the
+    checkpoint: a torn last line from an interrupted run is ignored, and profiles that
+    failed or were planned from fallback data are retried.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and record.get("status") == "ok" and record.get("id") is not None:
+                done.add(record["id"])
+    return done
+
+
+def _ends_torn(path: str) -> bool:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+async def plan_one(orchestrator: Orchestrator, student_id: str, student_data: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.monotonic()
+    try:
+        result = None
+        async for update in orchestrator.arun(student_data):
+            if update["type"] == "result":
+                result = update["data"]
+        if result is None:
+            raise RuntimeError("Plan finished without a result")
+        # Plans with failed programs or fallback data are kept but retried on resume
+        status = "ok" if orchestrator.is_complete(result) else "degraded"
+        record = {"id": student_id, "status": status, "result": result}
+    except Exception as e:
+        record = {"id": student_id, "status": "error", "error": str(e)}
+    record["seconds"] = round(time.monotonic() - started, 2)
+    return record
+
+
+async def run_batch(input_path: str, output_path: str, concurrency: int, program_concurrency: int) -> Dict[str, int]:
+    """
+    Plans every profile in input_path that output_path doesn't already hold, at most
+    `concurrency` students at a time. All students share one Gemini client, so they
+    draw from the same rate-limit budget and response cache. Each result is appended
+    to output_path as soon as it finishes.
+    """
+    done = completed_ids(output_path)
+    pending = ((sid, data) for sid, data in read_profiles(input_path) if sid not in done)
+    counts = {"ok": 0, "degraded": 0, "error": 0, "skipped": len(done)}
+    if done:
+        print(f"Resuming: {len(done)} profiles already planned in {output_path}")
+
+    # Cohort calls yield rate-limit budget to interactive and pipeline work
+    client = GeminiClient(priority=PRIORITY_BATCH)
+    orchestrator = Orchestrator(client=client, program_concurrency=program_concurrency)
+    started = time.monotonic()
+    try:
+        with open(output_path, "a", encoding="utf-8") as out:
+            if _ends_torn(output_path):
+                # Start after the partial line an interrupted run left behind
+                out.write("\n")
+
+            async def worker():
+                # Workers pull from one shared iterator, so a large cohort is never all in memory
+                for student_id, student_data in pending:
+                    if student_data is None:
+                        record = {"id": student_id, "status": "error", "error": "invalid record", "seconds": 0.0}
+                    else:
+                        record = await plan_one(orchestrator, student_id, student_data)
+                    out.write(json.dumps(record, cls=EnhancedJSONEncoder) + "\n")
+                    out.flush()
+                    os.fsync(out.fileno())
+                    counts[record["status"]] += 1
+                    finished = counts["ok"] + counts["degraded"] + counts["error"]
+                    print(f"[{finished}] {student_id}: {record['status']} in {record['seconds']}s "
+                          f"({finished / (time.monotonic() - started) * 60:.1f} profiles/min)")
+
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    finally:
+        await get_http_client().aclose()
+        await client.aclose()
+        get_process_pool().shutdown()
+    return counts
+
+
+def run_demo():
     # Sample Input
     sample_student = {
         "gpa": 3.6,
@@ -18,25 +150,27 @@ def main():
         "countries": ["Germany", "USA"],
         "budget": "Medium",
         "interests": ["Artificial Intelligence", "Machine Learning"],
-        "intake": "Fall 2025",
+        "intake": "Fall 2027",
         "tests": {
             "GRE": "320",
             "TOEFL": "105"
         }
     }
 
-    if not os.environ.get("GEMINI_API_KEY"):
-        print("Error: GEMINI_API_KEY environment variable not set.")
-        return
-
     orchestrator = Orchestrator()
-    results = orchestrator.run(sample_student)
+    # run() streams progress events; the plan itself arrives in the final "result" event
+    results = None
+    for update in orchestrator.run(sample_student):
+        if update["type"] == "status":
+            print(f"[{update['agent']}] {update['message']}")
+        elif update["type"] == "result":
+            results = update["data"]
 
     # Pretty Print Results
     print("\n" + "="*50)
     print("FINAL RESULTS")
     print("="*50)
-    
+
     print(json.dumps(results, cls=EnhancedJSONEncoder, indent=2))
 
     # Save to file
@@ -44,5 +178,30 @@ def main():
         json.dump(results, f, cls=EnhancedJSONEncoder, indent=2)
     print("\nResults saved to output.json")
 
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description="Plan applications for one sample student, or a whole cohort.")
+    parser.add_argument("input", nargs="?", help="JSONL or CSV file of student profiles (omit for the demo)")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="JSONL file results are appended to; also the checkpoint an interrupted run resumes from")
+    parser.add_argument("-c", "--concurrency", type=int, default=int(os.environ.get("BATCH_CONCURRENCY", "8")),
+                        help="Students planned at the same time")
+    parser.add_argument("--program-concurrency", type=int, default=int(os.environ.get("PROGRAM_CONCURRENCY", "3")),
+                        help="Shortlisted programs processed in parallel per student")
+    args = parser.parse_args(argv)
+
+    if not os.environ.get("GEMINI_API_KEY"):
+        print("Error: GEMINI_API_KEY environment variable not set.")
+        return 1
+
+    if args.input is None:
+        run_demo()
+        return 0
+
+    counts = asyncio.run(run_batch(args.input, args.output, args.concurrency, args.program_concurrency))
+    print(f"\nPlanned {counts['ok']} profiles ({counts['degraded']} degraded, {counts['error']} failed, "
+          f"{counts['skipped']} already done) -> {args.output}")
+    return 1 if counts["error"] or counts["degraded"] else 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,68 +1,75 @@
-import json
-from typing import Dict, Any, Generator
+import asyncio
+from typing import Dict, Any, Generator, AsyncGenerator, Optional, Tuple
 from dataclasses import asdict
 from utils.gemini_client import GeminiClient
+from utils.rate_limiter import PRIORITY_PIPELINE
 from agents.profile_intake import ProfileIntakeAgent
 from agents.program_search import ProgramSearchAgent
 from agents.requirements_parser import RequirementsParserAgent
 from agents.timeline_planner import TimelinePlannerAgent
 from agents.checklist_validator import ChecklistValidatorAgent
 from agents.qna_generator import QNAGeneratorAgent
-from models import StudentProfile, Program, ProgramRequirements, Task
-import requests
-from bs4 import BeautifulSoup
-from googlesearch import search
+from models import StudentProfile, Program, ProgramRequirements, QNAPair
+from utils.page_fetcher import PageFetcher
+from utils.crawler import get_crawler, merge_pages
+from utils.program_catalog import get_program_catalog
+from utils.requirements_store import get_requirements_store, content_hash
+from utils.plan_store import get_plan_store
 
 class Orchestrator:
-    def __init__(self):
-        self.client = GeminiClient()
+    def __init__(self, client: GeminiClient = None, program_concurrency: int = 3, timeline_descriptions: bool = False,
+                 batch_window: float = 0.25, search_results: int = 3, program_top_k: int = 3,
+                 priority: int = PRIORITY_PIPELINE):
+        # Agents keep no per-request state, so one Orchestrator can serve many concurrent runs.
+        # priority is the rate-limit priority of the client it creates (ignored when one is passed)
+        self.client = client if client is not None else GeminiClient(priority=priority)
+        # Max number of shortlisted programs processed at the same time
+        self.program_concurrency = max(1, program_concurrency)
         self.profile_agent = ProfileIntakeAgent(self.client)
-        self.search_agent = ProgramSearchAgent(self.client)
-        self.requirements_agent = RequirementsParserAgent(self.client)
-        self.timeline_agent = TimelinePlannerAgent(self.client)
-        self.validator_agent = ChecklistValidatorAgent(self.client)
+        # Number of recommended programs, picked by the vectorized ranker
+        self.search_agent = ProgramSearchAgent(self.client, catalog=get_program_catalog(), top_k=program_top_k)
+        # Parse/validate calls from concurrently processed programs arriving within
+        # batch_window seconds share one Gemini request (0 disables batching)
+        self.requirements_agent = RequirementsParserAgent(self.client, batch_window=batch_window)
+        self.timeline_agent = TimelinePlannerAgent(self.client, describe_with_llm=timeline_descriptions)
+        self.validator_agent = ChecklistValidatorAgent(self.client, batch_window=batch_window)
         self.qna_agent = QNAGeneratorAgent(self.client)
+        self.fetcher = PageFetcher()
+        self.crawler = get_crawler()
+        # Parsed requirements shared across students and runs
+        self.requirements_store = get_requirements_store()
+        # Shortlists, requirements and Q&A reused across equivalent profiles
+        self.plan_store = get_plan_store()
+        # Search results raced for each program's landing page
+        self.search_results = max(1, search_results)
+        self._loop = None
 
-    def _fetch_program_details_real(self, program: Program) -> str:
+    async def _fetch_program_details_real(self, program: Program) -> Tuple[str, Optional[str], str]:
         """
-        Uses Google Search to find the program page and extracts text.
+        Uses Google Search to find candidate program pages, takes the first relevant one
+        to arrive (hedged across the top results), then crawls its requirement and
+        deadline subpages and merges their text. Searches and pages go through the
+        persistent page cache. Returns the text, the URL it came from (None for
+        simulated text) and a hash of the landing page's text. The merged text depends on
+        which result wins the race and which subpages fit the time budget, so it is not
+        hashed itself.
         """
         query = f"{program.university} {program.name} admission requirements"
         try:
-            # Search for the first result
-            results = list(search(query, num_results=1, advanced=True))
-            if not results:
-                return "No results found."
+            urls = await self.fetcher.resolve(query, num_results=self.search_results)
+            if not urls:
+                raise LookupError(f"No search results for {query}")
             
-            url = results[0].url
-            
-            # Fetch page content
-            headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-            response = requests.get(url, headers=headers, timeout=10)
-            response.raise_for_status()
-            
-            # Extract text
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove scripts and styles
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            text = soup.get_text()
-            
-            # Clean up text (simple)
-            lines = (line.strip() for line in text.splitlines())
-            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-            text = '\n'.join(chunk for chunk in chunks if chunk)
-            
-            # Limit length for Gemini
-            return text[:10000] 
+            pages = await self.crawler.crawl(urls)
+            text = merge_pages(pages, max_chars=self.requirements_agent.MAX_CONTENT_CHARS)
+            return text, pages[0].final_url or pages[0].url, content_hash(pages[0].text)
             
         except Exception as e:
             # Fall back to mock data if scraping fails
-            return self._fetch_program_details_mock(program)
+            text = await self._fetch_program_details_mock(program)
+            return text, None, content_hash(text)
 
-    def _fetch_program_details_mock(self, program: Program) -> str:
+    async def _fetch_program_details_mock(self, program: Program) -> str:
         """
         Simulates fetching program details page content.
         """
@@ -76,68 +83,189 @@ class Orchestrator:
         transcripts, and any specific deadlines or special notes.
         Make it look like raw text copied from a website.
         """
-        return self.client.generate_content(prompt)
+        # Admission pages change a few times a year, so the simulated page can be reused for a month
+        return await self.client.agenerate_content(prompt, cache_ttl=30 * 24 * 3600)
+
+    async def _requirements_for(self, profile: StudentProfile, prog: Program, events: asyncio.Queue) -> ProgramRequirements:
+        """
+        Returns the program's requirements from the shared store while fresh. Otherwise fetches
+        the page and re-parses it only if its content changed since it was last parsed.
+        Only requirements parsed from a real page are stored; if the re-check fails, the
+        stored entry is kept and served.
+        """
+        stored = await self.requirements_store.aget(prog.university, prog.name, profile.target_intake)
+        if stored is not None and stored.fresh:
+            await events.put({"type": "status", "agent": "RequirementsParser", "message": f"Using known requirements for {prog.university}..."})
+            return stored.requirements
+
+        await events.put({"type": "status", "agent": "RequirementsParser", "message": f"Fetching requirements for {prog.university}..."})
+        # Fetch details (Real or Mock)
+        raw_text, source_url, page_hash = await self._fetch_program_details_real(prog)
+        if stored is not None and source_url is None:
+            # The page could not be fetched: simulated text is no reason to replace what we know
+            await self.requirements_store.amark_unverified(prog.university, prog.name, profile.target_intake)
+            return stored.requirements
+        if stored is not None and stored.content_hash == page_hash:
+            await self.requirements_store.amark_unchanged(prog.university, prog.name, profile.target_intake)
+            return stored.requirements
+
+        # Parse Requirements
+        await events.put({"type": "status", "agent": "RequirementsParser", "message": f"Extracting requirements for {prog.name}..."})
+        reqs = await self.requirements_agent.aparse(prog.name, raw_text)
+        if self.requirements_agent.is_error(reqs):
+            if stored is not None:
+                await self.requirements_store.amark_unverified(prog.university, prog.name, profile.target_intake)
+                return stored.requirements
+        elif source_url is not None:
+            await self.requirements_store.aput(prog.university, prog.name, profile.target_intake, reqs, source_url, page_hash)
+        return reqs
+
+    async def _process_program(self, index: int, profile: StudentProfile, prog: Program, events: asyncio.Queue,
+                               known_reqs: Optional[ProgramRequirements] = None) -> Dict[str, Any]:
+        """
+        Runs fetch -> parse -> plan -> validate for one program, pushing status
+        updates and each timeline task onto the shared event queue as it goes.
+        Requirements from a replayed plan skip fetch and parse.
+        """
+        try:
+            reqs = known_reqs if known_reqs is not None else await self._requirements_for(profile, prog, events)
+            
+            # Plan Timeline
+            await events.put({"type": "status", "agent": "TimelinePlanner", "message": f"Planning timeline for {prog.university}..."})
+            timeline = []
+            async for task in self.timeline_agent.astream_plan(profile, prog, reqs):
+                timeline.append(task)
+                await events.put({"type": "timeline_task", "index": index, "program": prog.university, "data": asdict(task)})
+            
+            # Validate
+            await events.put({"type": "status", "agent": "ChecklistValidator", "message": f"Validating application plan for {prog.university}..."})
+            deadline = self.timeline_agent.resolve_deadline(prog)["deadline"]
+            warnings = await self.validator_agent.avalidate(timeline, reqs, deadline)
+            
+            return {
+                "program": asdict(prog),
+                "requirements": asdict(reqs),
+                "timeline": [asdict(t) for t in timeline],
+                "warnings": warnings
+            }
+        except Exception as e:
+            # Log error but continue processing other programs
+            print(f"Error processing {prog.university}: {e}")
+            return {
+                "program": asdict(prog),
+                "error": str(e)
+            }
+
+    def is_complete(self, results: Dict[str, Any]) -> bool:
+        """
+        False for plans built on fallbacks or failed steps: they are not replayed to other
+        students, and batch runs retry them.
+        """
+        shortlist = results["shortlist"]
+        qna = results["qna_questions"]
+        return bool(shortlist) and bool(qna) and not self.qna_agent.is_fallback(qna) and all(
+            "error" not in r
+            and r["program"]["university"] != self.search_agent.FALLBACK_UNIVERSITY
+            and not self.requirements_agent.is_error(ProgramRequirements(**r["requirements"]))
+            for r in shortlist
+        )
 
     def run(self, student_data: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
+        """
+        Synchronous wrapper around arun() for scripts and the CLI.
+        Drives the async pipeline on a private event loop owned by this orchestrator.
+        """
+        if self._loop is None:
+            self._loop = asyncio.new_event_loop()
+        
+        updates = self.arun(student_data)
+        try:
+            while True:
+                try:
+                    yield self._loop.run_until_complete(updates.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            self._loop.run_until_complete(updates.aclose())
+
+    async def arun(self, student_data: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
         yield {"type": "status", "agent": "ProfileIntake", "message": "Analyzing student profile..."}
         
         # 1. Process Profile
-        profile = self.profile_agent.process(student_data)
+        profile = await self.profile_agent.aprocess(student_data)
         yield {"type": "status", "agent": "ProgramSearch", "message": f"Searching programs for {profile.target_degree}..."}
 
-        # 2. Search Programs
-        programs = self.search_agent.search(profile)
+        # 2. Search Programs, or reuse the plan of an equivalent profile (timelines and
+        # validation are date-relative, so they are recomputed either way)
+        fingerprint = self.plan_store.fingerprint(profile)
+        plan = await self.plan_store.aget(fingerprint)
+        if plan is None:
+            programs = await self.search_agent.asearch(profile)
+            known_reqs = [None] * len(programs)
+        else:
+            programs = [Program(**p) for p in plan["programs"]]
+            known_reqs = [ProgramRequirements(**r) for r in plan["requirements"]]
         yield {"type": "status", "agent": "ProgramSearch", "message": f"Found {len(programs)} top matches."}
 
         results = {
             "profile": profile,
-            "shortlist": []
+            "shortlist": [None] * len(programs)
         }
 
-        # 3. Process each program
-        for i, prog in enumerate(programs):
-            yield {"type": "status", "agent": "RequirementsParser", "message": f"Fetching requirements for {prog.university}..."}
-            
+        # 3. Process programs concurrently; each one is streamed as soon as it is ready
+        events = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.program_concurrency)
+
+        async def process(i: int, prog: Program):
+            prog_result = {"program": asdict(prog), "error": "Processing was interrupted"}
             try:
-                # Fetch details (Real or Mock)
-                raw_text = self._fetch_program_details_real(prog)
-                
-                # Parse Requirements
-                yield {"type": "status", "agent": "RequirementsParser", "message": f"Extracting requirements for {prog.name}..."}
-                reqs = self.requirements_agent.parse(prog.name, raw_text)
-                
-                # Plan Timeline
-                yield {"type": "status", "agent": "TimelinePlanner", "message": f"Planning timeline for {prog.university}..."}
-                timeline = self.timeline_agent.plan(profile, prog, reqs)
-                
-                # Validate
-                yield {"type": "status", "agent": "ChecklistValidator", "message": "Validating application plan..."}
-                warnings = self.validator_agent.validate(timeline, reqs)
-                
-                prog_result = {
-                    "program": asdict(prog),
-                    "requirements": asdict(reqs),
-                    "timeline": [asdict(t) for t in timeline],
-                    "warnings": warnings
-                }
-                results["shortlist"].append(prog_result)
-            except Exception as e:
-                # Log error but continue processing other programs
-                results["shortlist"].append({
-                    "program": asdict(prog),
-                    "error": str(e)
-                })
+                async with semaphore:
+                    prog_result = await self._process_program(i, profile, prog, events, known_reqs[i])
+            finally:
+                # Always report the program, so the loop below never waits on one that died
+                results["shortlist"][i] = prog_result
+                events.put_nowait({"type": "program_result", "index": i, "data": prog_result})
+
+        tasks = [asyncio.ensure_future(process(i, prog)) for i, prog in enumerate(programs)]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                event = await events.get()
+                if event["type"] == "program_result":
+                    remaining -= 1
+                yield event
+        finally:
+            # Only reached with pending tasks if the consumer stopped listening early
+            for task in tasks:
+                task.cancel()
 
         # Convert profile to dict as well
         results["profile"] = asdict(profile)
         
         # Generate Q&A pairs (single API call - free tier safe)
         yield {"type": "status", "agent": "QNAGenerator", "message": "Generating helpful Q&A for your journey..."}
+        qna_pairs = []
         try:
-            qna_pairs = self.qna_agent.generate_questions(profile, programs)
+            if plan is not None:
+                for pair in plan["qna"]:
+                    qna_pairs.append(QNAPair(**pair))
+                    yield {"type": "qna_pair", "index": len(qna_pairs) - 1, "data": pair}
+            else:
+                # Each pair is sent as soon as the model has written it
+                async for pair in self.qna_agent.astream_questions(profile, programs):
+                    qna_pairs.append(pair)
+                    yield {"type": "qna_pair", "index": len(qna_pairs) - 1, "data": asdict(pair)}
             results["qna_questions"] = [asdict(q) for q in qna_pairs]
         except Exception as e:
             print(f"Error generating Q&A: {e}")
             results["qna_questions"] = []  # Empty list on error, non-blocking
         
+        if plan is None and self.is_complete(results):
+            self.plan_store.put(
+                fingerprint,
+                programs=[r["program"] for r in results["shortlist"]],
+                requirements=[r["requirements"] for r in results["shortlist"]],
+                qna=results["qna_questions"]
+            )
+
         yield {"type": "result", "data": results}
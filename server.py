@@ -1,17 +1,62 @@
 import os
 import uvicorn
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request, Header
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Dict, Optional, Any
 from orchestrator import Orchestrator
 from agents.resume_parser import ResumeParserAgent
-from utils.gemini_client import GeminiClient
-import io
-import pypdf
+from utils.gemini_client import GeminiClient, get_llm_cache, get_llm_flights
+from utils.page_cache import get_page_cache
+from utils.page_fetcher import get_fetch_flights
+from utils.http_client import get_http_client
+from utils.rate_limiter import get_rate_limiter
+from utils.crawler import get_crawler
+from utils.program_catalog import get_program_catalog
+from utils.requirements_store import get_requirements_store
+from utils.plan_store import get_plan_store
+from utils.pdf_text import MAX_PDF_BYTES, PdfRejected, aextract_text, get_resume_cache
+from utils.process_pool import PoolTimeout, get_process_pool
+from utils.run_log import RunLog, get_run_registry, parse_event_id
+import hashlib
 
-app = FastAPI(title="MS Application Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Builds the Gemini client, orchestrator and agents once per worker and shares
+    them across requests, so per-request setup and socket churn go away.
+    """
+    client = None
+    app.state.orchestrator = None
+    app.state.resume_agent = None
+    if os.environ.get("GEMINI_API_KEY"):
+        client = GeminiClient()
+        app.state.orchestrator = Orchestrator(
+            client=client,
+            program_concurrency=int(os.environ.get("PROGRAM_CONCURRENCY", "3")),
+            timeline_descriptions=os.environ.get("TIMELINE_LLM_DESCRIPTIONS") == "1",
+            batch_window=float(os.environ.get("LLM_BATCH_WINDOW", "0.25")),
+            search_results=int(os.environ.get("FETCH_SEARCH_RESULTS", "3")),
+            program_top_k=int(os.environ.get("PROGRAM_TOP_K", "3"))
+        )
+        app.state.resume_agent = ResumeParserAgent(client)
+        await client.awarmup()
+    else:
+        print("GEMINI_API_KEY not set - API endpoints will return 500")
+
+    await get_process_pool().awarmup()
+
+    yield
+
+    await get_run_registry().aclose()
+    await get_http_client().aclose()
+    get_process_pool().shutdown()
+    if client is not None:
+        await client.aclose()
+
+app = FastAPI(title="MS Application Agent API", lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -49,21 +94,16 @@ async def parse_resume(request: ResumeTextRequest):
     print("[SERVER DEBUG] Parse resume endpoint called")
     print(f"[SERVER DEBUG] Request text length: {len(request.text)}")
     
-    if not os.environ.get("GEMINI_API_KEY"):
+    agent = app.state.resume_agent
+    if agent is None:
         print("[SERVER DEBUG] GEMINI_API_KEY not found")
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not set")
-    
-    print("[SERVER DEBUG] API key found, initializing client")
+    if len(request.text) > agent.MAX_TEXT_CHARS:
+        raise HTTPException(status_code=413, detail=f"Resume text is longer than {agent.MAX_TEXT_CHARS} characters")
     
     try:
-        # Parse with AI
-        print("[SERVER DEBUG] Creating GeminiClient")
-        client = GeminiClient()
-        print("[SERVER DEBUG] Creating ResumeParserAgent")
-        agent = ResumeParserAgent(client)
-        print("[SERVER DEBUG] Calling agent.parse()")
-        # Limit text to 5000 chars as requested
-        parsed_data = agent.parse(request.text[:5000])
+        print("[SERVER DEBUG] Calling agent.aparse()")
+        parsed_data = await agent.aparse(request.text)
         
         print(f"[SERVER DEBUG] Parse result: {parsed_data}")
         return {"success": True, "data": parsed_data}
@@ -74,38 +114,135 @@ async def parse_resume(request: ResumeTextRequest):
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+@app.post("/api/upload-resume")
+async def upload_resume(request: Request, file: UploadFile = File(...)):
+    """
+    Parses an uploaded PDF resume. The upload is read in chunks, hashed and size-checked
+    as it comes in, so an oversized file is rejected early; the accepted file (at most
+    MAX_PDF_BYTES) is then held in memory and sent to a worker process for text extraction.
+    Extracted text and the parse result are cached by the file's content hash, so
+    re-uploads return at once.
+    """
+    agent = app.state.resume_agent
+    if agent is None:
+        raise HTTPException(status_code=500, detail="GEMINI_API_KEY not set")
+    too_large = HTTPException(status_code=413, detail=f"PDF is larger than {MAX_PDF_BYTES // (1024 * 1024)} MB")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_PDF_BYTES + UPLOAD_CHUNK_SIZE:
+        raise too_large
+
+    digest = hashlib.sha256()
+    chunks, size = [], 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_PDF_BYTES:
+            raise too_large
+        digest.update(chunk)
+        chunks.append(chunk)
+    data = b"".join(chunks)
+    if not data.startswith(b"%PDF"):
+        raise HTTPException(status_code=415, detail="Only PDF files are supported")
+
+    cache = get_resume_cache()
+    parsed_key = f"parsed:{digest.hexdigest()}"
+    parsed_data = await cache.aget(parsed_key)
+    if parsed_data is not None:
+        return {"success": True, "data": parsed_data, "cached": True}
+
+    try:
+        text = await aextract_text(data, digest.hexdigest())
+    except PdfRejected as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except PoolTimeout:
+        raise HTTPException(status_code=504, detail="Reading the PDF took too long")
+    if not text:
+        raise HTTPException(status_code=422, detail="No text found in PDF (scanned resumes are not supported)")
+
+    if len(text) > agent.MAX_TEXT_CHARS:
+        raise HTTPException(status_code=413, detail=f"Resume text is longer than {agent.MAX_TEXT_CHARS} characters")
+
+    parsed_data = await agent.aparse(text)
+    if parsed_data:
+        # An empty result means the parse failed; let the next upload retry it
+        cache.set(parsed_key, parsed_data)
+    return {"success": True, "data": parsed_data, "cached": False}
+
+def stream_run(run: RunLog, after: int = -1) -> StreamingResponse:
+    """
+    Streams a run's events as SSE, each with an "<run id>:<sequence>" id, starting
+    after sequence `after`: missed events are replayed, then live ones follow.
+    """
+    async def event_generator():
+        backlog = len(run.events)
+        follower = run.follow(after)
+        try:
+            async for seq, (event_type, payload) in follower:
+                yield f"id: {run.run_id}:{seq}\ndata: {payload}\n\n"
+                # Small delay so live status updates stay readable; streamed content and replays go out immediately
+                if event_type == "status" and seq >= backlog:
+                    await asyncio.sleep(0.1)
+        finally:
+            # Runs when the client disconnects, so the run knows it lost a listener
+            await follower.aclose()
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers={"X-Run-Id": run.run_id})
+
 # API Endpoint
 @app.post("/api/generate-plan-stream")
 async def generate_plan_stream(profile: StudentProfileRequest):
-    if not os.environ.get("GEMINI_API_KEY"):
+    orchestrator = app.state.orchestrator
+    if orchestrator is None:
         raise HTTPException(status_code=500, detail="GEMINI_API_KEY not set")
 
-    async def event_generator():
-        try:
-            # Convert Pydantic model to dict for Orchestrator
-            student_data = profile.model_dump()
-            
-            # Initialize Orchestrator
-            orchestrator = Orchestrator()
-            
-            # Run Agent Workflow (Generator)
-            for update in orchestrator.run(student_data):
-                # Helper to serialize Pydantic models
-                def pydantic_encoder(obj):
-                    if hasattr(obj, 'dict'):
-                        return obj.dict()
-                    return str(obj)
-
-                # Yield SSE format
-                yield f"data: {json.dumps(update, default=pydantic_encoder)}\n\n"
-                # Small delay to ensure UI updates are visible
-                await asyncio.sleep(0.1)
-                
-        except Exception as e:
-            error_msg = {"type": "error", "message": str(e)}
-            yield f"data: {json.dumps(error_msg)}\n\n"
-
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+    # The run is driven in the background, so a dropped connection can reattach to it
+    run = get_run_registry().start(orchestrator.arun(profile.model_dump()))
+    return stream_run(run)
+
+@app.get("/api/runs/{run_id}/events")
+async def run_events(run_id: str, last_event_id: Optional[str] = Header(None), after: int = -1):
+    """
+    Reconnects to a run: replays the events after Last-Event-ID (or ?after=<sequence>)
+    and then follows the run live, or ends if it has already finished.
+    """
+    run = get_run_registry().get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired run")
+    event_run_id, seq = parse_event_id(last_event_id)
+    if event_run_id == run_id:
+        after = seq
+    return stream_run(run, after)
+
+# Metrics Endpoint
+@app.get("/api/metrics")
+async def metrics():
+    orchestrator = app.state.orchestrator
+    batchers, intake = {}, {}
+    if orchestrator is not None:
+        intake = dict(orchestrator.profile_agent.stats)
+        for name, agent in (("requirements", orchestrator.requirements_agent), ("validation", orchestrator.validator_agent)):
+            if agent.batcher is not None:
+                batchers[name] = agent.batcher.get_stats()
+    return {
+        "llm_cache": get_llm_cache().get_stats(),
+        "page_cache": get_page_cache().get_stats(),
+        "rate_limiter": get_rate_limiter().get_stats(),
+        "llm_single_flight": get_llm_flights().get_stats(),
+        "fetch_single_flight": get_fetch_flights().get_stats(),
+        "crawler": get_crawler().get_stats(),
+        "program_catalog": get_program_catalog().get_stats(),
+        "requirements_store": get_requirements_store().get_stats(),
+        "plan_store": get_plan_store().get_stats(),
+        "resume_cache": get_resume_cache().get_stats(),
+        "process_pool": get_process_pool().get_stats(),
+        "runs": get_run_registry().get_stats(),
+        "llm_batching": batchers,
+        "profile_intake": intake
+    }
 
 # Legacy Endpoint (Optional, kept for compatibility if needed)
 @app.post("/api/generate-plan")
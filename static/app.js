@@ -155,13 +155,15 @@ document.addEventListener('DOMContentLoaded', async () => {
     const autoFillBtn = document.getElementById('autoFillBtn');
     const resumeText = document.getElementById('resumeText');
     const uploadStatus = document.getElementById('uploadStatus');
+    const uploadPdfBtn = document.getElementById('uploadPdfBtn');
+    const resumeFile = document.getElementById('resumeFile');
     const charCount = document.querySelector('.char-count');
 
     if (resumeText && charCount) {
         resumeText.addEventListener('input', () => {
             const currentLength = resumeText.value.length;
-            charCount.textContent = `${currentLength}/5000`;
-            if (currentLength > 5000) {
+            charCount.textContent = `${currentLength}/10000`;
+            if (currentLength > 10000) {
                 charCount.style.color = 'var(--error-color)';
             } else {
                 charCount.style.color = 'var(--text-tertiary)';
@@ -176,29 +178,51 @@ document.addEventListener('DOMContentLoaded', async () => {
                 alert("Please paste your resume text first.");
                 return;
             }
-            if (text.length > 5000) {
-                alert("Text is too long. Please limit to 5000 characters.");
+            if (text.length > 10000) {
+                alert("Text is too long. Please limit to 10000 characters.");
                 return;
             }
-            await handleResumeParse(text);
+            await handleResumeParse('/api/parse-resume', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json'
+                },
+                body: JSON.stringify({ text: text })
+            });
+        });
+    }
+
+    if (uploadPdfBtn && resumeFile) {
+        uploadPdfBtn.addEventListener('click', () => resumeFile.click());
+        resumeFile.addEventListener('change', async () => {
+            const file = resumeFile.files[0];
+            if (!file) return;
+            if (file.size > 5 * 1024 * 1024) {
+                alert("PDF is too large. Please upload a file under 5 MB.");
+                resumeFile.value = '';
+                return;
+            }
+            // The browser sets the multipart boundary itself
+            const formData = new FormData();
+            formData.append('file', file);
+            await handleResumeParse('/api/upload-resume', { method: 'POST', body: formData });
+            resumeFile.value = '';
         });
     }
 
-    async function handleResumeParse(text) {
+    async function handleResumeParse(url, options) {
         uploadStatus.textContent = "Parsing resume... ⏳";
         uploadStatus.className = "upload-status";
         autoFillBtn.disabled = true;
+        if (uploadPdfBtn) uploadPdfBtn.disabled = true;
 
         try {
-            const response = await fetch('/api/parse-resume', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ text: text })
-            });
+            const response = await fetch(url, options);
 
-            if (!response.ok) throw new Error("Parsing failed");
+            if (!response.ok) {
+                const error = await response.json().catch(() => ({}));
+                throw new Error(error.detail || "Parsing failed");
+            }
 
             const result = await response.json();
             if (result.success && result.data) {
@@ -210,10 +234,11 @@ document.addEventListener('DOMContentLoaded', async () => {
             }
         } catch (error) {
             console.error(error);
-            uploadStatus.textContent = "Failed to parse ❌";
+            uploadStatus.textContent = `Failed to parse: ${error.message} ❌`;
             uploadStatus.className = "upload-status error";
         } finally {
             autoFillBtn.disabled = false;
+            if (uploadPdfBtn) uploadPdfBtn.disabled = false;
         }
     }
 
@@ -268,6 +293,13 @@ document.addEventListener('DOMContentLoaded', async () => {
         // Reset Flow Visualization
         resetAgents(); // Renamed from resetAgentFlow to match existing function
 
+        // Reset streamed program cards from any previous run
+        allProgramsData = [];
+        currentProgramIndex = 0;
+        pendingTimelines = {};
+        streamedQNA = [];
+        programsList.innerHTML = '';
+
         // Collect Data
         const formData = collectFormData();
 
@@ -294,7 +326,50 @@ document.addEventListener('DOMContentLoaded', async () => {
         };
     }
 
+    const MAX_RECONNECTS = 5;
+
+    // Reads an SSE stream, handing each complete event to onEvent. Chunks can end
+    // mid-event, so the unfinished tail is kept until the rest arrives.
+    async function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const block of events) {
+                let id = null;
+                const dataLines = [];
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('id: ')) id = line.substring(4);
+                    else if (line.startsWith('data: ')) dataLines.push(line.substring(6));
+                }
+                if (!dataLines.length) continue;
+                try {
+                    onEvent(id, JSON.parse(dataLines.join('\n')));
+                } catch (e) {
+                    console.error("Error parsing stream data", e);
+                }
+            }
+        }
+    }
+
     async function startPlanGeneration(formData) {
+        // Event ids are "<run id>:<sequence>"; the last one seen is where a reconnect resumes
+        let lastEventId = null;
+        let finished = false;
+        const onEvent = (id, data) => {
+            if (id) lastEventId = id;
+            if (data.type === 'result' || data.type === 'error') finished = true;
+            handleStreamUpdate(data);
+        };
+
         try {
             const response = await fetch('/api/generate-plan-stream', {
                 method: 'POST',
@@ -308,30 +383,41 @@ document.addEventListener('DOMContentLoaded', async () => {
                 throw new Error('API request failed');
             }
 
-            const reader = response.body.getReader();
-            const decoder = new TextDecoder();
-
-            while (true) {
-                const { value, done } = await reader.read();
-                if (done) break;
-
-                const chunk = decoder.decode(value);
-                const lines = chunk.split('\n\n');
-
-                for (const line of lines) {
-                    if (line.startsWith('data: ')) {
-                        const jsonStr = line.substring(6);
-                        try {
-                            const data = JSON.parse(jsonStr);
-                            handleStreamUpdate(data);
-                        } catch (e) {
-                            console.error("Error parsing stream data", e);
-                        }
-                    }
-                }
-            }
+            await readEventStream(response, onEvent);
         } catch (error) {
-            alert('Error generating plan: ' + error.message);
+            console.error(error);
+            if (!lastEventId) {
+                alert('Error generating plan: ' + error.message);
+                setLoading(false);
+                return;
+            }
+        }
+
+        // The connection dropped before the plan finished: reattach to the same run,
+        // which kept going on the server, and replay only the events we missed
+        let attempts = 0;
+        while (!finished && lastEventId && attempts < MAX_RECONNECTS) {
+            attempts++;
+            statusMessage.textContent = `Connection lost, reconnecting (${attempts}/${MAX_RECONNECTS})...`;
+            await new Promise(resolve => setTimeout(resolve, 1000 * attempts));
+            try {
+                const runId = lastEventId.split(':')[0];
+                const response = await fetch(`/api/runs/${runId}/events`, {
+                    headers: { 'Last-Event-ID': lastEventId }
+                });
+                if (response.status === 404) break;
+                if (!response.ok) continue;
+                await readEventStream(response, (id, data) => {
+                    attempts = 0;
+                    onEvent(id, data);
+                });
+            } catch (error) {
+                console.error(error);
+            }
+        }
+
+        if (!finished) {
+            alert('Error generating plan: the connection to the server was lost.');
             setLoading(false);
         }
     }
@@ -354,6 +440,8 @@ document.addEventListener('DOMContentLoaded', async () => {
         // Reset global state
         allProgramsData = [];
         currentProgramIndex = 0;
+        pendingTimelines = {};
+        streamedQNA = [];
 
         currentStep = 1;
         showStep(1);
@@ -373,6 +461,14 @@ document.addEventListener('DOMContentLoaded', async () => {
     function handleStreamUpdate(data) {
         if (data.type === 'status') {
             updateAgentStatus(data.agent, data.message);
+        } else if (data.type === 'timeline_task') {
+            addTimelineTask(data);
+        } else if (data.type === 'program_result') {
+            addProgramResult(data.data);
+        } else if (data.type === 'qna_pair') {
+            streamedQNA[data.index] = data.data;
+            renderQNA(streamedQNA.filter(Boolean));
+            qnaBar.classList.remove('hidden');
         } else if (data.type === 'result') {
             renderResults(data.data);
             resultsArea.classList.remove('hidden');
@@ -429,6 +525,9 @@ document.addEventListener('DOMContentLoaded', async () => {
     // Global variable to store all programs data
     let allProgramsData = [];
     let currentProgramIndex = 0;
+    // Timelines and Q&A pairs still streaming in
+    let pendingTimelines = {};
+    let streamedQNA = [];
 
     function renderResults(data) {
         if (!data.shortlist || data.shortlist.length === 0) {
@@ -436,15 +535,23 @@ document.addEventListener('DOMContentLoaded', async () => {
             return;
         }
 
-        // Store data globally
-        allProgramsData = data.shortlist;
-        currentProgramIndex = 0;
+        // Store data globally (in shortlist order), keeping the card the user is viewing
+        const viewing = allProgramsData[currentProgramIndex];
+        allProgramsData = data.shortlist.filter(item => !item.error);
+        currentProgramIndex = viewing
+            ? Math.max(0, allProgramsData.findIndex(item => item.program.university === viewing.program.university && item.program.name === viewing.program.name))
+            : 0;
+
+        if (allProgramsData.length === 0) {
+            programsList.innerHTML = '<p>No programs found.</p>';
+            return;
+        }
 
         // Render university pills
         renderUniversityPills();
 
-        // Render first program
-        renderSingleProgram(0);
+        // Render selected program
+        renderSingleProgram(currentProgramIndex);
 
         // Show export button
         const exportBtn = document.getElementById('exportBtn');
@@ -453,6 +560,50 @@ document.addEventListener('DOMContentLoaded', async () => {
         }
     }
 
+    // Show each program card as soon as the backend finishes it
+    function addProgramResult(item) {
+        if (item.error) return;
+
+        allProgramsData.push(item);
+        resultsArea.classList.remove('hidden');
+        renderUniversityPills();
+        if (allProgramsData.length === 1) {
+            renderSingleProgram(0);
+        }
+    }
+
+    // Preview a timeline while its tasks stream in, until the first program card is ready
+    function addTimelineTask(event) {
+        const pending = pendingTimelines[event.index] || (pendingTimelines[event.index] = { university: event.program, tasks: [] });
+        pending.tasks.push(event.data);
+        if (allProgramsData.length > 0) return;
+
+        resultsArea.classList.remove('hidden');
+        programsList.innerHTML = `
+                <div class="program-card">
+                    <div class="program-header">
+                        <div class="program-title">
+                            <h3>${pending.university}</h3>
+                            <p class="program-uni">Planning timeline...</p>
+                        </div>
+                    </div>
+                    <div class="timeline-section">
+                        <h4>📅 Application Timeline</h4>
+                        <ul class="timeline-list">
+                            ${pending.tasks.map(task => `
+                            <li class="timeline-item">
+                                <div class="timeline-icon">📅</div>
+                                <div class="timeline-content">
+                                    <span class="task-date">${task.due_date}</span>
+                                    <span class="task-title">${task.title}</span>
+                                </div>
+                            </li>`).join('')}
+                        </ul>
+                    </div>
+                </div>
+            `;
+    }
+
     function renderUniversityPills() {
         const pillsContainer = document.getElementById('universityPills');
         pillsContainer.innerHTML = '';
@@ -460,7 +611,7 @@ document.addEventListener('DOMContentLoaded', async () => {
         allProgramsData.forEach((item, index) => {
             const prog = item.program;
             const pill = document.createElement('div');
-            pill.className = `university-pill ${index === 0 ? 'active' : ''}`;
+            pill.className = `university-pill ${index === currentProgramIndex ? 'active' : ''}`;
             pill.dataset.index = index;
 
             // Country flag mapping
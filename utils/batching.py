@@ -0,0 +1,80 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+class MicroBatcher:
+    """
+    Coalesces items submitted close together into one batch call.
+
+    The first item opens a short collection window; everything submitted before it
+    closes (or until max_batch items are waiting) is handed to batch_fn as one list,
+    and each caller gets back the result at its own position. Pending items are kept
+    per event loop, since the futures belong to the loop that created them.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Awaitable[List[Any]]],
+                 window: float = 0.25, max_batch: int = 8):
+        self.batch_fn = batch_fn
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._pending = weakref.WeakKeyDictionary()
+        self._timers = weakref.WeakKeyDictionary()
+        self._running = set()
+        self.stats = {"items": 0, "batches": 0, "largest_batch": 0, "cancelled_items": 0, "cancelled_batches": 0}
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._pending.setdefault(loop, [])
+        pending.append((item, future))
+        self.stats["items"] += 1
+        if len(pending) >= self.max_batch:
+            self._flush(loop)
+        elif len(pending) == 1:
+            self._timers[loop] = loop.call_later(self.window, self._flush, loop)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            self.stats["cancelled_items"] += 1
+            raise
+
+    def _flush(self, loop: asyncio.AbstractEventLoop):
+        timer = self._timers.pop(loop, None)
+        if timer is not None:
+            timer.cancel()
+        # Callers that gave up while waiting for the window don't need a result
+        batch = [(item, future) for item, future in self._pending.pop(loop, []) if not future.cancelled()]
+        if batch:
+            task = loop.create_task(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+            for _, future in batch:
+                future.add_done_callback(lambda _future: self._cancel_if_abandoned(task, batch))
+
+    def _cancel_if_abandoned(self, task: asyncio.Task, batch: List):
+        # Nobody is waiting for any result of the batch any more, so drop the call
+        if not task.done() and all(future.cancelled() for _, future in batch):
+            self.stats["cancelled_batches"] += 1
+            task.cancel()
+
+    async def _run(self, batch: List):
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+        try:
+            results = await self.batch_fn([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"Batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["avg_batch_size"] = round(stats["items"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
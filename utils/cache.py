@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import queue
+import atexit
+import asyncio
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def cache_path(filename: str) -> str:
+    """
+    Returns a path inside the on-disk cache directory (MS_AGENT_CACHE_DIR, default ".cache").
+    """
+    directory = os.environ.get("MS_AGENT_CACHE_DIR", ".cache")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
+
+class TieredCache:
+    """
+    Key/value cache with an in-memory LRU tier in front of a persistent SQLite tier.
+    Values must be JSON-serializable. Every entry carries its own TTL in seconds.
+    Pass path=None for a memory-only cache.
+
+    Writes go to the memory tier at once and are persisted by a background writer
+    thread with its own connection, which groups whatever is queued into one commit;
+    reads never wait for a disk write. Disk access times (for LRU eviction) are
+    recorded in memory and written with the next batch. flush() waits for pending
+    writes, and runs at interpreter exit.
+    """
+
+    # Recorded access times that make the writer flush even without a pending write
+    TOUCH_BATCH = 256
+
+    def __init__(self, path: Optional[str] = "", namespace: str = "default", memory_size: int = 256,
+                 disk_max_entries: int = 5000, default_ttl: int = 24 * 3600):
+        self.namespace = namespace
+        self.memory_size = memory_size
+        self.disk_max_entries = disk_max_entries
+        self.default_ttl = default_ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "evictions": 0, "disk_writes": 0}
+
+        if path == "":
+            path = cache_path("cache.sqlite3")
+        self._db = None
+        self._writes = queue.Queue()
+        # key -> last access time not yet written to disk
+        self._touched: Dict[str, float] = {}
+        # Keys deleted in memory whose disk rows the writer hasn't removed yet
+        self._deleting = set()
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (namespace, accessed_at)")
+            self._db.commit()
+            writer = sqlite3.connect(path, check_same_thread=False)
+            # WAL makes NORMAL durable against application crashes; only a power loss can drop the last commits
+            writer.execute("PRAGMA synchronous=NORMAL")
+            threading.Thread(target=self._write_loop, args=(writer,), name=f"cache-writer-{namespace}", daemon=True).start()
+            atexit.register(self.flush)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            found, value = self._get_memory(key, time.time())
+        if found:
+            return value
+        return self._get_disk(key)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        """
+        Async version of get(): memory hits return at once, disk lookups run in a thread.
+        """
+        with self._lock:
+            found, value = self._get_memory(key, time.time())
+        if found:
+            return value
+        if self._db is None:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str, now: float) -> Tuple[bool, Any]:
+        # Caller holds the lock
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._touch(key, now)
+                self.stats["memory_hits"] += 1
+                return True, value
+            del self._memory[key]
+        return False, None
+
+    def _get_disk(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            if self._db is not None and key not in self._deleting:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self._touch(key, now)
+                    self.stats["disk_hits"] += 1
+                    return value
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+        now = time.time()
+        expires_at = now + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._deleting.discard(key)
+            self.stats["sets"] += 1
+        if self._db is not None:
+            self._writes.put(("set", key, json.dumps(value), expires_at, now))
+
+    def delete(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+            self._touched.pop(key, None)
+            if self._db is not None:
+                self._deleting.add(key)
+        if self._db is not None:
+            self._writes.put(("delete", key))
+
+    def flush(self):
+        """
+        Blocks until every queued write and recorded access time is on disk.
+        """
+        if self._db is not None:
+            self._writes.put(("flush",))
+            self._writes.join()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._db is not None:
+                stats["disk_entries"] = self._db.execute(
+                    "SELECT COUNT(*) FROM entries WHERE namespace = ?", (self.namespace,)
+                ).fetchone()[0]
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        # Caller holds the lock
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _touch(self, key: str, now: float):
+        # Caller holds the lock
+        if self._db is None:
+            return
+        self._touched[key] = now
+        if len(self._touched) == self.TOUCH_BATCH:
+            self._writes.put(("flush",))
+
+    def _write_loop(self, db: sqlite3.Connection):
+        while True:
+            ops = [self._writes.get()]
+            while True:
+                try:
+                    ops.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(db, ops)
+            except sqlite3.Error as e:
+                print(f"Cache write failed ({self.namespace}): {e}")
+                db.rollback()
+            finally:
+                for _ in ops:
+                    self._writes.task_done()
+
+    def _apply(self, db: sqlite3.Connection, ops: List[tuple]):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        deleted = []
+        for op in ops:
+            if op[0] == "set":
+                db.execute(
+                    "INSERT OR REPLACE INTO entries (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.namespace,) + op[1:]
+                )
+            elif op[0] == "delete":
+                db.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (self.namespace, op[1]))
+                deleted.append(op[1])
+        if touched:
+            db.executemany(
+                "UPDATE entries SET accessed_at = ? WHERE namespace = ? AND key = ? AND accessed_at < ?",
+                [(at, self.namespace, key, at) for key, at in touched.items()]
+            )
+        if any(op[0] == "set" for op in ops):
+            self._evict_disk(db, time.time())
+        db.commit()
+        with self._lock:
+            self._deleting.difference_update(deleted)
+            self.stats["disk_writes"] += 1
+
+    def _evict_disk(self, db: sqlite3.Connection, now: float):
+        # Runs on the writer thread. Drop expired rows, then the least recently used beyond the size bound.
+        db.execute("DELETE FROM entries WHERE namespace = ? AND expires_at <= ?", (self.namespace, now))
+        cursor = db.execute(
+            """
+            DELETE FROM entries WHERE namespace = ? AND key IN (
+                SELECT key FROM entries WHERE namespace = ?
+                ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.namespace, self.namespace, self.disk_max_entries)
+        )
+        if cursor.rowcount > 0:
+            with self._lock:
+                self.stats["evictions"] += cursor.rowcount
@@ -0,0 +1,296 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+from urllib.robotparser import RobotFileParser
+import httpx
+from utils.http_client import USER_AGENT
+from utils.page_cache import CachedPage
+from utils.page_fetcher import PageFetcher, get_fetch_flights
+from utils.page_extractor import relevance_score
+
+# Anchor text / URL path words that point at requirement and deadline subpages
+LINK_KEYWORDS = {
+    "admission": 3, "admissions": 3, "requirement": 3, "requirements": 3, "apply": 2, "application": 2,
+    "deadline": 3, "deadlines": 3, "dates": 2, "language": 2, "english": 2, "toefl": 3, "ielts": 3,
+    "gre": 2, "document": 2, "documents": 2, "eligibility": 3, "entry": 1, "prerequisites": 2,
+    "how-to-apply": 3, "bewerbung": 3, "zulassung": 3, "fristen": 3,
+}
+# Second-level labels of country domains such as tu.ac.uk or uni.edu.au
+COUNTRY_SECOND_LEVEL = {"ac", "co", "edu", "gov", "org", "com", "net"}
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_")
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".zip", ".doc", ".docx", ".xls", ".xlsx", ".mp4")
+
+
+def canonical_url(url: str) -> str:
+    """
+    Normalizes a URL for de-duplication: lowercase scheme/host, no fragment,
+    tracking parameters or trailing slash.
+    """
+    parts = urlparse(url)
+    query = urlencode([(k, v) for k, v in parse_qsl(parts.query) if not k.lower().startswith(TRACKING_PARAMS)])
+    path = parts.path.rstrip("/") or "/"
+    return urlunparse((parts.scheme.lower(), parts.netloc.lower(), path, "", query, ""))
+
+
+def site_of(url: str) -> str:
+    """Registrable domain of a URL, e.g. www.in.tum.de -> tum.de."""
+    labels = (urlparse(url).hostname or "").lower().split(".")
+    if len(labels) >= 3 and labels[-2] in COUNTRY_SECOND_LEVEL and len(labels[-1]) == 2:
+        return ".".join(labels[-3:])
+    return ".".join(labels[-2:])
+
+
+def link_score(url: str, anchor: str) -> int:
+    path = urlparse(url).path.lower()
+    words = set(anchor.lower().replace("-", " ").split()) | set(path.replace("-", " ").replace("_", " ").replace("/", " ").split())
+    score = sum(weight for word, weight in LINK_KEYWORDS.items() if word in words)
+    if "how-to-apply" in path:
+        score += LINK_KEYWORDS["how-to-apply"]
+    return score
+
+
+class RobotsCache:
+    """
+    robots.txt rules per host, fetched once and kept for ttl seconds, for at most
+    max_hosts hosts (least recently used first out). Concurrent checks against the
+    same host share one fetch through the fetch single-flight.
+    Missing or unreachable robots.txt allows everything; 401/403 disallows the host.
+    """
+
+    def __init__(self, fetcher: PageFetcher, ttl: int = 24 * 3600, max_hosts: int = 1024):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.max_hosts = max(1, max_hosts)
+        self._rules: "OrderedDict[str, Tuple[float, RobotFileParser]]" = OrderedDict()
+        self.stats = {"hits": 0, "fetches": 0, "evictions": 0}
+
+    async def allowed(self, url: str) -> bool:
+        parts = urlparse(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        entry = self._rules.get(host)
+        if entry is None or time.time() > entry[0] + self.ttl:
+            parser = await get_fetch_flights().do(("robots", host), lambda: self._load(host))
+            entry = self._rules.get(host)
+            if entry is None or entry[1] is not parser:
+                # The first of the callers sharing the fetch stores it
+                entry = (time.time(), parser)
+                self._rules[host] = entry
+            while len(self._rules) > self.max_hosts:
+                self._rules.popitem(last=False)
+                self.stats["evictions"] += 1
+        else:
+            self.stats["hits"] += 1
+        self._rules.move_to_end(host)
+        return entry[1].can_fetch(USER_AGENT, url)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, hosts=len(self._rules))
+
+    async def _load(self, host: str) -> RobotFileParser:
+        self.stats["fetches"] += 1
+        parser = RobotFileParser()
+        try:
+            response = await self.fetcher.http.aget(f"{host}/robots.txt")
+        except httpx.HTTPError:
+            parser.allow_all = True
+            return parser
+        if response.status_code in (401, 403):
+            parser.disallow_all = True
+        elif response.status_code >= 400:
+            parser.allow_all = True
+        else:
+            parser.parse(response.text.splitlines())
+        return parser
+
+
+class Crawler:
+    """
+    Follows requirement and deadline subpages from a program's landing page.
+
+    The landing page is picked from several search results by hedged fetching: the
+    first result is requested, the next one is started if it has not answered within
+    hedge_delay seconds (or failed, or turned out irrelevant), and the first page that
+    passes the relevance check wins. From there it follows in-site links whose anchor text or path matches
+    admission keywords, best-scoring first and up to max_depth levels deep. Each level
+    is fetched concurrently through the PageFetcher (so the page cache and single-flight
+    apply), and the crawl stops at max_pages pages or time_budget seconds, whichever
+    comes first. robots.txt is honoured and pages are de-duplicated by canonical URL.
+    """
+
+    # A landing page needs this much text and weighted admission keyword hits to be used
+    MIN_RELEVANCE = 6
+    MIN_TEXT_CHARS = 200
+
+    def __init__(self, fetcher: PageFetcher, max_depth: int = 1, max_pages: int = 5,
+                 time_budget: float = 8.0, concurrency: int = 4, hedge_delay: float = 2.0):
+        self.fetcher = fetcher
+        self.max_depth = max_depth
+        self.max_pages = max(1, max_pages)
+        self.time_budget = time_budget
+        self.concurrency = max(1, concurrency)
+        self.hedge_delay = hedge_delay
+        self.robots = RobotsCache(fetcher)
+        self.stats = {"start_fetches": 0, "hedged": 0, "irrelevant": 0, "failed": 0}
+
+    async def _fetch_allowed(self, url: str, semaphore: asyncio.Semaphore) -> Optional[CachedPage]:
+        async with semaphore:
+            if not await self.robots.allowed(url):
+                return None
+            return await self.fetcher.fetch(url)
+
+    def is_relevant(self, page: CachedPage) -> bool:
+        return len(page.text) >= self.MIN_TEXT_CHARS and relevance_score(page.text) >= self.MIN_RELEVANCE
+
+    async def _fetch_start(self, url: str) -> CachedPage:
+        if not await self.robots.allowed(url):
+            raise PermissionError(f"robots.txt disallows {url}")
+        page = await self.fetcher.fetch(url)
+        if not self.is_relevant(page):
+            self.stats["irrelevant"] += 1
+            raise ValueError(f"{url} does not look like an admissions page")
+        return page
+
+    async def _first_relevant(self, urls: List[str]) -> CachedPage:
+        """
+        Hedged fetch of the candidate start pages, in rank order. Returns the first
+        relevant page to arrive; slower fetches still running are cancelled.
+        """
+        queue, running = list(urls), {}
+        errors = []
+
+        def launch():
+            url = queue.pop(0)
+            self.stats["start_fetches"] += 1
+            running[asyncio.ensure_future(self._fetch_start(url))] = url
+
+        try:
+            launch()
+            while running:
+                done, _ = await asyncio.wait(
+                    list(running), timeout=self.hedge_delay if queue else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Slow responder: race the next result against it
+                    self.stats["hedged"] += 1
+                    launch()
+                    continue
+                for task in done:
+                    url = running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    errors.append(f"{url}: {task.exception()}")
+                # Replace each failed or irrelevant candidate straight away
+                for _ in range(min(len(done), len(queue))):
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+        self.stats["failed"] += 1
+        raise LookupError("No relevant page among search results: " + "; ".join(errors))
+
+    async def crawl(self, start_urls: List[str]) -> List[CachedPage]:
+        """
+        Returns the first relevant start page followed by the relevant subpages found
+        in time. Raises if none of start_urls gives a relevant page; failing subpages
+        are skipped.
+        """
+        deadline = time.monotonic() + self.time_budget
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        start = await self._first_relevant(start_urls)
+        pages = [start]
+        seen = {canonical_url(u) for u in (start.url, start.final_url, start.canonical_url) if u}
+        site = site_of(start.final_url or start.url)
+
+        frontier = [start]
+        for _ in range(self.max_depth):
+            candidates = {}
+            for page in frontier:
+                for url, anchor in page.links:
+                    key = canonical_url(url)
+                    if key in seen or key in candidates or site_of(url) != site:
+                        continue
+                    if urlparse(url).path.lower().endswith(SKIPPED_EXTENSIONS):
+                        continue
+                    score = link_score(url, anchor)
+                    if score > 0:
+                        candidates[key] = (score, url)
+
+            budget = self.max_pages - len(pages)
+            remaining = deadline - time.monotonic()
+            if not candidates or budget <= 0 or remaining <= 0:
+                break
+            chosen = [url for _, url in sorted(candidates.values(), key=lambda c: -c[0])[:budget]]
+            seen.update(canonical_url(url) for url in chosen)
+
+            tasks = [asyncio.ensure_future(self._fetch_allowed(url, semaphore)) for url in chosen]
+            try:
+                done, pending = await asyncio.wait(tasks, timeout=remaining)
+            finally:
+                # Out of time, or the caller was cancelled
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+
+            frontier = []
+            for task in tasks:
+                if task not in done or task.cancelled() or task.exception() is not None:
+                    continue
+                page = task.result()
+                if page is None:
+                    continue
+                # Different URLs can serve the same page (redirects, rel=canonical)
+                keys = {canonical_url(u) for u in (page.final_url, page.canonical_url) if u}
+                if keys & (seen - {canonical_url(page.url)}):
+                    continue
+                seen.update(keys)
+                pages.append(page)
+                frontier.append(page)
+            if pending:
+                break
+        return pages
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, **{f"robots_{k}": v for k, v in self.robots.get_stats().items()})
+
+
+def merge_pages(pages: List[CachedPage], max_chars: int = 12000) -> str:
+    """
+    Joins the text of crawled pages for the requirements parser, labelled with their
+    source URL. The start page comes first; every page gets at least an equal share
+    of what is left of max_chars.
+    """
+    parts, remaining = [], max_chars
+    for i, page in enumerate(pages):
+        share = remaining // (len(pages) - i)
+        text = page.text[:max(share, 0)]
+        if not text:
+            continue
+        part = f"Source: {page.final_url or page.url}\n{text}"
+        parts.append(part)
+        remaining -= len(part)
+    return "\n\n---\n\n".join(parts)
+
+
+_crawler = None
+
+def get_crawler() -> Crawler:
+    """
+    Returns the process-wide crawler (sharing its robots.txt cache), with budgets from
+    CRAWL_MAX_PAGES (1 disables crawling), CRAWL_MAX_DEPTH, CRAWL_TIME_BUDGET (seconds)
+    and FETCH_HEDGE_DELAY (seconds before racing the next search result).
+    """
+    global _crawler
+    if _crawler is None:
+        _crawler = Crawler(
+            PageFetcher(),
+            max_depth=int(os.environ.get("CRAWL_MAX_DEPTH", "1")),
+            max_pages=int(os.environ.get("CRAWL_MAX_PAGES", "5")),
+            time_budget=float(os.environ.get("CRAWL_TIME_BUDGET", "8")),
+            hedge_delay=float(os.environ.get("FETCH_HEDGE_DELAY", "2"))
+        )
+    return _crawler
@@ -1,42 +1,319 @@
 import os
+import json
+import random
+import hashlib
+from typing import AsyncIterator, Iterator, Optional
 from google import genai
 from google.genai import types
 from dotenv import load_dotenv
+from utils.cache import TieredCache
+from utils.rate_limiter import RateLimiter, get_rate_limiter, PRIORITY_PIPELINE
+from utils.single_flight import SingleFlight
 
 load_dotenv()
 
+_llm_cache = None
+# Shared by every client so identical concurrent prompts hit the API once
+_llm_flights = SingleFlight()
+
+def get_llm_cache() -> TieredCache:
+    """
+    Returns the process-wide LLM response cache shared by every GeminiClient.
+    """
+    global _llm_cache
+    if _llm_cache is None:
+        _llm_cache = TieredCache(
+            namespace="llm",
+            memory_size=int(os.environ.get("LLM_CACHE_MEMORY_SIZE", "512")),
+            disk_max_entries=int(os.environ.get("LLM_CACHE_DISK_ENTRIES", "20000")),
+            default_ttl=int(os.environ.get("LLM_CACHE_TTL", str(24 * 3600)))
+        )
+    return _llm_cache
+
+def get_llm_flights() -> SingleFlight:
+    return _llm_flights
+
 class GeminiClient:
-    def __init__(self):
+    # Rough allowance for response tokens when reserving rate-limit budget
+    OUTPUT_TOKEN_ESTIMATE = 1000
+
+    def __init__(self, cache: TieredCache = None, limiter: RateLimiter = None, priority: int = PRIORITY_PIPELINE):
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             raise ValueError("GEMINI_API_KEY environment variable not set")
         self.client = genai.Client(api_key=api_key)
         self.model = "gemini-2.5-flash"
+        self.max_retries = 3
+        self.cache = cache if cache is not None else get_llm_cache()
+        self.limiter = limiter if limiter is not None else get_rate_limiter()
+        # Rate-limit priority of calls that don't pass their own (e.g. PRIORITY_BATCH for cohort runs)
+        self.priority = priority
+
+    def _cache_key(self, prompt: str, system_instruction: str = None, response_schema=None) -> str:
+        """
+        Content-addressed key over everything that determines the model's answer.
+        """
+        if hasattr(response_schema, "model_json_schema"):
+            schema = response_schema.model_json_schema()
+        else:
+            schema = response_schema
+        payload = json.dumps([self.model, system_instruction, prompt, schema], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _cache_response(self, key: str, text: str, response_schema, cache_ttl: Optional[int]):
+        if not text:
+            return
+        if response_schema:
+            # Don't pin a malformed structured response in the cache
+            try:
+                json.loads(text)
+            except ValueError:
+                return
+        self.cache.set(key, text, ttl=cache_ttl)
+
+    def get_cached(self, prompt: str, system_instruction: str = None, response_schema=None) -> Optional[str]:
+        """
+        Returns the cached response for exactly this request, without calling the API.
+        """
+        return self.cache.get(self._cache_key(prompt, system_instruction, response_schema))
+
+    async def aget_cached(self, prompt: str, system_instruction: str = None, response_schema=None) -> Optional[str]:
+        """
+        Async version of get_cached().
+        """
+        return await self.cache.aget(self._cache_key(prompt, system_instruction, response_schema))
+
+    def store_cached(self, prompt: str, text: str, system_instruction: str = None, response_schema=None,
+                     cache_ttl: Optional[int] = None):
+        """
+        Caches text as the response to this request, e.g. one item split out of a
+        batched call, so a later single call for it is served from the cache.
+        """
+        if cache_ttl != 0:
+            key = self._cache_key(prompt, system_instruction, response_schema)
+            self._cache_response(key, text, response_schema, cache_ttl)
 
-    def generate_content(self, prompt: str, system_instruction: str = None, response_schema=None) -> str:
-        config = types.GenerateContentConfig(
+    async def awarmup(self):
+        """
+        Opens the connection to the Gemini API ahead of the first real request
+        (DNS, TLS handshake, API key check) without spending generation quota.
+        """
+        try:
+            await self.client.aio.models.get(model=self.model)
+        except Exception as e:
+            print(f"Gemini warm-up failed: {e}")
+
+    async def aclose(self):
+        await self.client.aio.aclose()
+        self.client.close()
+
+    def _build_config(self, system_instruction: str = None, response_schema=None) -> types.GenerateContentConfig:
+        return types.GenerateContentConfig(
             system_instruction=system_instruction,
             response_mime_type="application/json" if response_schema else "text/plain",
             response_schema=response_schema
         )
-        
-        import time
-        import random
-        
-        max_retries = 3
-        for attempt in range(max_retries):
+
+    def _estimate_tokens(self, prompt: str, system_instruction: str = None) -> int:
+        # ~4 characters per token, plus headroom for the response
+        return (len(prompt) + len(system_instruction or "")) // 4 + self.OUTPUT_TOKEN_ESTIMATE
+
+    def _record_usage(self, estimated_tokens: int, response):
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None)
+        if total:
+            self.limiter.record_usage(estimated_tokens, total)
+
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        """
+        Reads the server-requested delay from a Retry-After header or a RetryInfo detail.
+        """
+        headers = getattr(getattr(error, "response", None), "headers", None)
+        if headers and headers.get("retry-after"):
+            try:
+                return float(headers.get("retry-after"))
+            except ValueError:
+                pass
+        # Gemini reports the delay as e.g. {"@type": "...RetryInfo", "retryDelay": "37s"}
+        details = getattr(error, "details", None)
+        if isinstance(details, dict):
+            for detail in details.get("error", {}).get("details", []) or []:
+                if isinstance(detail, dict) and detail.get("retryDelay"):
+                    try:
+                        return float(str(detail["retryDelay"]).rstrip("s"))
+                    except ValueError:
+                        pass
+        return None
+
+    def _retry_delay(self, error: Exception, attempt: int):
+        """
+        Returns how long to wait before retrying, or None if the error is not retryable.
+        """
+        code = getattr(error, "code", None)
+        if code in (429, 503) or "503" in str(error) or "429" in str(error):
+            if attempt < self.max_retries - 1:
+                retry_after = self._retry_after(error)
+                if retry_after is not None:
+                    return retry_after
+                return (2 ** attempt) + random.uniform(0, 1)
+        return None
+
+    def generate_content(self, prompt: str, system_instruction: str = None, response_schema=None,
+                         cache_ttl: Optional[int] = None, priority: Optional[int] = None) -> str:
+        """
+        Generates a response, serving identical requests from the response cache.
+        cache_ttl overrides the cache's default TTL in seconds; 0 bypasses the cache.
+        Identical calls already in flight share one API request, and calls that reach
+        the API wait for rate-limit budget in priority order (the client's own priority
+        unless one is passed).
+        """
+        key = self._cache_key(prompt, system_instruction, response_schema)
+        if cache_ttl != 0:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        return _llm_flights.do_sync(
+            key,
+            lambda: self._generate(prompt, system_instruction, response_schema, key, cache_ttl, priority)
+        )
+
+    async def agenerate_content(self, prompt: str, system_instruction: str = None, response_schema=None,
+                                cache_ttl: Optional[int] = None, priority: Optional[int] = None) -> str:
+        """
+        Async version of generate_content. Uses the SDK's aio client so the
+        event loop keeps serving other requests while we wait on Gemini.
+        """
+        key = self._cache_key(prompt, system_instruction, response_schema)
+        if cache_ttl != 0:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                return cached
+
+        return await _llm_flights.do(
+            key,
+            lambda: self._agenerate(prompt, system_instruction, response_schema, key, cache_ttl, priority)
+        )
+
+    def _generate(self, prompt: str, system_instruction: str, response_schema, key: str,
+                  cache_ttl: Optional[int], priority: Optional[int]) -> str:
+        config = self._build_config(system_instruction, response_schema)
+        tokens = self._estimate_tokens(prompt, system_instruction)
+
+        for attempt in range(self.max_retries):
+            self.limiter.acquire_sync(tokens, self.priority if priority is None else priority)
             try:
                 response = self.client.models.generate_content(
                     model=self.model,
                     contents=prompt,
                     config=config
                 )
+                self._record_usage(tokens, response)
+                if cache_ttl != 0:
+                    self._cache_response(key, response.text, response_schema, cache_ttl)
                 return response.text
             except Exception as e:
-                if "503" in str(e) or "429" in str(e):
-                    if attempt < max_retries - 1:
-                        wait_time = (2 ** attempt) + random.uniform(0, 1)
-                        print(f"Gemini API overloaded. Retrying in {wait_time:.1f}s...")
-                        time.sleep(wait_time)
-                        continue
-                raise e
+                wait_time = self._retry_delay(e, attempt)
+                if wait_time is None:
+                    raise e
+                print(f"Gemini API overloaded. Retrying in {wait_time:.1f}s...")
+                # Back off globally so concurrent callers stop hammering the API too
+                self.limiter.pause(wait_time)
+
+    async def _agenerate(self, prompt: str, system_instruction: str, response_schema, key: str,
+                         cache_ttl: Optional[int], priority: Optional[int]) -> str:
+        config = self._build_config(system_instruction, response_schema)
+        tokens = self._estimate_tokens(prompt, system_instruction)
+
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(tokens, self.priority if priority is None else priority)
+            try:
+                response = await self.client.aio.models.generate_content(
+                    model=self.model,
+                    contents=prompt,
+                    config=config
+                )
+                self._record_usage(tokens, response)
+                if cache_ttl != 0:
+                    self._cache_response(key, response.text, response_schema, cache_ttl)
+                return response.text
+            except Exception as e:
+                wait_time = self._retry_delay(e, attempt)
+                if wait_time is None:
+                    raise e
+                print(f"Gemini API overloaded. Retrying in {wait_time:.1f}s...")
+                self.limiter.pause(wait_time)
+
+    def generate_content_stream(self, prompt: str, system_instruction: str = None, response_schema=None,
+                                cache_ttl: Optional[int] = None, priority: Optional[int] = None) -> Iterator[str]:
+        """
+        Yields the response text in chunks as the model produces it.
+        A cached response is yielded as a single chunk; the full streamed text is
+        cached like a generate_content() response. Retries only happen before the
+        first chunk, since text already handed out can't be taken back.
+        """
+        key = self._cache_key(prompt, system_instruction, response_schema)
+        if cache_ttl != 0:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+
+        config = self._build_config(system_instruction, response_schema)
+        tokens = self._estimate_tokens(prompt, system_instruction)
+        for attempt in range(self.max_retries):
+            self.limiter.acquire_sync(tokens, self.priority if priority is None else priority)
+            parts, last = [], None
+            try:
+                for chunk in self.client.models.generate_content_stream(model=self.model, contents=prompt, config=config):
+                    last = chunk
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+            except Exception as e:
+                wait_time = self._retry_delay(e, attempt) if not parts else None
+                if wait_time is None:
+                    raise e
+                print(f"Gemini API overloaded. Retrying in {wait_time:.1f}s...")
+                self.limiter.pause(wait_time)
+                continue
+            self._record_usage(tokens, last)
+            if cache_ttl != 0:
+                self._cache_response(key, "".join(parts), response_schema, cache_ttl)
+            return
+
+    async def agenerate_content_stream(self, prompt: str, system_instruction: str = None, response_schema=None,
+                                       cache_ttl: Optional[int] = None, priority: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Async version of generate_content_stream().
+        """
+        key = self._cache_key(prompt, system_instruction, response_schema)
+        if cache_ttl != 0:
+            cached = await self.cache.aget(key)
+            if cached is not None:
+                yield cached
+                return
+
+        config = self._build_config(system_instruction, response_schema)
+        tokens = self._estimate_tokens(prompt, system_instruction)
+        for attempt in range(self.max_retries):
+            await self.limiter.acquire(tokens, self.priority if priority is None else priority)
+            parts, last = [], None
+            try:
+                stream = await self.client.aio.models.generate_content_stream(model=self.model, contents=prompt, config=config)
+                async for chunk in stream:
+                    last = chunk
+                    if chunk.text:
+                        parts.append(chunk.text)
+                        yield chunk.text
+            except Exception as e:
+                wait_time = self._retry_delay(e, attempt) if not parts else None
+                if wait_time is None:
+                    raise e
+                print(f"Gemini API overloaded. Retrying in {wait_time:.1f}s...")
+                self.limiter.pause(wait_time)
+                continue
+            self._record_usage(tokens, last)
+            if cache_ttl != 0:
+                self._cache_response(key, "".join(parts), response_schema, cache_ttl)
+            return
@@ -0,0 +1,100 @@
+import os
+import asyncio
+import threading
+import weakref
+from typing import Dict, Optional
+from urllib.parse import urlparse
+import httpx
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class HTTPClient:
+    """
+    App-lifetime HTTP layer for every outbound fetch (admission pages, crawling).
+
+    Wraps one pooled httpx.Client and one httpx.AsyncClient per event loop so DNS,
+    TCP/TLS handshakes and keep-alive connections are reused across programs and users.
+    Requests to the same host are additionally capped at max_per_host in flight.
+    """
+
+    def __init__(self, max_connections: int = 100, max_per_host: int = 6,
+                 connect_timeout: float = 5.0, read_timeout: float = 10.0, http2: Optional[bool] = None):
+        self.max_per_host = max_per_host
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.http2 = _http2_available() if http2 is None else http2
+        self._lock = threading.Lock()
+        self._sync_client = None
+        self._sync_hosts: Dict[str, threading.BoundedSemaphore] = {}
+        # AsyncClient connections are bound to the loop that opened them
+        self._async_clients = weakref.WeakKeyDictionary()
+
+    def _client_kwargs(self) -> dict:
+        return {
+            "headers": {"User-Agent": USER_AGENT},
+            "limits": self.limits,
+            "timeout": self.timeout,
+            "http2": self.http2,
+            "follow_redirects": True,
+        }
+
+    def _host(self, url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = httpx.Client(**self._client_kwargs())
+            semaphore = self._sync_hosts.setdefault(self._host(url), threading.BoundedSemaphore(self.max_per_host))
+        with semaphore:
+            return self._sync_client.get(url, headers=headers)
+
+    async def aget(self, url: str, headers: Optional[Dict[str, str]] = None) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state = self._async_clients.get(loop)
+            if state is None:
+                state = {"client": httpx.AsyncClient(**self._client_kwargs()), "hosts": {}}
+                self._async_clients[loop] = state
+        semaphore = state["hosts"].setdefault(self._host(url), asyncio.Semaphore(self.max_per_host))
+        async with semaphore:
+            return await state["client"].get(url, headers=headers)
+
+    async def aclose(self):
+        """
+        Closes the pooled clients. Call from the event loop that owns the async client.
+        """
+        with self._lock:
+            state = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if state is not None:
+            await state["client"].aclose()
+        with self._lock:
+            if self._sync_client is not None:
+                self._sync_client.close()
+                self._sync_client = None
+
+
+_http_client = None
+
+def get_http_client() -> HTTPClient:
+    """
+    Returns the process-wide pooled HTTP client, configured from the environment.
+    """
+    global _http_client
+    if _http_client is None:
+        _http_client = HTTPClient(
+            max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", "100")),
+            max_per_host=int(os.environ.get("HTTP_MAX_PER_HOST", "6")),
+            connect_timeout=float(os.environ.get("HTTP_CONNECT_TIMEOUT", "5")),
+            read_timeout=float(os.environ.get("HTTP_READ_TIMEOUT", "10"))
+        )
+    return _http_client
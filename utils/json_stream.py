@@ -0,0 +1,82 @@
+import json
+import re
+from typing import Any, List
+
+
+class JSONArrayStream:
+    """
+    Incrementally extracts the elements of one JSON array from streamed model output.
+
+    Feed it text chunks as they arrive; every call returns the elements of the array
+    under `key` that have been completed since the last call, so a consumer can act on
+    each element long before the whole response is in. Works on raw model text, so
+    markdown fences or chatter around the JSON object are ignored.
+    """
+
+    def __init__(self, key: str):
+        self._key_pattern = re.compile(r'"%s"\s*:\s*\[' % re.escape(key))
+        self._buffer = ""
+        self._pos = None        # scan position inside the array, None until the array is found
+        self._start = None      # start of the element being read
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._buffer += chunk
+        if self.done:
+            return []
+        if self._pos is None:
+            match = self._key_pattern.search(self._buffer)
+            if match is None:
+                return []
+            self._pos = match.end()
+
+        elements = []
+        buffer = self._buffer
+        while self._pos < len(buffer):
+            char = buffer[self._pos]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._start is None:
+                    self._start = self._pos
+            elif char in "{[":
+                if self._depth == 0:
+                    self._start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the array itself
+                    self.done = True
+                    self._pos += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    elements.append(self._decode(buffer[self._start:self._pos + 1]))
+                    self._start = None
+            elif char == "," and self._depth == 0 and self._start is not None:
+                # End of a scalar element
+                elements.append(self._decode(buffer[self._start:self._pos]))
+                self._start = None
+            elif self._depth == 0 and self._start is None and not char.isspace() and char != ",":
+                self._start = self._pos
+            self._pos += 1
+
+        if self.done and self._start is not None:
+            elements.append(self._decode(buffer[self._start:self._pos - 1]))
+            self._start = None
+        return [element for element in elements if element is not None]
+
+    def _decode(self, text: str) -> Any:
+        try:
+            return json.loads(text.strip())
+        except ValueError:
+            return None
@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from utils.cache import cache_path
+
+
+@dataclass
+class CachedPage:
+    url: str
+    text: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    final_url: Optional[str] = None
+    fetched_at: float = 0.0
+    ttl: int = 0
+    links: List[Tuple[str, str]] = field(default_factory=list)
+    canonical_url: Optional[str] = None
+
+    @property
+    def etag(self) -> Optional[str]:
+        return self.headers.get("etag")
+
+    @property
+    def last_modified(self) -> Optional[str]:
+        return self.headers.get("last-modified")
+
+    @property
+    def is_fresh(self) -> bool:
+        return time.time() < self.fetched_at + self.ttl
+
+
+class PageCache:
+    """
+    Persistent cache of fetched admission pages (cleaned text plus response metadata)
+    and of search query -> result URL lookups.
+
+    Pages past their TTL are still returned so the caller can revalidate them with
+    If-None-Match / If-Modified-Since instead of downloading them again. The a-prefixed
+    methods run the SQLite work (and its commit) in a thread, for use on the event
+    loop. Pages not
+    fetched or revalidated for max_age seconds (never less than their TTL) and search
+    results past search_ttl are deleted when the cache is opened and every
+    PRUNE_EVERY writes after that.
+    """
+
+    # Response headers worth keeping for revalidation and debugging
+    KEPT_HEADERS = ("etag", "last-modified", "content-type", "cache-control", "date")
+    PRUNE_EVERY = 200
+
+    def __init__(self, path: str = "", default_ttl: int = 7 * 24 * 3600,
+                 domain_ttls: Optional[Dict[str, int]] = None, search_ttl: int = 30 * 24 * 3600,
+                 domain_failure_threshold: int = 3, domain_block_ttl: int = 24 * 3600,
+                 max_age: int = 90 * 24 * 3600):
+        self.default_ttl = default_ttl
+        self.domain_ttls = domain_ttls or {}
+        self.search_ttl = search_ttl
+        self.max_age = max([max_age, default_ttl] + list(self.domain_ttls.values()))
+        self._writes_since_prune = 0
+        # Consecutive blocks/timeouts after which a domain is skipped for domain_block_ttl seconds
+        self.domain_failure_threshold = domain_failure_threshold
+        self.domain_block_ttl = domain_block_ttl
+        self.stats = {"fresh_hits": 0, "stale_hits": 0, "misses": 0, "revalidated": 0, "search_hits": 0, "search_misses": 0,
+                      "domain_failures": 0, "domains_blocked": 0, "pruned": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or cache_path("pages.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                status_code INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                final_url TEXT,
+                fetched_at REAL NOT NULL,
+                links TEXT,
+                canonical_url TEXT
+            )
+        """)
+        # Caches created before links were stored
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(pages)")}
+        for column in ("links", "canonical_url"):
+            if column not in columns:
+                self._db.execute(f"ALTER TABLE pages ADD COLUMN {column} TEXT")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS domain_failures (
+                domain TEXT PRIMARY KEY,
+                failures INTEGER NOT NULL,
+                last_reason TEXT,
+                blocked_until REAL NOT NULL
+            )
+        """)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS search_results (
+                query TEXT PRIMARY KEY,
+                urls TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_fetched ON pages (fetched_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS search_results_fetched ON search_results (fetched_at)")
+        with self._lock:
+            self._prune(time.time())
+        self._db.commit()
+
+    def ttl_for(self, url: str) -> int:
+        """
+        Returns the TTL for a URL, using the most specific matching domain override.
+        """
+        host = (urlparse(url).hostname or "").lower()
+        best = None
+        for domain in self.domain_ttls:
+            if host == domain or host.endswith("." + domain):
+                if best is None or len(domain) > len(best):
+                    best = domain
+        return self.domain_ttls[best] if best else self.default_ttl
+
+    def get_page(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT text, status_code, headers, final_url, fetched_at, links, canonical_url FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        page = CachedPage(
+            url=url,
+            text=row[0],
+            status_code=row[1],
+            headers=json.loads(row[2]),
+            final_url=row[3],
+            fetched_at=row[4],
+            ttl=self.ttl_for(url),
+            links=[tuple(link) for link in json.loads(row[5] or "[]")],
+            canonical_url=row[6]
+        )
+        self.stats["fresh_hits" if page.is_fresh else "stale_hits"] += 1
+        return page
+
+    def store_page(self, url: str, text: str, status_code: int, headers: Dict[str, str],
+                   final_url: Optional[str] = None, links: Optional[List[Tuple[str, str]]] = None,
+                   canonical_url: Optional[str] = None) -> CachedPage:
+        kept = {k: v for k, v in ((k.lower(), v) for k, v in headers.items()) if k in self.KEPT_HEADERS}
+        page = CachedPage(url=url, text=text, status_code=status_code, headers=kept,
+                          final_url=final_url, fetched_at=time.time(), ttl=self.ttl_for(url),
+                          links=list(links or []), canonical_url=canonical_url)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages (url, text, status_code, headers, final_url, fetched_at, links, canonical_url) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, text, status_code, json.dumps(kept), final_url, page.fetched_at, json.dumps(page.links), canonical_url)
+            )
+            self._count_write(page.fetched_at)
+            self._db.commit()
+        return page
+
+    def mark_revalidated(self, page: CachedPage, headers: Dict[str, str]) -> CachedPage:
+        """
+        Records a 304 Not Modified: keeps the text, refreshes metadata and restarts the TTL.
+        """
+        for k, v in headers.items():
+            if k.lower() in self.KEPT_HEADERS:
+                page.headers[k.lower()] = v
+        page.fetched_at = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE pages SET headers = ?, fetched_at = ? WHERE url = ?",
+                (json.dumps(page.headers), page.fetched_at, page.url)
+            )
+            self._db.commit()
+        self.stats["revalidated"] += 1
+        return page
+
+    def get_search(self, query: str) -> Optional[List[str]]:
+        key = " ".join(query.lower().split())
+        with self._lock:
+            row = self._db.execute(
+                "SELECT urls, fetched_at FROM search_results WHERE query = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() > row[1] + self.search_ttl:
+            self.stats["search_misses"] += 1
+            return None
+        self.stats["search_hits"] += 1
+        return json.loads(row[0])
+
+    def store_search(self, query: str, urls: List[str]):
+        key = " ".join(query.lower().split())
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO search_results (query, urls, fetched_at) VALUES (?, ?, ?)",
+                (key, json.dumps(urls), time.time())
+            )
+            self._count_write(time.time())
+            self._db.commit()
+
+    def _count_write(self, now: float):
+        # Caller holds the lock
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= self.PRUNE_EVERY:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        # Caller holds the lock and commits
+        self._writes_since_prune = 0
+        pruned = self._db.execute("DELETE FROM pages WHERE fetched_at <= ?", (now - self.max_age,)).rowcount
+        pruned += self._db.execute("DELETE FROM search_results WHERE fetched_at <= ?", (now - self.search_ttl,)).rowcount
+        self.stats["pruned"] += max(pruned, 0)
+
+    def _domain(self, url: str) -> str:
+        return (urlparse(url).hostname or "").lower()
+
+    def is_domain_blocked(self, url: str) -> bool:
+        """
+        True if the URL's host has blocked or timed out repeatedly and is still in its penalty window.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blocked_until FROM domain_failures WHERE domain = ?", (self._domain(url),)
+            ).fetchone()
+        return row is not None and time.time() < row[0]
+
+    def record_domain_failure(self, url: str, reason: str):
+        domain = self._domain(url)
+        with self._lock:
+            row = self._db.execute("SELECT failures FROM domain_failures WHERE domain = ?", (domain,)).fetchone()
+            failures = (row[0] if row else 0) + 1
+            blocked_until = time.time() + self.domain_block_ttl if failures >= self.domain_failure_threshold else 0.0
+            self._db.execute(
+                "INSERT OR REPLACE INTO domain_failures (domain, failures, last_reason, blocked_until) VALUES (?, ?, ?, ?)",
+                (domain, failures, reason, blocked_until)
+            )
+            self._db.commit()
+        self.stats["domain_failures"] += 1
+        if failures == self.domain_failure_threshold:
+            self.stats["domains_blocked"] += 1
+
+    def record_domain_success(self, url: str):
+        with self._lock:
+            self._db.execute("DELETE FROM domain_failures WHERE domain = ?", (self._domain(url),))
+            self._db.commit()
+
+    async def aget_page(self, url: str) -> Optional[CachedPage]:
+        return await asyncio.to_thread(self.get_page, url)
+
+    async def astore_page(self, url: str, text: str, status_code: int, headers: Dict[str, str],
+                          final_url: Optional[str] = None, links: Optional[List[Tuple[str, str]]] = None,
+                          canonical_url: Optional[str] = None) -> CachedPage:
+        return await asyncio.to_thread(self.store_page, url, text, status_code, headers, final_url, links, canonical_url)
+
+    async def amark_revalidated(self, page: CachedPage, headers: Dict[str, str]) -> CachedPage:
+        return await asyncio.to_thread(self.mark_revalidated, page, headers)
+
+    async def aget_search(self, query: str) -> Optional[List[str]]:
+        return await asyncio.to_thread(self.get_search, query)
+
+    async def astore_search(self, query: str, urls: List[str]):
+        await asyncio.to_thread(self.store_search, query, urls)
+
+    async def ais_domain_blocked(self, url: str) -> bool:
+        return await asyncio.to_thread(self.is_domain_blocked, url)
+
+    async def arecord_domain_failure(self, url: str, reason: str):
+        await asyncio.to_thread(self.record_domain_failure, url, reason)
+
+    async def arecord_domain_success(self, url: str):
+        await asyncio.to_thread(self.record_domain_success, url)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+_page_cache = None
+
+def get_page_cache() -> PageCache:
+    """
+    Returns the process-wide page cache. Per-domain TTLs come from PAGE_CACHE_DOMAIN_TTLS,
+    a JSON object such as {"tum.de": 86400}; PAGE_CACHE_MAX_AGE sets when unused pages are deleted.
+    """
+    global _page_cache
+    if _page_cache is None:
+        _page_cache = PageCache(
+            default_ttl=int(os.environ.get("PAGE_CACHE_TTL", str(7 * 24 * 3600))),
+            domain_ttls=json.loads(os.environ.get("PAGE_CACHE_DOMAIN_TTLS", "{}")),
+            search_ttl=int(os.environ.get("SEARCH_CACHE_TTL", str(30 * 24 * 3600))),
+            domain_failure_threshold=int(os.environ.get("DOMAIN_FAILURE_THRESHOLD", "3")),
+            domain_block_ttl=int(os.environ.get("DOMAIN_BLOCK_TTL", str(24 * 3600))),
+            max_age=int(os.environ.get("PAGE_CACHE_MAX_AGE", str(90 * 24 * 3600)))
+        )
+    return _page_cache
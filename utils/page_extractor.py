@@ -0,0 +1,364 @@
+import os
+import re
+import math
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from urllib.parse import urljoin, urldefrag
+
+try:
+    import lxml.html
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+from bs4 import BeautifulSoup
+
+# Tags whose content is never useful to the requirements parser
+DROP_TAGS = ("script", "style", "noscript", "nav", "aside", "form", "iframe", "svg", "button", "select", "template")
+# Dropped unless they sit inside the main content (article/section headers are kept)
+PAGE_CHROME_TAGS = ("header", "footer")
+# id / class tokens that mark navigation, cookie banners and other boilerplate. Words that
+# also name admission content ("language requirements", "related information") are left
+# out; the chrome they label is matched by whole name in BOILERPLATE_LABELS instead.
+BOILERPLATE_TOKENS = {
+    "nav", "navbar", "navigation", "menu", "megamenu", "breadcrumb", "breadcrumbs", "footer", "cookie", "cookies",
+    "consent", "gdpr", "cookiebanner", "sidebar", "social", "share", "sharing", "newsletter", "skip", "skiplink",
+    "promo", "advert", "ads", "popup", "modal", "toolbar", "pagination", "langswitch",
+}
+BOILERPLATE_LABELS = {
+    "lang-switch", "lang-switcher", "language-switch", "language-switcher", "language-selector", "language-menu",
+    "related-posts", "related-articles", "related-links", "related-news", "related-content",
+}
+BOILERPLATE_ROLES = {"navigation", "banner", "contentinfo", "search", "dialog", "alertdialog", "menu", "menubar"}
+# Elements never removed by the id/class heuristic, however they are labelled
+PROTECTED_TAGS = ("html", "body", "main", "article")
+
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+BLOCK_TAGS = set(HEADING_TAGS) | {
+    "p", "div", "section", "article", "main", "ul", "ol", "li", "table", "tr", "td", "th", "dl", "dt", "dd",
+    "pre", "blockquote", "br", "hr", "caption", "figcaption", "summary", "details", "address", "header", "footer",
+}
+
+# Admission keyword -> weight. Single words are matched against the block's word
+# tokens, phrases by substring count; both are much cheaper than running a regex per keyword.
+KEYWORD_WEIGHTS = {
+    "gre": 3, "gmat": 3, "toefl": 3, "ielts": 3, "pte": 2, "duolingo": 2,
+    "lor": 3, "lors": 3, "referee": 3, "referees": 3, "reference": 3, "references": 3,
+    "transcript": 3, "transcripts": 3, "deadline": 3, "deadlines": 3, "sop": 3,
+    "cv": 2, "resume": 2, "résumé": 2, "requirement": 2, "requirements": 2, "required": 2,
+    "admission": 2, "admissions": 2, "admitted": 2, "eligible": 2, "eligibility": 2, "gpa": 2, "cgpa": 2,
+    "bachelor": 1, "bachelor's": 1, "bachelors": 1, "portfolio": 1, "interview": 1,
+    "apply": 1, "application": 1, "document": 1, "documents": 1,
+}
+PHRASE_WEIGHTS = {
+    "english proficiency": 3, "language proficiency": 3, "letter of recommendation": 3, "letters of recommendation": 3,
+    "recommendation letter": 3, "statement of purpose": 3, "motivation letter": 3, "letter of motivation": 3,
+    "personal statement": 3, "curriculum vitae": 2, "grade point": 2, "undergraduate degree": 1,
+    "application fee": 1, "minimum score": 2,
+}
+MONTHS = {"january", "february", "march", "april", "may", "june", "july", "august",
+          "september", "october", "november", "december"}
+DATE_WEIGHT = 2
+_WORD_RE = re.compile(r"[\w'’]+")
+_NUMERIC_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}|\d{1,2}\.\d{1,2}\.\d{4}")
+
+# Blocks longer than this are split so one huge section can't crowd out the rest
+MAX_BLOCK_CHARS = 1500
+CHARS_PER_TOKEN = 4
+# Links kept per page for the crawler
+MAX_LINKS = 300
+
+
+@dataclass
+class Block:
+    heading: str
+    lines: List[str] = field(default_factory=list)
+    position: int = 0
+    score: float = 0.0
+
+    @property
+    def text(self) -> str:
+        return "\n".join(([self.heading] if self.heading else []) + self.lines)
+
+
+@dataclass
+class ExtractedPage:
+    text: str
+    # (absolute url, anchor text) for every link on the page, navigation included
+    links: List[Tuple[str, str]] = field(default_factory=list)
+    canonical_url: Optional[str] = None
+
+
+def _is_boilerplate(tag: str, attrs: dict) -> bool:
+    """
+    >>> _is_boilerplate("div", {"id": "language-requirements", "class": "section language"})
+    False
+    >>> _is_boilerplate("section", {"class": "related-info"})
+    False
+    >>> _is_boilerplate("div", {"class": ["dropdown", "language-selector"]})
+    True
+    >>> _is_boilerplate("div", {"id": "cookie-banner"})
+    True
+    """
+    if tag in PROTECTED_TAGS:
+        return False
+    if (attrs.get("role") or "").lower() in BOILERPLATE_ROLES:
+        return True
+    if str(attrs.get("aria-hidden", "")).lower() == "true":
+        return True
+    labels = " ".join([attrs.get("id") or ""] + ([attrs.get("class")] if isinstance(attrs.get("class"), str) else list(attrs.get("class") or [])))
+    names = set(labels.lower().split())
+    tokens = set(re.split(r"[\s_\-]+", labels.lower()))
+    return bool(tokens & BOILERPLATE_TOKENS or names & BOILERPLATE_LABELS)
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class _LineCollector:
+    """Turns a stream of text/boundary events from either parser into sectioned blocks."""
+
+    def __init__(self):
+        self.blocks = [Block(heading="")]
+        self.current: List[str] = []
+        self.title = ""
+        self.links: List[Tuple[str, str]] = []
+        self.canonical = None
+
+    def text(self, text: Optional[str]):
+        if text:
+            self.current.append(text)
+
+    def boundary(self):
+        line = _clean("".join(self.current))
+        self.current = []
+        if line:
+            self.blocks[-1].lines.append(line)
+
+    def heading(self, text: str):
+        self.boundary()
+        text = _clean(text)
+        if text:
+            self.blocks.append(Block(heading=text))
+
+
+def _walk_lxml(html: str, collector: _LineCollector):
+    root = lxml.html.fromstring(html)
+    title = root.find(".//title")
+    if title is not None:
+        collector.title = _clean(title.text_content())
+    # Links are read before boilerplate removal: menus often hold the "Admission" link
+    for a in root.xpath("//a[@href]"):
+        collector.links.append((a.get("href"), _clean(a.text_content())))
+    canonical = root.xpath("//link[@rel='canonical']/@href")
+    if canonical:
+        collector.canonical = canonical[0]
+
+    for el in root.xpath("|".join(f"//{tag}" for tag in DROP_TAGS + ("title", "head"))):
+        el.drop_tree()
+    for el in root.xpath("|".join(f"//{tag}" for tag in PAGE_CHROME_TAGS)):
+        if not el.xpath("ancestor::main|ancestor::article"):
+            el.drop_tree()
+    for el in root.xpath("//*[@id or @class or @role or @aria-hidden]"):
+        if isinstance(el.tag, str) and _is_boilerplate(el.tag, dict(el.attrib)):
+            el.drop_tree()
+
+    skip_until = None
+    for event, el in etree.iterwalk(root, events=("start", "end")):
+        tag = el.tag if isinstance(el.tag, str) else ""
+        if skip_until is not None:
+            if event == "end" and el is skip_until:
+                skip_until = None
+                collector.text(el.tail)
+            continue
+        if event == "start":
+            if tag in HEADING_TAGS:
+                collector.heading(el.text_content())
+                skip_until = el
+                continue
+            if tag in BLOCK_TAGS:
+                collector.boundary()
+            collector.text(el.text)
+        else:
+            if tag in BLOCK_TAGS:
+                collector.boundary()
+            collector.text(el.tail)
+
+
+def _walk_soup(html: str, collector: _LineCollector):
+    soup = BeautifulSoup(html, "html.parser")
+    if soup.title is not None:
+        collector.title = _clean(soup.title.get_text())
+    for a in soup.find_all("a", href=True):
+        collector.links.append((a["href"], _clean(a.get_text())))
+    canonical = soup.find("link", rel="canonical", href=True)
+    if canonical is not None:
+        collector.canonical = canonical["href"]
+
+    for el in soup(list(DROP_TAGS) + ["title", "head"]):
+        el.decompose()
+    for el in soup(list(PAGE_CHROME_TAGS)):
+        if el.find_parent(["main", "article"]) is None:
+            el.decompose()
+    for el in soup.find_all(True):
+        if el.decomposed:
+            continue
+        if _is_boilerplate(el.name, el.attrs):
+            el.decompose()
+
+    def walk(node):
+        for child in node.children:
+            name = getattr(child, "name", None)
+            if name is None:
+                collector.text(str(child))
+            elif name in HEADING_TAGS:
+                collector.heading(child.get_text())
+            else:
+                if name in BLOCK_TAGS:
+                    collector.boundary()
+                walk(child)
+                if name in BLOCK_TAGS:
+                    collector.boundary()
+
+    walk(soup)
+
+
+def _parse(html: str) -> _LineCollector:
+    collector = _LineCollector()
+    if HAS_LXML:
+        try:
+            _walk_lxml(html, collector)
+        except (etree.ParserError, ValueError):
+            collector = _LineCollector()
+            _walk_soup(html, collector)
+    else:
+        _walk_soup(html, collector)
+    collector.boundary()
+    return collector
+
+
+def _to_blocks(collector: _LineCollector) -> List[Block]:
+    blocks = []
+    for block in collector.blocks:
+        if not block.lines and not block.heading:
+            continue
+        # Break up long sections so each piece is scored on its own
+        part = Block(heading=block.heading)
+        for line in block.lines:
+            if part.lines and len(part.text) + len(line) > MAX_BLOCK_CHARS:
+                blocks.append(part)
+                part = Block(heading=block.heading)
+            part.lines.append(line[:MAX_BLOCK_CHARS])
+        blocks.append(part)
+    for position, block in enumerate(blocks):
+        block.position = position
+    if collector.title:
+        blocks.insert(0, Block(heading=collector.title, position=-1))
+    return blocks
+
+
+def split_blocks(html: str) -> List[Block]:
+    """
+    Parses html into heading-delimited text blocks with navigation, footers, cookie
+    banners and similar boilerplate removed. Uses lxml when installed, which is
+    several times faster than BeautifulSoup's pure-Python parser on large pages.
+    """
+    return _to_blocks(_parse(html))
+
+
+def _keyword_hits(text: str) -> float:
+    if not text:
+        return 0.0
+    words = _WORD_RE.findall(text)
+    hits = sum(KEYWORD_WEIGHTS.get(word, 0) for word in words)
+    hits += sum(weight * text.count(phrase) for phrase, weight in PHRASE_WEIGHTS.items())
+    # "May 31", "31 May"
+    hits += DATE_WEIGHT * sum(1 for i, word in enumerate(words) if word in MONTHS and (
+        (i + 1 < len(words) and words[i + 1].isdigit()) or (i > 0 and words[i - 1].isdigit())))
+    hits += DATE_WEIGHT * len(_NUMERIC_DATE_RE.findall(text))
+    return hits
+
+
+def relevance_score(text: str) -> float:
+    """
+    Total weighted admission keyword hits in a page's text, used to tell a requirements
+    page from an unrelated search result before committing to it.
+    """
+    return _keyword_hits(text.lower())
+
+
+def score_block(block: Block) -> float:
+    """
+    Keyword density score: admission keyword hits (weighted, headings count triple)
+    divided by the square root of the block length, so short focused sections beat
+    long pages that mention a keyword once.
+    """
+    body = "\n".join(block.lines)
+    hits = _keyword_hits(body.lower()) + 3 * _keyword_hits(block.heading.lower())
+    return hits / math.sqrt(max(len(body) + len(block.heading), 1))
+
+
+def _pack(blocks: List[Block], budget: int) -> str:
+    title = blocks.pop(0) if blocks and blocks[0].position == -1 else None
+    for block in blocks:
+        block.score = score_block(block)
+
+    ranked = sorted((b for b in blocks if b.score > 0), key=lambda b: -b.score) or blocks
+    selected, used = [], len(title.text) if title else 0
+    for block in ranked:
+        remaining = budget - used
+        if remaining <= 0:
+            break
+        text = block.text
+        if len(text) > remaining:
+            if remaining < 200:
+                continue
+            text = text[:remaining]
+        selected.append((block.position, text))
+        used += len(text) + 2
+
+    selected.sort()
+    parts = ([title.text] if title else []) + [text for _, text in selected]
+    return "\n\n".join(parts)
+
+
+def _resolve_links(links: List[Tuple[str, str]], base_url: Optional[str]) -> List[Tuple[str, str]]:
+    resolved, seen = [], set()
+    for href, anchor in links:
+        url = urldefrag(urljoin(base_url or "", href.strip()))[0]
+        if not url.startswith(("http://", "https://")) or url in seen:
+            continue
+        seen.add(url)
+        resolved.append((url, anchor))
+        if len(resolved) >= MAX_LINKS:
+            break
+    return resolved
+
+
+def extract_page(html: str, base_url: Optional[str] = None, token_budget: Optional[int] = None) -> ExtractedPage:
+    """
+    Returns the admission-relevant text of a page, at most token_budget tokens long,
+    together with its links and canonical URL (resolved against base_url).
+
+    Blocks are ranked by keyword score and the best ones are packed into the budget,
+    then put back in page order so the text still reads naturally. Pages without any
+    admission keywords fall back to their first blocks.
+    """
+    if token_budget is None:
+        token_budget = int(os.environ.get("PAGE_EXTRACT_TOKEN_BUDGET", "2000"))
+    collector = _parse(html)
+    canonical = _resolve_links([(collector.canonical, "")], base_url) if collector.canonical else []
+    return ExtractedPage(
+        text=_pack(_to_blocks(collector), token_budget * CHARS_PER_TOKEN),
+        links=_resolve_links(collector.links, base_url),
+        canonical_url=canonical[0][0] if canonical else None
+    )
+
+
+def extract_text(html: str, token_budget: Optional[int] = None) -> str:
+    """
+    Returns the admission-relevant text of a page, at most token_budget tokens long.
+    """
+    return extract_page(html, token_budget=token_budget).text
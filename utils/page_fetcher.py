@@ -0,0 +1,107 @@
+import asyncio
+from typing import List
+import httpx
+from googlesearch import search
+from utils.http_client import HTTPClient, get_http_client
+from utils.page_cache import PageCache, CachedPage, get_page_cache
+from utils.page_extractor import extract_page
+from utils.process_pool import get_process_pool
+from utils.single_flight import SingleFlight
+
+# Shared by every fetcher so concurrent plans for the same university fetch once
+_fetch_flights = SingleFlight()
+
+def get_fetch_flights() -> SingleFlight:
+    return _fetch_flights
+
+# Statuses that mean the site is refusing us or struggling, rather than the page being missing
+BLOCKING_STATUSES = (401, 403, 429)
+
+
+class DomainBlockedError(Exception):
+    """Raised instead of fetching from a domain that keeps blocking or timing out."""
+
+
+class PageFetcher:
+    """
+    Finds and downloads admission pages, going through the persistent page cache.
+    """
+
+    def __init__(self, cache: PageCache = None, http: HTTPClient = None):
+        self.cache = cache if cache is not None else get_page_cache()
+        self.http = http if http is not None else get_http_client()
+
+    async def resolve(self, query: str, num_results: int = 1) -> List[str]:
+        """
+        Returns result URLs for a search query, skipping the search for repeat queries.
+        """
+        return await _fetch_flights.do(("search", query, num_results), lambda: self._resolve(query, num_results))
+
+    async def fetch(self, url: str) -> CachedPage:
+        """
+        Returns the page at url, from cache while fresh and revalidated with
+        ETag / Last-Modified once its TTL has passed.
+        """
+        return await _fetch_flights.do(("page", url), lambda: self._fetch(url))
+
+    async def _resolve(self, query: str, num_results: int) -> List[str]:
+        urls = await self.cache.aget_search(query)
+        if urls is not None and len(urls) >= num_results:
+            return urls[:num_results]
+
+        # googlesearch is blocking, so run it in a thread
+        results = await asyncio.to_thread(lambda: list(search(query, num_results=num_results, advanced=True)))
+        urls = [r.url for r in results]
+        if urls:
+            await self.cache.astore_search(query, urls)
+        return urls
+
+    async def _fetch(self, url: str) -> CachedPage:
+        cached = await self.cache.aget_page(url)
+        if cached is not None and cached.is_fresh:
+            return cached
+
+        if await self.cache.ais_domain_blocked(url):
+            if cached is not None:
+                return cached
+            raise DomainBlockedError(f"Skipping {url}: domain recently blocked or timed out repeatedly")
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers['If-None-Match'] = cached.etag
+            if cached.last_modified:
+                headers['If-Modified-Since'] = cached.last_modified
+
+        try:
+            response = await self.http.aget(url, headers=headers)
+        except httpx.HTTPError as e:
+            if isinstance(e, (httpx.TimeoutException, httpx.NetworkError)):
+                await self.cache.arecord_domain_failure(url, type(e).__name__)
+            if cached is not None:
+                # Serve the stale copy rather than failing outright
+                return cached
+            raise
+
+        if response.status_code in BLOCKING_STATUSES or response.status_code >= 500:
+            await self.cache.arecord_domain_failure(url, str(response.status_code))
+        elif response.status_code < 400:
+            await self.cache.arecord_domain_success(url)
+
+        if response.status_code == 304 and cached is not None:
+            return await self.cache.amark_revalidated(cached, dict(response.headers))
+        if response.status_code >= 500 and cached is not None:
+            return cached
+
+        response.raise_for_status()
+        # Parsing large pages is CPU-bound, so it runs in a worker process
+        extracted = await get_process_pool().run(extract_page, response.text, str(response.url), size=len(response.text))
+        return await self.cache.astore_page(
+            url,
+            extracted.text,
+            response.status_code,
+            dict(response.headers),
+            final_url=str(response.url),
+            links=extracted.links,
+            canonical_url=extracted.canonical_url
+        )
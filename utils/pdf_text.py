@@ -0,0 +1,57 @@
+import io
+import os
+from typing import Optional
+from utils.cache import TieredCache
+from utils.process_pool import get_process_pool
+
+# Limits for uploaded resumes
+MAX_PDF_BYTES = int(os.environ.get("RESUME_MAX_BYTES", str(5 * 1024 * 1024)))
+MAX_PDF_PAGES = int(os.environ.get("RESUME_MAX_PAGES", "5"))
+
+
+class PdfRejected(ValueError):
+    """The upload is not a readable PDF within the page limit."""
+
+
+def _extract(data: bytes, max_pages: int) -> str:
+    # Runs in a worker process: pypdf is pure Python and would otherwise hold the event loop
+    from pypdf import PdfReader
+    try:
+        reader = PdfReader(io.BytesIO(data))
+        if reader.is_encrypted:
+            raise PdfRejected("Encrypted PDFs are not supported")
+        if len(reader.pages) > max_pages:
+            raise PdfRejected(f"PDF has {len(reader.pages)} pages; the limit is {max_pages}")
+        return "\n".join((page.extract_text() or "").strip() for page in reader.pages).strip()
+    except PdfRejected:
+        raise
+    except Exception as e:
+        # pypdf raises a variety of errors on malformed files
+        raise PdfRejected(f"Could not read PDF: {e}")
+
+
+_resume_cache = None
+
+def get_resume_cache() -> TieredCache:
+    """
+    Returns the cache of extracted resume text and parse results, keyed by file content hash.
+    """
+    global _resume_cache
+    if _resume_cache is None:
+        _resume_cache = TieredCache(namespace="resumes", memory_size=64, default_ttl=7 * 24 * 3600)
+    return _resume_cache
+
+
+async def aextract_text(data: bytes, digest: str, max_pages: Optional[int] = None) -> str:
+    """
+    Extracts the text of a PDF in a worker process, reusing the result for identical files.
+    Raises PdfRejected for unreadable, encrypted or over-long PDFs, and PoolTimeout
+    when extraction takes too long.
+    """
+    cache = get_resume_cache()
+    key = f"text:{digest}"
+    text = await cache.aget(key)
+    if text is None:
+        text = await get_process_pool().run(_extract, data, max_pages or MAX_PDF_PAGES)
+        cache.set(key, text)
+    return text
@@ -0,0 +1,102 @@
+import os
+import json
+import math
+import hashlib
+from typing import Any, Dict, List, Optional
+from models import StudentProfile
+from utils.cache import TieredCache
+from utils.program_catalog import tuition_band, degree_field
+from utils.requirements_store import intake_cycle
+
+# Default bucket widths per test; scores within a bucket share a plan
+DEFAULT_TEST_BUCKETS = {"GRE": 5, "GMAT": 20, "TOEFL": 5, "IELTS": 0.5, "PTE": 5, "DUOLINGO": 10}
+
+
+def _bucket(value: float, width: float) -> float:
+    return round(math.floor(value / width) * width, 4) if width > 0 else value
+
+
+class PlanStore:
+    """
+    Reusable plan parts (shortlist, parsed requirements, Q&A) keyed by a canonical
+    fingerprint of the normalized profile.
+
+    Students with the same degree field, countries, budget band, intake cycle and
+    interests, and GPA / test scores in the same buckets, share a fingerprint. Timelines
+    and validation depend on today's date and are always recomputed, so they are not stored.
+    """
+
+    def __init__(self, cache: Optional[TieredCache] = None, ttl: int = 24 * 3600, gpa_bucket: float = 0.2,
+                 test_buckets: Optional[Dict[str, float]] = None):
+        self.cache = cache if cache is not None else TieredCache(namespace="plans", memory_size=128)
+        self.ttl = ttl
+        self.gpa_bucket = gpa_bucket
+        self.test_buckets = dict(DEFAULT_TEST_BUCKETS, **{k.upper(): v for k, v in (test_buckets or {}).items()})
+        self.stats = {"hits": 0, "misses": 0, "stored": 0}
+
+    def fingerprint(self, profile: StudentProfile) -> str:
+        tests = {}
+        for name, score in (profile.test_scores or {}).items():
+            try:
+                value = float(str(score).strip())
+            except ValueError:
+                continue
+            tests[name.upper()] = _bucket(value, self.test_buckets.get(name.upper(), 10))
+        band = tuition_band(profile.budget)
+        canonical = {
+            "degree": degree_field(profile.target_degree),
+            "countries": sorted(c.strip().lower() for c in profile.target_countries),
+            "budget": band if band is not None else " ".join(profile.budget.lower().split()),
+            "intake": intake_cycle(profile.target_intake),
+            "interests": sorted(i.strip().lower() for i in profile.interests),
+            "gpa": _bucket(profile.gpa, self.gpa_bucket),
+            "tests": tests,
+            # Ranking only distinguishes none / some / many
+            "backlogs": min(profile.backlogs, 3),
+            "research_papers": min(profile.research_papers, 3),
+        }
+        return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        if self.ttl <= 0:
+            return None
+        plan = self.cache.get(fingerprint)
+        self.stats["hits" if plan is not None else "misses"] += 1
+        return plan
+
+    async def aget(self, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Async version of get().
+        """
+        if self.ttl <= 0:
+            return None
+        plan = await self.cache.aget(fingerprint)
+        self.stats["hits" if plan is not None else "misses"] += 1
+        return plan
+
+    def put(self, fingerprint: str, programs: List[Dict[str, Any]], requirements: List[Dict[str, Any]],
+            qna: List[Dict[str, Any]]):
+        if self.ttl <= 0:
+            return
+        self.cache.set(fingerprint, {"programs": programs, "requirements": requirements, "qna": qna}, ttl=self.ttl)
+        self.stats["stored"] += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+_plan_store = None
+
+def get_plan_store() -> PlanStore:
+    """
+    Returns the process-wide plan store. PLAN_CACHE_TTL (seconds, 0 disables), PLAN_GPA_BUCKET
+    and PLAN_TEST_BUCKETS (JSON, e.g. {"GRE": 10}) control reuse.
+    """
+    global _plan_store
+    if _plan_store is None:
+        _plan_store = PlanStore(
+            ttl=int(os.environ.get("PLAN_CACHE_TTL", str(24 * 3600))),
+            gpa_bucket=float(os.environ.get("PLAN_GPA_BUCKET", "0.2")),
+            test_buckets=json.loads(os.environ.get("PLAN_TEST_BUCKETS", "{}"))
+        )
+    return _plan_store
@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+
+class PoolTimeout(TimeoutError):
+    """A task submitted to the process pool did not finish within its timeout."""
+
+
+def _noop() -> None:
+    return None
+
+
+class ProcessPool:
+    """
+    Shared worker processes for CPU-bound steps on the request path (HTML extraction,
+    PDF text extraction, decoding large model outputs), so they spread across cores
+    instead of contending for the event loop's GIL.
+
+    Work is submitted with run(fn, *args); fn and its arguments must be picklable
+    (module-level functions). Payloads smaller than min_size run inline, where
+    pickling them to a worker would cost more than the work itself. max_workers=0
+    runs everything in a thread instead.
+
+    A task that overruns its timeout raises PoolTimeout. If it was still queued it is
+    cancelled; if it was already running, new work goes to a fresh pool while the old
+    one drains the tasks already queued on it. Once nothing is waiting on the old pool
+    any more, its worker processes (including the stuck one) are killed. A crashed
+    worker also replaces the pool; tasks queued on the crashed one fail with
+    BrokenProcessPool.
+    """
+
+    def __init__(self, max_workers: int = 2, timeout: float = 20.0, min_size: int = 32 * 1024):
+        self.max_workers = max(0, max_workers)
+        self.timeout = timeout
+        self.min_size = min_size
+        self._executor = None
+        # Replaced executors still draining their queued tasks, with their worker processes
+        # (shutdown() drops the executor's own reference to them)
+        self._retired = {}
+        # Tasks each executor still has a caller waiting on
+        self._waiting: Dict[ProcessPoolExecutor, int] = {}
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "timeouts": 0, "inline": 0,
+                      "cancelled": 0, "restarts": 0, "killed": 0, "in_flight": 0, "max_in_flight": 0,
+                      "busy_seconds": 0.0}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Workers are spawned, not forked: forking a process with a running event loop
+            # and open SQLite connections is unsafe
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _restart(self, executor: ProcessPoolExecutor):
+        # New work goes to a fresh executor; the old one drains what other callers queued
+        # on it (or fails it with BrokenProcessPool if it crashed) instead of cancelling it
+        if self._executor is executor:
+            self._executor = None
+            self._retired[executor] = list((getattr(executor, "_processes", None) or {}).values())
+            executor.shutdown(wait=False)
+            self.stats["restarts"] += 1
+
+    def _release(self, executor: ProcessPoolExecutor):
+        # A caller stopped waiting on executor; a retired one nobody waits on is torn down
+        if executor not in self._waiting:
+            return
+        self._waiting[executor] -= 1
+        if self._waiting[executor] == 0 and executor in self._retired:
+            del self._waiting[executor]
+            self._kill(executor, self._retired.pop(executor))
+
+    def _kill(self, executor: ProcessPoolExecutor, processes: list):
+        # Workers still alive here are stuck on abandoned tasks; shutdown() alone would wait for them
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.kill()
+                self.stats["killed"] += 1
+
+    async def run(self, fn: Callable, *args, size: Optional[int] = None, timeout: Optional[float] = None) -> Any:
+        """
+        Runs fn(*args) in a worker process and returns its result. size is the payload
+        size in bytes/characters, used to keep small jobs inline.
+        """
+        if size is not None and size < self.min_size:
+            self.stats["inline"] += 1
+            return fn(*args)
+
+        timeout = self.timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        self.stats["submitted"] += 1
+        self.stats["in_flight"] += 1
+        self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        executor = future = None
+        try:
+            if self.max_workers == 0:
+                result = await asyncio.wait_for(asyncio.to_thread(fn, *args), timeout)
+            else:
+                executor = self._get_executor()
+                self._waiting[executor] = self._waiting.get(executor, 0) + 1
+                future = executor.submit(fn, *args)
+                result = await asyncio.wait_for(asyncio.wrap_future(future, loop=loop), timeout)
+            self.stats["completed"] += 1
+            return result
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            if future is not None and future.running():
+                self._restart(executor)
+            raise PoolTimeout(f"{getattr(fn, '__name__', 'task')} did not finish within {timeout}s")
+        except asyncio.CancelledError:
+            # The caller went away; a queued task is dropped, a running one finishes unobserved
+            self.stats["cancelled"] += 1
+            raise
+        except BrokenProcessPool:
+            self.stats["failed"] += 1
+            self._restart(executor)
+            raise
+        except Exception:
+            self.stats["failed"] += 1
+            raise
+        finally:
+            if executor is not None:
+                self._release(executor)
+            self.stats["in_flight"] -= 1
+            self.stats["busy_seconds"] += time.monotonic() - started
+
+    async def aloads(self, text: str) -> Any:
+        """
+        json.loads for model outputs; large documents are decoded in a worker.
+        """
+        return await self.run(json.loads, text, size=len(text))
+
+    async def awarmup(self):
+        """
+        Starts the worker processes ahead of the first request, so it doesn't pay for
+        interpreter start-up and imports.
+        """
+        if self.max_workers == 0:
+            return
+        try:
+            executor = self._get_executor()
+            await asyncio.gather(*(asyncio.wrap_future(executor.submit(_noop)) for _ in range(self.max_workers)))
+        except Exception as e:
+            print(f"Process pool warm-up failed: {e}")
+
+    def shutdown(self):
+        for executor, processes in self._retired.items():
+            self._kill(executor, processes)
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self._retired = {}
+        self._waiting = {}
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats["workers"] = self.max_workers
+        stats["busy_seconds"] = round(stats["busy_seconds"], 3)
+        return stats
+
+
+_process_pool = None
+
+def get_process_pool() -> ProcessPool:
+    """
+    Returns the process-wide worker pool. PROCESS_POOL_WORKERS (default: CPU count, at
+    most 4; 0 runs tasks in a thread), PROCESS_POOL_TIMEOUT (seconds per task) and
+    PROCESS_POOL_MIN_BYTES (smaller payloads run inline) configure it.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPool(
+            max_workers=int(os.environ.get("PROCESS_POOL_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            timeout=float(os.environ.get("PROCESS_POOL_TIMEOUT", "20")),
+            min_size=int(os.environ.get("PROCESS_POOL_MIN_BYTES", str(32 * 1024)))
+        )
+    return _process_pool
@@ -0,0 +1,241 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# (grade, 4.0-scale GPA) points, interpolated linearly between them
+TEN_POINT_TABLE = [(5.0, 1.0), (6.0, 2.0), (7.0, 2.7), (7.5, 3.0), (8.0, 3.3), (8.5, 3.6), (9.0, 3.85), (10.0, 4.0)]
+PERCENT_TABLE = [(40.0, 1.0), (50.0, 2.0), (60.0, 2.7), (65.0, 3.0), (70.0, 3.3), (75.0, 3.6), (85.0, 4.0), (100.0, 4.0)]
+
+COUNTRY_ALIASES = {
+    "us": "USA", "usa": "USA", "u s": "USA", "u s a": "USA", "united states": "USA",
+    "united states of america": "USA", "america": "USA",
+    "uk": "UK", "u k": "UK", "united kingdom": "UK", "great britain": "UK", "britain": "UK",
+    "england": "UK", "scotland": "UK", "wales": "UK",
+    "deutschland": "Germany", "holland": "Netherlands", "the netherlands": "Netherlands",
+    "nz": "New Zealand", "uae": "UAE", "united arab emirates": "UAE", "korea": "South Korea",
+}
+KNOWN_COUNTRIES = {
+    "Australia", "Austria", "Belgium", "Canada", "China", "Czech Republic", "Denmark", "Estonia", "Finland",
+    "France", "Germany", "Hong Kong", "Hungary", "India", "Ireland", "Italy", "Japan", "Luxembourg", "Malaysia",
+    "Netherlands", "New Zealand", "Norway", "Poland", "Portugal", "Singapore", "South Korea", "Spain", "Sweden",
+    "Switzerland", "Taiwan", "UAE", "UK", "USA",
+}
+DEGREE_LEVELS = {
+    "ms": "MS", "m s": "MS", "msc": "MS", "m sc": "MS", "master": "MS", "masters": "MS", "master s": "MS",
+    "master of science": "MS", "masters of science": "MS", "meng": "MEng", "m eng": "MEng",
+    "master of engineering": "MEng", "mba": "MBA", "master of business administration": "MBA",
+    "ma": "MA", "m a": "MA", "master of arts": "MA", "mtech": "MTech", "m tech": "MTech",
+    "phd": "PhD", "ph d": "PhD", "doctorate": "PhD",
+}
+# Canonical test names with their valid score ranges
+TEST_RANGES = {"GRE": (260, 340), "GMAT": (200, 805), "TOEFL": (0, 120), "IELTS": (0, 9),
+               "PTE": (10, 90), "Duolingo": (10, 160)}
+TEST_ALIASES = {"gre": "GRE", "gmat": "GMAT", "toefl": "TOEFL", "toefl ibt": "TOEFL", "ielts": "IELTS",
+                "pte": "PTE", "duolingo": "Duolingo", "det": "Duolingo"}
+SEASONS = {"fall": "Fall", "autumn": "Fall", "spring": "Spring", "summer": "Summer", "winter": "Winter"}
+# Aliases used by older clients and the CLI demo
+KEY_ALIASES = {"degree": "target_degree", "countries": "target_countries", "intake": "target_intake",
+               "tests": "test_scores"}
+
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_YEAR_RE = re.compile(r"\b(20\d{2})\b")
+# "Master of Science in Data Science": the subject follows the first "in", or else the last "of"
+_SUBJECT_RES = (re.compile(r"^(.*?)\bin\s+(.+)$", re.IGNORECASE), re.compile(r"^(.*)\bof\s+(.+)$", re.IGNORECASE))
+# Words that cannot be a subject on their own
+_SUBJECT_STOPWORDS = {"in", "of", "the", "a", "an", "and", "for", "degree", "program", "programme"}
+_SUBJECT_ALIASES = {"cs": "Computer Science", "ds": "Data Science", "ai": "Artificial Intelligence",
+                    "ml": "Machine Learning", "ee": "Electrical Engineering", "me": "Mechanical Engineering",
+                    "ece": "Electrical and Computer Engineering", "it": "Information Technology"}
+
+
+def _key(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).lower()).split())
+
+
+def _interpolate(table: List[Tuple[float, float]], value: float) -> float:
+    if value <= table[0][0]:
+        return table[0][1]
+    for (x0, y0), (x1, y1) in zip(table, table[1:]):
+        if value <= x1:
+            return round(y0 + (y1 - y0) * (value - x0) / (x1 - x0), 2)
+    return table[-1][1]
+
+
+def normalize_gpa(value: Any) -> Optional[float]:
+    """
+    Converts a 4.0-scale, 10-point or percentage grade to the 4.0 scale.
+    Returns None for values whose scale cannot be told apart (such as 4.5).
+    """
+    match = _NUMBER_RE.search(str(value))
+    if match is None:
+        return None
+    gpa = float(match.group())
+    text = str(value).lower()
+    if "%" in text or "percent" in text:
+        return _interpolate(PERCENT_TABLE, gpa) if gpa <= 100 else None
+    if "/10" in text.replace(" ", ""):
+        return _interpolate(TEN_POINT_TABLE, gpa) if gpa <= 10 else None
+    if 0 < gpa <= 4.0:
+        return round(gpa, 2)
+    if 5.0 <= gpa <= 10:
+        return _interpolate(TEN_POINT_TABLE, gpa)
+    if 10 < gpa <= 100:
+        return _interpolate(PERCENT_TABLE, gpa)
+    return None
+
+
+def normalize_country(value: str) -> Optional[str]:
+    key = _key(value)
+    if key in COUNTRY_ALIASES:
+        return COUNTRY_ALIASES[key]
+    for country in KNOWN_COUNTRIES:
+        if key == country.lower():
+            return country
+    return None
+
+
+def _split_level(text: str) -> Tuple[str, str]:
+    # "MSc Data Science" -> ("MSc", "Data Science"); the longest leading level wins
+    words = text.split()
+    for n in range(min(len(words), 5), 0, -1):
+        if _key(" ".join(words[:n])) in DEGREE_LEVELS:
+            return " ".join(words[:n]), " ".join(words[n:])
+    return "", text
+
+
+def normalize_degree(value: str) -> Optional[str]:
+    """
+    Canonical "<level> in <Subject>", e.g. "Masters in CS" -> "MS in Computer Science".
+    Returns None when there is no recognizable subject.
+
+    >>> normalize_degree("Masters in CS")
+    'MS in Computer Science'
+    >>> normalize_degree("MS Computer Science")
+    'MS in Computer Science'
+    >>> normalize_degree("MSc Artificial Intelligence")
+    'MS in Artificial Intelligence'
+    >>> normalize_degree("M.Eng. Robotics")
+    'MEng in Robotics'
+    >>> normalize_degree("Master of Science in Data Science")
+    'MS in Data Science'
+    >>> normalize_degree("data science")
+    'MS in Data Science'
+    >>> normalize_degree("in") is None, normalize_degree("MS in") is None, normalize_degree("Masters") is None
+    (True, True, True)
+    """
+    text = " ".join(str(value or "").split())
+    if DEGREE_LEVELS.get(_key(text)) == "MBA":
+        return "MBA"
+    match = next((m for m in (r.match(text) for r in _SUBJECT_RES) if m), None)
+    if match is None and _key(text) in DEGREE_LEVELS:
+        # A level with no subject
+        return None
+    level_text, subject = (match.group(1), match.group(2)) if match else _split_level(text)
+    level_key = _key(level_text)
+    if level_key and level_key not in DEGREE_LEVELS:
+        return None
+    subject = re.sub(r"\(.*?\)", "", subject).strip(" .")
+    if not _key(subject) or _key(subject) in _SUBJECT_STOPWORDS:
+        return None
+    subject = _SUBJECT_ALIASES.get(_key(subject)) or (subject if any(c.isupper() for c in subject) else subject.title())
+    return f"{DEGREE_LEVELS.get(level_key, 'MS')} in {subject}"
+
+
+def normalize_intake(value: str) -> Optional[str]:
+    words = _key(value).split()
+    season = next((SEASONS[w] for w in words if w in SEASONS), None)
+    year = _YEAR_RE.search(str(value or ""))
+    if season is None or year is None:
+        return None
+    return f"{season} {year.group(1)}"
+
+
+def _split_list(value: Any) -> List[str]:
+    items = value if isinstance(value, list) else str(value or "").split(",")
+    return list(dict.fromkeys(str(item).strip() for item in items if str(item).strip()))
+
+
+def parse_test_scores(value: Any) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Accepts a {name: score} dict, a list of {"name", "score"} items or text such as
+    "GRE 320, TOEFL 105". Returns (valid scores by canonical name, entries that could
+    not be resolved). Blank scores are dropped.
+    """
+    if isinstance(value, dict):
+        items = list(value.items())
+    elif isinstance(value, list):
+        items = [(item.get("name"), item.get("score")) for item in value if isinstance(item, dict)]
+    else:
+        items = [(m.group(1), m.group(2)) for m in re.finditer(r"([A-Za-z][A-Za-z ]*?)\s*[:=]?\s*(\d+(?:\.\d+)?)", str(value or ""))]
+
+    scores, unresolved = {}, {}
+    for name, score in items:
+        if score is None or not str(score).strip():
+            continue
+        canonical = TEST_ALIASES.get(_key(name))
+        match = _NUMBER_RE.search(str(score))
+        if canonical is None or match is None:
+            unresolved[str(name)] = str(score)
+            continue
+        low, high = TEST_RANGES[canonical]
+        number = float(match.group())
+        if not low <= number <= high:
+            unresolved[canonical] = str(score)
+            continue
+        scores[canonical] = match.group()
+    return scores, unresolved
+
+
+def normalize_profile(raw: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Normalizes raw profile data with local rules. Returns (resolved StudentProfile fields,
+    raw values of the fields the rules could not resolve).
+    """
+    raw = {KEY_ALIASES.get(k, k): v for k, v in raw.items()}
+    resolved, unresolved = {}, {}
+
+    gpa = normalize_gpa(raw.get("gpa", ""))
+    if gpa is None:
+        unresolved["gpa"] = raw.get("gpa")
+    else:
+        resolved["gpa"] = gpa
+
+    degree = normalize_degree(raw.get("target_degree", ""))
+    if degree is None:
+        unresolved["target_degree"] = raw.get("target_degree")
+    else:
+        resolved["target_degree"] = degree
+
+    countries = _split_list(raw.get("target_countries"))
+    canonical = [normalize_country(c) for c in countries]
+    if countries and all(canonical):
+        resolved["target_countries"] = list(dict.fromkeys(canonical))
+    else:
+        unresolved["target_countries"] = raw.get("target_countries")
+
+    intake = normalize_intake(raw.get("target_intake", ""))
+    if intake is None:
+        unresolved["target_intake"] = raw.get("target_intake")
+    else:
+        resolved["target_intake"] = intake
+
+    budget = str(raw.get("budget") or "").strip()
+    if budget:
+        resolved["budget"] = budget
+    else:
+        unresolved["budget"] = raw.get("budget")
+
+    resolved["interests"] = _split_list(raw.get("interests"))
+
+    scores, bad_scores = parse_test_scores(raw.get("test_scores"))
+    resolved["test_scores"] = scores
+    if bad_scores:
+        unresolved["test_scores"] = bad_scores
+
+    # Plain fields the form already validates
+    resolved["undergrad_major"] = str(raw.get("undergrad_major") or "").strip()
+    for field, cast in (("work_experience_years", float), ("backlogs", int), ("research_papers", int)):
+        try:
+            resolved[field] = max(cast(float(raw.get(field) or 0)), 0)
+        except (TypeError, ValueError):
+            resolved[field] = cast(0)
+    return resolved, unresolved
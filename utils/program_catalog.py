@@ -0,0 +1,307 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional
+from models import Program, StudentProfile
+from utils.cache import cache_path
+from utils.profile_normalizer import normalize_country
+
+# Annual tuition bands, matching the budget choices in the UI (USD per year)
+BAND_LIMITS = (20000, 50000)
+BUDGET_WORDS = {"low": 0, "medium": 1, "high": 2}
+# Rough conversion to USD, only used to place tuition into a band
+CURRENCY_RATES = {"$": 1.0, "usd": 1.0, "€": 1.1, "eur": 1.1, "£": 1.27, "gbp": 1.27, "chf": 1.1,
+                  "cad": 0.74, "aud": 0.66, "sgd": 0.74, "₹": 0.012, "inr": 0.012}
+DEGREE_ALIASES = {"cs": "computer science", "ds": "data science", "ai": "artificial intelligence",
+                  "ml": "machine learning", "ee": "electrical engineering", "ece": "electrical and computer engineering",
+                  "me": "mechanical engineering", "mba": "business administration"}
+_AMOUNT_RE = re.compile(r"(\d[\d,.]*)\s*(k\b)?", re.IGNORECASE)
+# "Master of Science in Data Science": the subject follows "in", or else the last "of"
+_FIELD_RES = (re.compile(r"\bin\s+(.+)$", re.IGNORECASE), re.compile(r".*\bof\s+(.+)$", re.IGNORECASE))
+_WORD_RE = re.compile(r"\w+")
+
+
+def degree_field(degree: str) -> str:
+    """
+    Subject of a degree or program name, e.g. "MS in CS" -> "computer science".
+    """
+    match = next((m for m in (r.search(degree) for r in _FIELD_RES) if m), None)
+    field = re.sub(r"\(.*?\)", "", match.group(1) if match else degree).strip().lower()
+    return DEGREE_ALIASES.get(field, field)
+
+
+def canonical_country(country: str) -> str:
+    """
+    Country name as the profile normalizer writes it ("United States" -> "USA"), so
+    catalog rows, profiles and the ranker compare equal. Unknown names are kept as given.
+    """
+    return normalize_country(country or "") or (country or "").strip()
+
+
+def tuition_band(text: str) -> Optional[int]:
+    """
+    Places a tuition or budget string into a band (0 low, 1 medium, 2 high), or None if
+    it cannot be read. Uses the upper end of a range, per year.
+    """
+    lowered = (text or "").lower()
+    for word, band in BUDGET_WORDS.items():
+        if lowered.startswith(word):
+            return band
+    if "free" in lowered or "no tuition" in lowered:
+        return 0
+    amounts = []
+    for number, thousands in _AMOUNT_RE.findall(lowered):
+        try:
+            value = float(number.replace(",", ""))
+        except ValueError:
+            continue
+        amounts.append(value * 1000 if thousands else value)
+    if not amounts:
+        return None
+    rate = next((r for symbol, r in CURRENCY_RATES.items() if symbol in lowered), 1.0)
+    yearly = max(amounts) * rate * (2 if "semester" in lowered else 1)
+    return sum(1 for limit in BAND_LIMITS if yearly > limit)
+
+
+def _terms(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+@dataclass
+class CatalogEntry:
+    program: Program
+    updated_at: float
+    stale: bool
+    score: float = 0.0
+    keywords: str = ""
+
+
+class ProgramCatalog:
+    """
+    Persistent local catalog of programs, seeded from past search results and from
+    CSV/JSON imports.
+
+    Programs are indexed by country, degree field, tuition band and deadline, with an
+    FTS5 full-text index over names, degree fields and keywords (plain LIKE matching
+    when SQLite is built without FTS5). Programs whose deadline has passed are left out of
+    searches, and entries older than stale_after seconds are returned flagged as stale so
+    the caller can refresh them. Countries are stored in canonical form (canonical_country).
+    The a-prefixed methods run the SQLite work in a thread, for use on the event loop.
+    """
+
+    COLUMNS = ("name", "university", "country", "tuition_range", "application_deadline", "eligibility_criteria")
+
+    def __init__(self, path: str = "", stale_after: int = 30 * 24 * 3600):
+        self.stale_after = stale_after
+        self.stats = {"searches": 0, "hits": 0, "upserts": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or cache_path("programs.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS programs (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                university TEXT NOT NULL,
+                country TEXT NOT NULL,
+                degree_field TEXT NOT NULL,
+                tuition_range TEXT,
+                tuition_band INTEGER,
+                application_deadline TEXT,
+                eligibility_criteria TEXT,
+                keywords TEXT,
+                source TEXT,
+                updated_at REAL NOT NULL,
+                UNIQUE (university, name)
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS programs_country_field ON programs (country, degree_field)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS programs_band ON programs (tuition_band)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS programs_deadline ON programs (application_deadline)")
+        self.fts = self._create_fts()
+        self._canonicalize_countries()
+        self._db.commit()
+
+    def _canonicalize_countries(self):
+        # Rows stored before countries were normalized ("United States" next to "USA")
+        for (country,) in self._db.execute("SELECT DISTINCT country FROM programs").fetchall():
+            canonical = canonical_country(country)
+            if canonical != country:
+                self._db.execute("UPDATE programs SET country = ? WHERE country = ?", (canonical, country))
+
+    def _create_fts(self) -> bool:
+        try:
+            self._db.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS programs_fts USING fts5(
+                    name, university, degree_field, keywords, content='programs', content_rowid='id'
+                )
+            """)
+            return True
+        except sqlite3.OperationalError:
+            # SQLite without FTS5: search falls back to LIKE matching
+            return False
+
+    def upsert(self, programs: Iterable[Program], source: str = "llm", keywords: str = "") -> int:
+        """
+        Inserts or refreshes programs, keyed by (university, name). Returns the count stored.
+        """
+        now, count = time.time(), 0
+        with self._lock:
+            for program in programs:
+                if not program.name or not program.university:
+                    continue
+                row = self._db.execute(
+                    "SELECT id, name, university, degree_field, keywords FROM programs WHERE university = ? AND name = ?",
+                    (program.university, program.name)
+                ).fetchone()
+                words = " ".join(filter(None, [row[4] if row else "", keywords, program.eligibility_criteria]))
+                words = " ".join(dict.fromkeys(_terms(words)))
+                values = (canonical_country(program.country), degree_field(program.name), program.tuition_range,
+                          tuition_band(program.tuition_range), program.application_deadline,
+                          program.eligibility_criteria, words, source, now)
+                if row is None:
+                    cursor = self._db.execute(
+                        "INSERT INTO programs (name, university, country, degree_field, tuition_range, tuition_band, "
+                        "application_deadline, eligibility_criteria, keywords, source, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (program.name, program.university) + values
+                    )
+                    rowid = cursor.lastrowid
+                else:
+                    rowid = row[0]
+                    if self.fts:
+                        # External-content FTS tables need the old values to delete an entry
+                        self._db.execute(
+                            "INSERT INTO programs_fts (programs_fts, rowid, name, university, degree_field, keywords) "
+                            "VALUES ('delete', ?, ?, ?, ?, ?)", row
+                        )
+                    self._db.execute(
+                        "UPDATE programs SET country = ?, degree_field = ?, tuition_range = ?, tuition_band = ?, "
+                        "application_deadline = ?, eligibility_criteria = ?, keywords = ?, source = ?, updated_at = ? "
+                        "WHERE id = ?", values + (rowid,)
+                    )
+                if self.fts:
+                    self._db.execute(
+                        "INSERT INTO programs_fts (rowid, name, university, degree_field, keywords) VALUES (?, ?, ?, ?, ?)",
+                        (rowid, program.name, program.university, values[1], words)
+                    )
+                count += 1
+            self._db.commit()
+        self.stats["upserts"] += count
+        return count
+
+    def import_file(self, path: str) -> int:
+        """
+        Imports programs from a CSV file with a header row, or a JSON file holding a list of
+        objects (or {"programs": [...]}). Columns follow Program's fields; an optional
+        "keywords" column adds search terms such as research areas.
+        """
+        with open(path, newline="", encoding="utf-8") as f:
+            if path.lower().endswith(".json"):
+                data = json.load(f)
+                rows = data.get("programs", []) if isinstance(data, dict) else data
+            else:
+                rows = list(csv.DictReader(f))
+        count = 0
+        for row in rows:
+            program = Program(**{column: str(row.get(column) or "") for column in self.COLUMNS})
+            count += self.upsert([program], source=f"import:{os.path.basename(path)}", keywords=str(row.get("keywords") or ""))
+        return count
+
+    def _fts_query(self, field: str, interests: List[str]) -> str:
+        # Quoted phrases only, so user text cannot inject FTS syntax
+        def phrase(text):
+            return '"' + " ".join(_terms(text)) + '"'
+        boost = " OR ".join(phrase(t) for t in [field] + interests if _terms(t))
+        return f"{{name degree_field}} : {phrase(field)} AND ({boost})"
+
+    def search(self, profile: StudentProfile, limit: int = 3, within_budget: bool = True) -> List[CatalogEntry]:
+        """
+        Programs in the student's target countries and degree field (within their budget
+        band unless within_budget is False), best full-text match on their interests first.
+        """
+        field = degree_field(profile.target_degree)
+        if not _terms(field):
+            return []
+        interests = [i for i in profile.interests if _terms(i)]
+        filters, params = ["(p.application_deadline >= ? OR p.application_deadline = '')"], [date.today().isoformat()]
+        if profile.target_countries:
+            filters.append(f"p.country COLLATE NOCASE IN ({', '.join('?' * len(profile.target_countries))})")
+            params.extend(canonical_country(c) for c in profile.target_countries)
+        band = tuition_band(profile.budget) if within_budget else None
+        if band is not None:
+            filters.append("(p.tuition_band IS NULL OR p.tuition_band <= ?)")
+            params.append(band)
+
+        columns = ", ".join(f"p.{c}" for c in self.COLUMNS) + ", p.keywords, p.updated_at"
+        with self._lock:
+            if self.fts:
+                rows = self._db.execute(
+                    f"SELECT {columns}, -bm25(programs_fts) FROM programs_fts JOIN programs p ON p.id = programs_fts.rowid "
+                    f"WHERE programs_fts MATCH ? AND {' AND '.join(filters)} ORDER BY bm25(programs_fts) LIMIT ?",
+                    [self._fts_query(field, interests)] + params + [limit]
+                ).fetchall()
+            else:
+                rows = self._like_search(columns, field, interests, filters, params, limit)
+
+        self.stats["searches"] += 1
+        self.stats["hits"] += len(rows)
+        now = time.time()
+        return [
+            CatalogEntry(program=Program(*row[:len(self.COLUMNS)]), keywords=row[-3] or "", updated_at=row[-2],
+                         stale=now > row[-2] + self.stale_after, score=row[-1])
+            for row in rows
+        ]
+
+    async def aupsert(self, programs: Iterable[Program], source: str = "llm", keywords: str = "") -> int:
+        return await asyncio.to_thread(self.upsert, list(programs), source, keywords)
+
+    async def asearch(self, profile: StudentProfile, limit: int = 3, within_budget: bool = True) -> List[CatalogEntry]:
+        return await asyncio.to_thread(self.search, profile, limit, within_budget)
+
+    def _like_search(self, columns: str, field: str, interests: List[str], filters: List[str],
+                     params: list, limit: int) -> list:
+        pattern = f"%{field}%"
+        score = " + ".join(["2"] + ["(p.keywords LIKE ? OR p.name LIKE ?)" for _ in interests])
+        score_params = [v for i in interests for v in (f"%{i.lower()}%",) * 2]
+        return self._db.execute(
+            f"SELECT {columns}, {score} AS score FROM programs p "
+            f"WHERE (p.degree_field LIKE ? OR p.name LIKE ?) AND {' AND '.join(filters)} "
+            f"ORDER BY score DESC, p.updated_at DESC LIMIT ?",
+            score_params + [pattern, pattern] + params + [limit]
+        ).fetchall()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM programs").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, programs=self.count(), fts=self.fts)
+
+
+_catalog = None
+
+def get_program_catalog() -> ProgramCatalog:
+    """
+    Returns the process-wide program catalog. Entries are refreshed after
+    PROGRAM_CATALOG_STALE_DAYS days (default 30).
+    """
+    global _catalog
+    if _catalog is None:
+        _catalog = ProgramCatalog(stale_after=int(float(os.environ.get("PROGRAM_CATALOG_STALE_DAYS", "30")) * 24 * 3600))
+    return _catalog
+
+
+if __name__ == "__main__":
+    # python -m utils.program_catalog programs.csv [more.json ...]
+    catalog = get_program_catalog()
+    for import_path in sys.argv[1:]:
+        print(f"{import_path}: imported {catalog.import_file(import_path)} programs")
+    print(f"Catalog holds {catalog.count()} programs")
@@ -0,0 +1,163 @@
+import re
+from functools import lru_cache
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from models import Program, StudentProfile
+from utils.program_catalog import canonical_country, tuition_band
+
+FEATURES = ("gpa", "tests", "budget", "country", "interests", "backlogs", "research")
+DEFAULT_WEIGHTS = {"gpa": 0.25, "tests": 0.15, "budget": 0.15, "country": 0.15, "interests": 0.2,
+                   "backlogs": 0.05, "research": 0.05}
+# Tests compared against program minimums, and the margin over the minimum that earns a full score
+TESTS = ("gre", "toefl", "ielts")
+TEST_SPREAD = np.array([10.0, 8.0, 0.5])
+GPA_SPREAD = 0.25
+# Meeting a stated minimum exactly scores MEET_SCORE; programs stating none get UNKNOWN_SCORE
+MEET_SCORE = 0.75
+UNKNOWN_SCORE = 0.7
+MISSING_TEST_SCORE = 0.3
+
+_GPA_RE = re.compile(r"\b(?:c?gpa|grade point average)\D{0,12}?(\d{1,3}(?:\.\d+)?)", re.IGNORECASE)
+_TEST_RES = [re.compile(r"\b%s\D{0,12}?(\d{1,3}(?:\.\d)?)" % test, re.IGNORECASE) for test in TESTS]
+_STRICT_BACKLOG_RE = re.compile(r"\bno (?:active )?backlogs?\b", re.IGNORECASE)
+
+
+def gpa_on_four(value: float) -> float:
+    """Converts a 10-point or percentage GPA to the 4.0 scale."""
+    if value > 10:
+        return value / 100 * 4
+    if value > 4.3:
+        return value / 10 * 4
+    return value
+
+
+def _number(text: str) -> float:
+    match = re.search(r"\d+(?:\.\d+)?", str(text))
+    return float(match.group()) if match else np.nan
+
+
+@lru_cache(maxsize=65536)
+def _parse_program(tuition_range: str, criteria: str) -> Tuple[float, Tuple[float, ...], float, bool]:
+    # Catalog text rarely changes between searches, so parsed values are memoized
+    match = _GPA_RE.search(criteria)
+    min_gpa = gpa_on_four(float(match.group(1))) if match else np.nan
+    tests = []
+    for test_re in _TEST_RES:
+        match = test_re.search(criteria)
+        tests.append(float(match.group(1)) if match else np.nan)
+    band = tuition_band(tuition_range)
+    return min_gpa, tuple(tests), np.nan if band is None else band, bool(_STRICT_BACKLOG_RE.search(criteria))
+
+
+@dataclass
+class ProgramMatch:
+    program: Program
+    score: float
+    breakdown: Dict[str, float] = field(default_factory=dict)
+
+
+class ProgramFeatures:
+    """
+    Profile-independent numeric features for a list of programs, parsed once from their
+    eligibility text, tuition and keywords. Unknown values are NaN.
+    """
+
+    def __init__(self, programs: Sequence[Program], keywords: Optional[Sequence[str]] = None):
+        keywords = keywords or [""] * len(programs)
+        self.programs = list(programs)
+        parsed = [_parse_program(p.tuition_range or "", p.eligibility_criteria or "") for p in self.programs]
+        self.min_gpa = np.array([row[0] for row in parsed], dtype=float)
+        self.min_tests = np.array([row[1] for row in parsed], dtype=float).reshape(len(parsed), len(TESTS))
+        self.band = np.array([row[2] for row in parsed], dtype=float)
+        self.strict_backlogs = np.array([row[3] for row in parsed], dtype=bool)
+        self.countries = np.array([canonical_country(p.country).lower() for p in self.programs], dtype=object)
+        self.text = np.array([f"{p.name} {p.university} {w}".lower() for p, w in zip(self.programs, keywords)], dtype=str)
+        haystack = np.char.add(self.text, np.array([" " + (p.eligibility_criteria or "").lower() for p in self.programs], dtype=str))
+        self.research = (np.char.find(haystack, "research") >= 0) | (np.char.find(haystack, "thesis") >= 0)
+
+
+class ProgramRanker:
+    """
+    Scores programs against a student profile in one vectorized pass.
+
+    Every feature is scored in [0, 1] for all programs at once: GPA and test scores
+    against the program's stated minimums, tuition band against the budget band,
+    country preference (earlier target countries score higher), interest overlap with
+    the program's name and keywords, and backlogs/research papers where the program
+    cares about them. The weighted sum ranks the programs; each match keeps its
+    per-feature breakdown.
+    """
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self._weight_vector = np.array([self.weights[f] for f in FEATURES])
+
+    def score(self, profile: StudentProfile, features: ProgramFeatures) -> np.ndarray:
+        """
+        Returns an (n_programs, n_features) matrix of feature scores.
+        """
+        n = len(features.programs)
+
+        gap = gpa_on_four(profile.gpa) - features.min_gpa
+        gpa = np.where(np.isnan(gap), UNKNOWN_SCORE, np.clip(MEET_SCORE + (1 - MEET_SCORE) * gap / GPA_SPREAD, 0, 1))
+
+        scores = {k.lower(): _number(v) for k, v in (profile.test_scores or {}).items()}
+        student = np.array([scores.get(test, np.nan) for test in TESTS])
+        required = ~np.isnan(features.min_tests)
+        per_test = np.clip(MEET_SCORE + (1 - MEET_SCORE) * (student - features.min_tests) / TEST_SPREAD, 0, 1)
+        # Required but not taken yet counts against the match
+        per_test = np.where(np.isnan(student), MISSING_TEST_SCORE, per_test)
+        counts = required.sum(axis=1)
+        tests = np.where(counts > 0, np.where(required, per_test, 0).sum(axis=1) / np.maximum(counts, 1), UNKNOWN_SCORE)
+
+        budget_band = tuition_band(profile.budget)
+        if budget_band is None:
+            budget = np.full(n, 0.5)
+        else:
+            over = np.maximum(features.band - budget_band, 0)
+            budget = np.where(np.isnan(features.band), 0.5, np.clip(1 - 0.5 * over, 0, 1))
+
+        targets = [canonical_country(c).lower() for c in profile.target_countries]
+        if targets:
+            preference = {c: 1 - 0.1 * i for i, c in reversed(list(enumerate(targets)))}
+            country = np.array([preference.get(c, 0.0) for c in features.countries])
+        else:
+            country = np.ones(n)
+
+        interests = [i.strip().lower() for i in profile.interests if i.strip()]
+        if interests:
+            hits = np.stack([np.char.find(features.text, interest) >= 0 for interest in interests], axis=1)
+            interest = hits.mean(axis=1)
+        else:
+            interest = np.full(n, 0.5)
+
+        backlog_load = min(profile.backlogs, 5) / 5
+        backlogs = 1 - backlog_load * np.where(features.strict_backlogs, 1.0, 0.3)
+
+        papers = min(profile.research_papers, 3) / 3
+        research = np.where(features.research, papers, 0.5 + 0.5 * papers)
+
+        return np.column_stack([gpa, tests, budget, country, interest, backlogs, research])
+
+    def rank(self, profile: StudentProfile, programs: Sequence[Program], k: int = 3,
+             keywords: Optional[Sequence[str]] = None) -> List[ProgramMatch]:
+        """
+        Returns the top k programs, best first, with their scores and breakdowns.
+        """
+        if not programs or k <= 0:
+            return []
+        features = ProgramFeatures(programs, keywords)
+        matrix = self.score(profile, features)
+        totals = matrix @ self._weight_vector / self._weight_vector.sum()
+        k = min(k, len(programs))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind="stable")]
+        return [
+            ProgramMatch(
+                program=features.programs[i],
+                score=round(float(totals[i]), 4),
+                breakdown={name: round(float(value), 3) for name, value in zip(FEATURES, matrix[i])}
+            )
+            for i in top
+        ]
@@ -0,0 +1,158 @@
+import os
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+from typing import Dict, Any
+
+# Lower value = served first
+PRIORITY_INTERACTIVE = 0   # a user is waiting on this single call (e.g. resume parsing)
+PRIORITY_PIPELINE = 1      # plan generation steps
+PRIORITY_BATCH = 2         # offline / bulk work
+
+
+class RateLimiter:
+    """
+    Process-wide scheduler for Gemini calls.
+
+    Keeps two token buckets (requests per minute and tokens per minute) and a priority
+    queue of waiting callers. Only the highest-priority waiter may take budget, so
+    interactive calls overtake queued pipeline work. When the API answers 429/503 the
+    whole limiter is paused (honouring Retry-After) instead of every caller retrying
+    on its own. Async callers wait with asyncio.sleep, so an exhausted budget queues
+    work without blocking the event loop.
+    """
+
+    POLL_INTERVAL = 0.05
+    MAX_SLEEP = 1.0
+
+    def __init__(self, requests_per_minute: int = 10, tokens_per_minute: int = 250000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"granted": 0, "waited": 0, "wait_seconds": 0.0, "pauses": 0, "cancelled": 0}
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60.0)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60.0)
+
+    def _enqueue(self, priority: int):
+        ticket = (priority, next(self._seq))
+        with self._lock:
+            heapq.heappush(self._waiters, ticket)
+        return ticket
+
+    def _dequeue(self, ticket):
+        with self._lock:
+            if ticket in self._waiters:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+
+    def _try_acquire(self, ticket, tokens: int) -> float:
+        """
+        Takes budget for ticket if it is at the head of the queue.
+        Returns 0 when granted, otherwise roughly how long to wait before trying again.
+        """
+        tokens = min(tokens, self.tokens_per_minute)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._waiters[0] != ticket:
+                return self.POLL_INTERVAL
+            if self._requests >= 1 and self._tokens >= tokens:
+                self._requests -= 1
+                self._tokens -= tokens
+                heapq.heappop(self._waiters)
+                self.stats["granted"] += 1
+                return 0.0
+            request_wait = (1 - self._requests) * 60.0 / self.requests_per_minute if self._requests < 1 else 0.0
+            token_wait = (tokens - self._tokens) * 60.0 / self.tokens_per_minute if self._tokens < tokens else 0.0
+            return max(request_wait, token_wait, self.POLL_INTERVAL)
+
+    async def acquire(self, tokens: int, priority: int = PRIORITY_PIPELINE):
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(min(wait, self.MAX_SLEEP))
+        except asyncio.CancelledError:
+            self._dequeue(ticket)
+            self.stats["cancelled"] += 1
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    def acquire_sync(self, tokens: int, priority: int = PRIORITY_PIPELINE):
+        ticket = self._enqueue(priority)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._try_acquire(ticket, tokens)
+                if wait <= 0:
+                    break
+                time.sleep(min(wait, self.MAX_SLEEP))
+        except BaseException:
+            self._dequeue(ticket)
+            raise
+        self._record_wait(time.monotonic() - started)
+
+    def _record_wait(self, waited: float):
+        if waited >= self.POLL_INTERVAL:
+            with self._lock:
+                self.stats["waited"] += 1
+                self.stats["wait_seconds"] += waited
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int):
+        """
+        Corrects the token bucket once the real usage of a call is known.
+        """
+        with self._lock:
+            self._tokens -= actual_tokens - min(estimated_tokens, self.tokens_per_minute)
+
+    def pause(self, seconds: float):
+        """
+        Stops granting budget to everyone for the given time (e.g. after a 429 with Retry-After).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.stats["pauses"] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill(time.monotonic())
+            stats = dict(self.stats)
+            stats["queued"] = len(self._waiters)
+            stats["requests_available"] = round(self._requests, 2)
+            stats["tokens_available"] = int(self._tokens)
+            stats["paused_for"] = round(max(0.0, self._paused_until - time.monotonic()), 2)
+        stats["wait_seconds"] = round(stats["wait_seconds"], 2)
+        return stats
+
+
+_rate_limiter = None
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide Gemini rate limiter. Budgets default to the
+    gemini-2.5-flash free tier and can be raised with GEMINI_RPM / GEMINI_TPM.
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter(
+            requests_per_minute=int(os.environ.get("GEMINI_RPM", "10")),
+            tokens_per_minute=int(os.environ.get("GEMINI_TPM", "250000"))
+        )
+    return _rate_limiter
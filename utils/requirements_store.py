@@ -0,0 +1,169 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+from models import ProgramRequirements
+from utils.cache import cache_path
+
+SEASONS = {"fall": "fall", "autumn": "fall", "winter": "winter", "spring": "spring", "summer": "summer"}
+_YEAR_RE = re.compile(r"\b(20\d{2})\b")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", (text or "").lower()).split())
+
+
+def intake_cycle(intake: str) -> str:
+    """
+    Normalizes an intake to its admission cycle, e.g. "Winter Semester 2025/26" -> "winter 2025".
+    """
+    words = _normalize(intake).split()
+    season = next((SEASONS[w] for w in words if w in SEASONS), "")
+    year = _YEAR_RE.search(intake or "")
+    if not season and not year:
+        return " ".join(words)
+    return " ".join(filter(None, [season, year.group(1) if year else ""]))
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class StoredRequirements:
+    requirements: ProgramRequirements
+    source_url: Optional[str]
+    content_hash: str
+    parsed_at: float
+    checked_at: float
+    fresh: bool
+
+
+class RequirementsStore:
+    """
+    Parsed program requirements shared across students, keyed by normalized
+    (university, program, intake cycle).
+
+    Each entry records the source URL and a hash of the page text it was parsed from.
+    Within ttl seconds of the last check an entry is fresh and can be used without
+    fetching; after that the page is fetched again and only re-parsed if its hash changed.
+    The a-prefixed methods run the SQLite work (and its commit) in a thread, for use on
+    the event loop.
+    """
+
+    def __init__(self, path: str = "", ttl: int = 14 * 24 * 3600):
+        self.ttl = ttl
+        self.stats = {"fresh_hits": 0, "unchanged": 0, "stored": 0, "stale_kept": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path or cache_path("requirements.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS requirements (
+                key TEXT PRIMARY KEY,
+                university TEXT NOT NULL,
+                program TEXT NOT NULL,
+                intake TEXT NOT NULL,
+                requirements TEXT NOT NULL,
+                source_url TEXT,
+                content_hash TEXT NOT NULL,
+                parsed_at REAL NOT NULL,
+                checked_at REAL NOT NULL
+            )
+        """)
+        self._db.commit()
+
+    def key(self, university: str, program: str, intake: str) -> str:
+        return "|".join((_normalize(university), _normalize(program), intake_cycle(intake)))
+
+    def get(self, university: str, program: str, intake: str) -> Optional[StoredRequirements]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT requirements, source_url, content_hash, parsed_at, checked_at FROM requirements WHERE key = ?",
+                (self.key(university, program, intake),)
+            ).fetchone()
+        if row is None:
+            self.stats["misses"] += 1
+            return None
+        entry = StoredRequirements(
+            requirements=ProgramRequirements(**json.loads(row[0])),
+            source_url=row[1],
+            content_hash=row[2],
+            parsed_at=row[3],
+            checked_at=row[4],
+            fresh=time.time() < row[4] + self.ttl
+        )
+        if entry.fresh:
+            self.stats["fresh_hits"] += 1
+        return entry
+
+    def put(self, university: str, program: str, intake: str, requirements: ProgramRequirements,
+            source_url: Optional[str], page_hash: str):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO requirements (key, university, program, intake, requirements, source_url, "
+                "content_hash, parsed_at, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.key(university, program, intake), university, program, intake_cycle(intake),
+                 json.dumps(asdict(requirements)), source_url, page_hash, now, now)
+            )
+            self._db.commit()
+        self.stats["stored"] += 1
+
+    def _touch(self, university: str, program: str, intake: str):
+        with self._lock:
+            self._db.execute(
+                "UPDATE requirements SET checked_at = ? WHERE key = ?",
+                (time.time(), self.key(university, program, intake))
+            )
+            self._db.commit()
+
+    def mark_unchanged(self, university: str, program: str, intake: str):
+        """
+        Records that the source page was fetched again with the same content hash.
+        """
+        self._touch(university, program, intake)
+        self.stats["unchanged"] += 1
+
+    def mark_unverified(self, university: str, program: str, intake: str):
+        """
+        Records a re-check that could not get a usable page (fetch fell back to simulated
+        text, or the parse failed). The stored entry keeps being served for another ttl
+        rather than being replaced.
+        """
+        self._touch(university, program, intake)
+        self.stats["stale_kept"] += 1
+
+    async def aget(self, university: str, program: str, intake: str) -> Optional[StoredRequirements]:
+        return await asyncio.to_thread(self.get, university, program, intake)
+
+    async def aput(self, university: str, program: str, intake: str, requirements: ProgramRequirements,
+                   source_url: Optional[str], page_hash: str):
+        await asyncio.to_thread(self.put, university, program, intake, requirements, source_url, page_hash)
+
+    async def amark_unchanged(self, university: str, program: str, intake: str):
+        await asyncio.to_thread(self.mark_unchanged, university, program, intake)
+
+    async def amark_unverified(self, university: str, program: str, intake: str):
+        await asyncio.to_thread(self.mark_unverified, university, program, intake)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+_requirements_store = None
+
+def get_requirements_store() -> RequirementsStore:
+    """
+    Returns the process-wide requirements store. Entries are trusted without re-fetching
+    for REQUIREMENTS_STORE_TTL seconds (default 14 days).
+    """
+    global _requirements_store
+    if _requirements_store is None:
+        _requirements_store = RequirementsStore(ttl=int(os.environ.get("REQUIREMENTS_STORE_TTL", str(14 * 24 * 3600))))
+    return _requirements_store
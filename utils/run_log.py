@@ -0,0 +1,203 @@
+import os
+import json
+import uuid
+import asyncio
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from utils.cache import TieredCache
+
+# (event type, JSON payload) as sent to the client
+LoggedEvent = Tuple[str, str]
+
+
+def _encode(obj: Any):
+    # Pydantic models and anything else the orchestrator may put in an event
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return str(obj)
+
+
+class RunLog:
+    """
+    Append-only event log of one plan run. Events are numbered from 0 in the order
+    they were produced; followers replay the ones they missed and then wait for new ones.
+    """
+
+    def __init__(self, run_id: str, events: Optional[List[LoggedEvent]] = None, done: bool = False):
+        self.run_id = run_id
+        self.events = [tuple(e) for e in events] if events else []
+        self.done = done
+        # Connections currently following the run; on_follow is called when one
+        # subscribes, on_idle when the last one leaves
+        self.subscribers = 0
+        self.on_follow: Optional[Callable[["RunLog"], None]] = None
+        self.on_idle: Optional[Callable[["RunLog"], None]] = None
+        self._changed = asyncio.Condition()
+
+    async def append(self, event: Dict[str, Any]):
+        async with self._changed:
+            self.events.append((event.get("type", ""), json.dumps(event, default=_encode)))
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self._changed.notify_all()
+
+    async def follow(self, after: int = -1) -> AsyncGenerator[Tuple[int, LoggedEvent], None]:
+        """
+        Yields (sequence number, event) for every event after `after`, live ones
+        included, until the run is finished.
+        """
+        seq = max(after + 1, 0)
+        self.subscribers += 1
+        if self.on_follow is not None:
+            self.on_follow(self)
+        try:
+            while True:
+                while seq < len(self.events):
+                    yield seq, self.events[seq]
+                    seq += 1
+                if self.done:
+                    return
+                async with self._changed:
+                    await self._changed.wait_for(lambda: seq < len(self.events) or self.done)
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done and self.on_idle is not None:
+                self.on_idle(self)
+
+
+class RunRegistry:
+    """
+    Runs plans independently of the connection that started them, so a client that
+    drops can reconnect and pick up where it left off without re-running any agent.
+
+    Live runs are kept in memory; once finished, a run's log is moved to a TieredCache
+    for `ttl` seconds so reconnects can still replay it (including after a restart).
+
+    A run nobody follows for `abandon_after` seconds (the client closed the tab and
+    did not reconnect) is cancelled: the cancellation propagates into the orchestrator,
+    so its pending Gemini calls, searches and page fetches are dropped. A negative
+    value lets abandoned runs finish.
+    """
+
+    def __init__(self, cache: Optional[TieredCache] = None, ttl: int = 3600, abandon_after: float = 15.0):
+        self.cache = cache if cache is not None else TieredCache(namespace="runs", memory_size=64)
+        self.ttl = ttl
+        self.abandon_after = abandon_after
+        self._live: Dict[str, RunLog] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # At most one pending abandon check per run, so an old one can't fire after a reconnect
+        self._abandon_timers: Dict[str, asyncio.TimerHandle] = {}
+        self.stats = {"started": 0, "completed": 0, "failed": 0, "cancelled": 0, "reconnects": 0, "unknown": 0}
+
+    def start(self, events: AsyncIterator[Dict[str, Any]]) -> RunLog:
+        """
+        Starts consuming an event stream (e.g. Orchestrator.arun()) in the background
+        and returns its log.
+        """
+        run = RunLog(uuid.uuid4().hex)
+        run.on_follow = self._keep_alive
+        run.on_idle = self._schedule_abandon
+        self._live[run.run_id] = run
+        self.stats["started"] += 1
+        # Keep a reference so the task isn't garbage collected mid-run
+        self._tasks[run.run_id] = asyncio.ensure_future(self._drive(run, events))
+        # Also covers a client that goes away before its stream starts
+        self._schedule_abandon(run)
+        return run
+
+    async def _drive(self, run: RunLog, events: AsyncIterator[Dict[str, Any]]):
+        try:
+            async for event in events:
+                await run.append(event)
+            self.stats["completed"] += 1
+        except asyncio.CancelledError:
+            self.stats["cancelled"] += 1
+            await run.append({"type": "error", "message": "Run cancelled before it finished"})
+            raise
+        except Exception as e:
+            print(f"Run {run.run_id} failed: {e}")
+            self.stats["failed"] += 1
+            await run.append({"type": "error", "message": str(e)})
+        finally:
+            await run.finish()
+            if self.ttl > 0:
+                self.cache.set(run.run_id, run.events, ttl=self.ttl)
+            self._keep_alive(run)
+            self._live.pop(run.run_id, None)
+            self._tasks.pop(run.run_id, None)
+
+    def _keep_alive(self, run: RunLog):
+        timer = self._abandon_timers.pop(run.run_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def _schedule_abandon(self, run: RunLog):
+        self._keep_alive(run)
+        if self.abandon_after >= 0:
+            self._abandon_timers[run.run_id] = asyncio.get_running_loop().call_later(
+                self.abandon_after, self._cancel_if_abandoned, run)
+
+    def _cancel_if_abandoned(self, run: RunLog):
+        self._abandon_timers.pop(run.run_id, None)
+        # A reconnect during the grace period cancels this check; the test below is a safeguard
+        task = self._tasks.get(run.run_id)
+        if task is not None and run.subscribers == 0 and not run.done:
+            task.cancel()
+
+    async def aclose(self):
+        """
+        Cancels the runs still in progress (server shutdown).
+        """
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get(self, run_id: str) -> Optional[RunLog]:
+        """
+        Returns the live or finished run with this id, or None if it is unknown or expired.
+        """
+        run = self._live.get(run_id)
+        if run is None:
+            events = self.cache.get(run_id)
+            if events is None:
+                self.stats["unknown"] += 1
+                return None
+            run = RunLog(run_id, events, done=True)
+        self.stats["reconnects"] += 1
+        return run
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, live=len(self._live))
+
+
+def parse_event_id(event_id: Optional[str]) -> Tuple[Optional[str], int]:
+    """
+    Splits a "<run id>:<sequence>" SSE event id. Returns (None, -1) for missing or
+    malformed ids.
+    """
+    run_id, _, seq = (event_id or "").strip().rpartition(":")
+    if not run_id or not seq.isdigit():
+        return None, -1
+    return run_id, int(seq)
+
+
+_run_registry = None
+
+def get_run_registry() -> RunRegistry:
+    """
+    Returns the process-wide run registry. RUN_LOG_TTL sets how many seconds a
+    finished run can still be replayed (0 keeps only live runs), RUN_ABANDON_AFTER how
+    long a run may go without a client before it is cancelled.
+    """
+    global _run_registry
+    if _run_registry is None:
+        _run_registry = RunRegistry(
+            ttl=int(os.environ.get("RUN_LOG_TTL", "3600")),
+            abandon_after=float(os.environ.get("RUN_ABANDON_AFTER", "15"))
+        )
+    return _run_registry
@@ -0,0 +1,86 @@
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into one in-flight operation.
+
+    The first caller for a key starts the work; callers arriving while it runs await
+    the same result instead of repeating the network call. The shared work runs in its
+    own task, so one caller being cancelled does not cancel it for the others; it is
+    only cancelled once every caller waiting on it has gone away.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._async_calls = {}
+        self._sync_calls = {}
+        self.stats = {"calls": 0, "coalesced": 0, "cancelled": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._async_calls.get(call_key)
+            if call is None:
+                call = {"task": loop.create_task(fn()), "waiters": 0}
+                self._async_calls[call_key] = call
+                call["task"].add_done_callback(lambda _task: self._forget(self._async_calls, call_key, call))
+            else:
+                self.stats["coalesced"] += 1
+            call["waiters"] += 1
+
+        try:
+            return await asyncio.shield(call["task"])
+        except asyncio.CancelledError:
+            with self._lock:
+                call["waiters"] -= 1
+                if call["waiters"] == 0 and not call["task"].done():
+                    self.stats["cancelled"] += 1
+                    # Unregister in the same step, so a caller arriving now starts a fresh
+                    # call instead of joining one that is being cancelled
+                    if self._async_calls.get(call_key) is call:
+                        del self._async_calls[call_key]
+                    call["task"].cancel()
+            raise
+
+    def do_sync(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            self.stats["calls"] += 1
+            call = self._sync_calls.get(key)
+            leader = call is None
+            if leader:
+                call = {"done": threading.Event(), "result": None, "error": None}
+                self._sync_calls[key] = call
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            call["done"].wait()
+            if call["error"] is not None:
+                raise call["error"]
+            return call["result"]
+
+        try:
+            call["result"] = fn()
+            return call["result"]
+        except BaseException as e:
+            call["error"] = e
+            raise
+        finally:
+            self._forget(self._sync_calls, key, call)
+            call["done"].set()
+
+    def _forget(self, calls: Dict, key, call):
+        with self._lock:
+            if calls.get(key) is call:
+                del calls[key]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._async_calls) + len(self._sync_calls)
+        return stats
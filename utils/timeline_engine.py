@@ -0,0 +1,241 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+from models import StudentProfile, ProgramRequirements, Task
+
+# Test name -> (preparation days, score delivery days after the test)
+TEST_LEAD_TIMES = {
+    "GRE": (42, 14),
+    "GMAT": (42, 14),
+    "TOEFL": (28, 10),
+    "IELTS": (28, 13),
+    "PTE": (21, 5),
+    "Duolingo": (14, 3),
+}
+
+TEST_ALIASES = {
+    "GRE": ("gre",),
+    "GMAT": ("gmat",),
+    "TOEFL": ("toefl",),
+    "IELTS": ("ielts",),
+    "PTE": ("pte",),
+    "Duolingo": ("duolingo", "det"),
+}
+
+# Wording that makes a test optional or conditional: such tests are noted, not scheduled
+CONDITIONAL_WORDS = re.compile(r"\b(may|might|optional|recommended|waiv\w*|depend\w*|if applicable|encouraged|not required)\b", re.IGNORECASE)
+# "TOEFL iBT 88 or IELTS 6.5", "GRE/GMAT": any one of the tests is enough
+ALTERNATIVES_RE = re.compile(r"\bor\b|/", re.IGNORECASE)
+
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+
+# Documents handled by dedicated tasks; anything else gets a generic "Prepare ..." task
+KNOWN_DOCUMENTS = ("transcript", "statement of purpose", "sop", "motivation", "recommendation", "lor",
+                   "reference", "cv", "resume", "résumé", "test", "score", "degree certificate", "passport")
+
+
+@dataclass
+class TaskSpec:
+    """One node of the application task graph."""
+    key: str
+    title: str
+    description: str
+    duration_days: int
+    depends_on: List[str] = field(default_factory=list)
+
+
+def find_tests(texts: List[str]) -> List[str]:
+    """Returns canonical test names mentioned anywhere in texts."""
+    found = []
+    for name, aliases in TEST_ALIASES.items():
+        for text in texts:
+            if any(re.search(r"\b%s\b" % alias, text, re.IGNORECASE) for alias in aliases):
+                found.append(name)
+                break
+    return found
+
+
+def test_options(requirement: str) -> Tuple[List[str], bool]:
+    """
+    Returns the tests a requirement mentions, in the order they appear, and whether
+    any one of them is enough ("TOEFL iBT 88 or IELTS 6.5") rather than all of them.
+    """
+    positions = {}
+    for name, aliases in TEST_ALIASES.items():
+        for alias in aliases:
+            match = re.search(r"\b%s\b" % alias, requirement, re.IGNORECASE)
+            if match:
+                positions[name] = min(match.start(), positions.get(name, match.start()))
+    tests = sorted(positions, key=positions.get)
+    return tests, len(tests) > 1 and bool(ALTERNATIVES_RE.search(requirement))
+
+
+def select_tests(requirements: List[str], scores: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """
+    Decides which tests to schedule. Returns (tests to plan for, optional or conditional
+    tests to mention only). Of alternatives, a test the student already has a score for
+    is preferred, else the first one named; a choice already covered by a required test
+    adds nothing.
+    """
+    required, optional, choices = [], [], []
+    for requirement in requirements:
+        tests, alternatives = test_options(requirement)
+        if not tests:
+            continue
+        if CONDITIONAL_WORDS.search(requirement):
+            optional.extend(tests)
+        elif alternatives:
+            choices.append(tests)
+        else:
+            required.extend(tests)
+    for tests in choices:
+        if any(test in required for test in tests):
+            continue
+        taken = [test for test in tests if test.upper() in scores]
+        required.append((taken or tests)[0])
+    required = list(dict.fromkeys(required))
+    return required, [test for test in dict.fromkeys(optional) if test not in required]
+
+
+def count_recommendations(documents: List[str]) -> int:
+    """Returns the number of recommendation letters asked for (0 if none are mentioned)."""
+    for doc in documents:
+        lowered = doc.lower()
+        if not re.search(r"recommendation|\blors?\b|reference", lowered):
+            continue
+        match = re.search(r"\b(\d|one|two|three|four|five)\b", lowered)
+        if match:
+            value = match.group(1)
+            return int(value) if value.isdigit() else NUMBER_WORDS[value]
+        return 2
+    return 0
+
+
+def build_task_graph(profile: StudentProfile, requirements: ProgramRequirements) -> Dict[str, TaskSpec]:
+    """
+    Builds the dependency graph of application tasks from the parsed requirements
+    and what the student already has (e.g. test scores).
+    """
+    documents = requirements.required_documents or []
+    notes = requirements.special_notes or ""
+    scores = {k.upper(): v for k, v in (profile.test_scores or {}).items() if v}
+    requirements_unclear = not documents or bool(re.search(r"verify|check|confirm|unclear|official website", notes, re.IGNORECASE))
+
+    tasks: Dict[str, TaskSpec] = {}
+
+    def add(key, title, description, duration_days, depends_on=None):
+        tasks[key] = TaskSpec(key, title, description, duration_days, [d for d in (depends_on or []) if d in tasks])
+
+    if requirements_unclear:
+        add("verify", "Verify requirements on the official website",
+            "Confirm the document list, test requirements and deadline directly with the university before starting.", 3)
+
+    start = ["verify"]
+    add("transcripts", "Obtain transcripts and certificates",
+        "Request official transcripts and degree certificates from your university; this often takes 2-3 weeks.", 21, start)
+    add("cv", "Prepare CV/Resume",
+        "Update your CV with education, projects, work experience and publications.", 10, start)
+    add("sop_draft", "Draft Statement of Purpose",
+        "Write a first draft covering your background, research interests and why this program fits.", 14, start + ["cv"])
+    add("sop_final", "Finalize Statement of Purpose",
+        "Get feedback from mentors or peers and polish the final version.", 10, ["sop_draft"])
+
+    final_inputs = ["transcripts", "sop_final"]
+
+    lor_count = count_recommendations(documents) if documents else 2
+    if lor_count:
+        add("lor_request", f"Request {lor_count} Letters of Recommendation",
+            "Ask your recommenders and share your CV, transcript and draft SOP so they can write specific letters.", 3, ["cv"])
+        add("lor_receive", "Receive Letters of Recommendation",
+            "Follow up politely with recommenders; letters usually take 4-6 weeks from request to submission.", 35, ["lor_request"])
+        final_inputs.append("lor_receive")
+
+    required_tests, optional_tests = select_tests(requirements.test_requirements or [], scores)
+    if not requirements.test_requirements:
+        # Nothing stated: plan around the tests the student has already taken
+        required_tests = find_tests(list(scores.keys()))
+    for test in required_tests:
+        prep_days, delivery_days = TEST_LEAD_TIMES[test]
+        slug = test.lower()
+        if test.upper() not in scores:
+            add(f"{slug}_prep", f"Prepare for {test}",
+                f"Study for the {test} and book a test date early; slots fill up before application season.", prep_days, start)
+            add(f"{slug}_take", f"Take {test}", f"Sit the {test} exam.", 1, [f"{slug}_prep"])
+            depends = [f"{slug}_take"]
+        else:
+            depends = start
+        add(f"{slug}_scores", f"Send official {test} scores",
+            f"Send official {test} scores to the university; delivery takes about {delivery_days} days.", delivery_days, depends)
+        final_inputs.append(f"{slug}_scores")
+
+    for i, doc in enumerate(documents):
+        if any(word in doc.lower() for word in KNOWN_DOCUMENTS):
+            continue
+        add(f"doc_{i}", f"Prepare {doc}", f"Prepare the {doc} required by the program.", 7, start)
+        final_inputs.append(f"doc_{i}")
+
+    application = "Fill in the online application form and upload your documents."
+    if optional_tests:
+        application += (f" The program lists {', '.join(optional_tests)} as optional or conditional; "
+                        f"check whether sending those scores would help your application.")
+    add("application", "Complete online application", application, 7, ["transcripts", "cv"])
+    final_inputs.append("application")
+    add("submit", "Final review and submission",
+        "Review everything once more and submit a few days before the deadline.", 1, final_inputs)
+    return tasks
+
+
+def _topological_order(tasks: Dict[str, TaskSpec]) -> List[str]:
+    order, seen = [], set()
+
+    def visit(key):
+        if key in seen:
+            return
+        seen.add(key)
+        for dep in tasks[key].depends_on:
+            visit(dep)
+        order.append(key)
+
+    for key in tasks:
+        visit(key)
+    return order
+
+
+def schedule(tasks: Dict[str, TaskSpec], today: date, deadline: date, buffer_days: int = 3,
+             max_stretch: float = 2.0) -> List[Task]:
+    """
+    Critical-path planning anchored on the deadline.
+
+    An earliest-finish forward pass over the dependency graph gives every task its
+    finish offset and the length of the critical path. The offsets are then shifted so
+    the critical path ends at (deadline - buffer_days), which places the plan relative
+    to the deadline without a separate backward (latest-finish) pass:
+    if there is spare time, durations are stretched by up to max_stretch and the plan starts
+    later; if there is not enough time, durations are compressed to fit. Every task keeps
+    its place relative to its dependencies and non-critical tasks keep their slack, so
+    they don't all pile up right before the deadline.
+    """
+    order = _topological_order(tasks)
+
+    earliest_finish: Dict[str, int] = {}
+    for key in order:
+        start = max([earliest_finish[d] for d in tasks[key].depends_on], default=0)
+        earliest_finish[key] = start + tasks[key].duration_days
+    critical_path = max(earliest_finish.values(), default=0)
+
+    target = max((deadline - today).days - buffer_days, 0)
+    stretch = min(target / critical_path, max_stretch) if critical_path else 1.0
+    offset = target - critical_path * stretch
+
+    scheduled = []
+    for position, key in enumerate(order):
+        spec = tasks[key]
+        day = offset + earliest_finish[key] * stretch
+        due = min(today + timedelta(days=int(round(day))), deadline)
+        dependency = tasks[spec.depends_on[-1]].title if spec.depends_on else None
+        task = Task(title=spec.title, description=spec.description, due_date=due.isoformat(), dependency=dependency)
+        scheduled.append((due, position, task))
+
+    scheduled.sort(key=lambda item: (item[0], item[1]))
+    return [task for _, _, task in scheduled]
@@ -0,0 +1,191 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Callable, List, Optional
+from models import ProgramRequirements, Task
+from utils.timeline_engine import CONDITIONAL_WORDS, test_options
+
+
+@dataclass
+class RuleFinding:
+    """
+    A warning produced by a validation rule. Ambiguous findings are the ones a
+    fixed rule can't settle on its own; they are passed to Gemini for a second look,
+    and their warning text is used as-is if that isn't possible.
+    """
+    warning: str
+    ambiguous: bool = False
+    detail: str = ""
+
+
+@dataclass
+class ValidationContext:
+    tasks: List[Task]
+    requirements: ProgramRequirements
+    deadline: Optional[date] = None
+    today: date = field(default_factory=date.today)
+
+    def due(self, task: Task) -> Optional[date]:
+        try:
+            return datetime.strptime(task.due_date, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return None
+
+    def task_text(self) -> str:
+        return " ".join(f"{t.title} {t.description}" for t in self.tasks).lower()
+
+
+Rule = Callable[[ValidationContext], List[RuleFinding]]
+
+# Requirement keyword -> words that show a task covers it
+DOCUMENT_KEYWORDS = {
+    "transcript": ("transcript",),
+    "statement of purpose": ("statement of purpose", "sop"),
+    "sop": ("statement of purpose", "sop"),
+    "motivation": ("statement of purpose", "motivation"),
+    "recommendation": ("recommendation", "lor"),
+    "lor": ("recommendation", "lor"),
+    "reference": ("recommendation", "reference"),
+    "cv": ("cv", "resume"),
+    "resume": ("cv", "resume"),
+}
+
+SPECIAL_ITEMS = ("interview", "portfolio", "writing sample", "aptitude test", "video", "essay", "aps")
+
+
+def tasks_after_deadline(ctx: ValidationContext) -> List[RuleFinding]:
+    if ctx.deadline is None:
+        return []
+    late = [t for t in ctx.tasks if ctx.due(t) and ctx.due(t) > ctx.deadline]
+    if not late:
+        return []
+    return [RuleFinding(f"⏰ Heads up! {len(late)} task(s) are scheduled after the {ctx.deadline.isoformat()} deadline. Make sure everything is done before then.")]
+
+
+def tasks_in_past(ctx: ValidationContext) -> List[RuleFinding]:
+    past = [t for t in ctx.tasks if ctx.due(t) and ctx.due(t) < ctx.today]
+    if not past:
+        return []
+    return [RuleFinding(f"⏰ {len(past)} task(s) have dates that already passed. Tackle them first and adjust the rest of your plan.")]
+
+
+def bunched_tasks(ctx: ValidationContext, window_days: int = 3, limit: int = 4) -> List[RuleFinding]:
+    dates = sorted(d for d in (ctx.due(t) for t in ctx.tasks) if d)
+    for i in range(len(dates)):
+        j = i
+        while j + 1 < len(dates) and dates[j + 1] - dates[i] <= timedelta(days=window_days):
+            j += 1
+        if j - i + 1 >= limit:
+            return [RuleFinding(
+                f"⚠️ {j - i + 1} tasks are due between {dates[i].isoformat()} and {dates[j].isoformat()}. "
+                f"Consider starting some of them earlier so that week doesn't get too busy."
+            )]
+    return []
+
+
+def lor_lead_time(ctx: ValidationContext, min_days: int = 21) -> List[RuleFinding]:
+    request = next((t for t in ctx.tasks if "request" in t.title.lower() and re.search(r"recommendation|\blor", t.title.lower())), None)
+    if request is None or ctx.due(request) is None:
+        return []
+    end = ctx.deadline
+    submit = next((t for t in ctx.tasks if "submi" in t.title.lower()), None)
+    if submit is not None and ctx.due(submit):
+        end = ctx.due(submit)
+    if end is None:
+        return []
+    lead = (end - ctx.due(request)).days
+    if lead < min_days:
+        return [RuleFinding(
+            f"⚠️ Getting recommendation letters usually takes 3-4 weeks, but your plan leaves only {max(lead, 0)} days. "
+            f"Consider requesting them earlier."
+        )]
+    return []
+
+
+def requirements_unclear(ctx: ValidationContext) -> List[RuleFinding]:
+    documents = ctx.requirements.required_documents or []
+    if any("error parsing" in d.lower() for d in documents):
+        return [RuleFinding("📋 We couldn't read this program's requirements automatically. Please check the university's official website for the full list.")]
+    if not documents:
+        return [RuleFinding("📋 We couldn't find specific document requirements online. Your first step should be to verify everything on the university's official website!")]
+    return []
+
+
+def missing_documents(ctx: ValidationContext) -> List[RuleFinding]:
+    text = ctx.task_text()
+    findings = []
+    for doc in ctx.requirements.required_documents or []:
+        lowered = doc.lower()
+        if "error parsing" in lowered:
+            continue
+        matched = [words for key, words in DOCUMENT_KEYWORDS.items() if key in lowered]
+        if matched:
+            if not any(word in text for words in matched for word in words):
+                findings.append(RuleFinding(f"📝 Your timeline doesn't include a step for the {doc}. Add time to prepare it."))
+        elif lowered not in text:
+            # A document we have no rule for: let the model judge whether a task covers it
+            findings.append(RuleFinding(
+                f"📝 Double-check that your plan covers the {doc} the program asks for.",
+                ambiguous=True,
+                detail=f"Required document '{doc}' has no obviously matching task"
+            ))
+    return findings
+
+
+def missing_tests(ctx: ValidationContext) -> List[RuleFinding]:
+    text = ctx.task_text()
+    findings = []
+    for requirement in ctx.requirements.test_requirements or []:
+        tests, alternatives = test_options(requirement)
+        if CONDITIONAL_WORDS.search(requirement):
+            findings.append(RuleFinding(
+                f"📝 The program's wording on \"{requirement}\" is not definite. Confirm whether you need it.",
+                ambiguous=True,
+                detail=f"Test requirement with conditional wording: '{requirement}'"
+            ))
+        elif not tests:
+            findings.append(RuleFinding(
+                f"📝 Make sure your plan covers \"{requirement}\".",
+                ambiguous=True,
+                detail=f"Unrecognised test requirement: '{requirement}'"
+            ))
+        elif alternatives:
+            if not any(test.lower() in text for test in tests):
+                findings.append(RuleFinding(f"📝 The program asks for one of {' / '.join(tests)}, but your timeline has none of them. Plan time to take one or send your scores."))
+        else:
+            for test in tests:
+                if test.lower() not in text:
+                    findings.append(RuleFinding(f"📝 {test} is required but your timeline has no {test} task. Plan time to take it or send your scores."))
+    return findings
+
+
+def special_notes(ctx: ValidationContext) -> List[RuleFinding]:
+    notes = (ctx.requirements.special_notes or "").lower()
+    text = ctx.task_text()
+    uncovered = [item for item in SPECIAL_ITEMS if re.search(r"\b%s\b" % item, notes) and item not in text]
+    if not uncovered:
+        return []
+    return [RuleFinding(
+        f"💡 The program mentions {', '.join(uncovered)}. Check if you need to prepare for it.",
+        ambiguous=True,
+        detail=f"Special notes mention {', '.join(uncovered)}: '{ctx.requirements.special_notes}'"
+    )]
+
+
+DEFAULT_RULES: List[Rule] = [
+    requirements_unclear,
+    tasks_after_deadline,
+    tasks_in_past,
+    bunched_tasks,
+    lor_lead_time,
+    missing_documents,
+    missing_tests,
+    special_notes,
+]
+
+
+def run_rules(ctx: ValidationContext, rules: List[Rule] = None) -> List[RuleFinding]:
+    findings = []
+    for rule in rules if rules is not None else DEFAULT_RULES:
+        findings.extend(rule(ctx))
+    return findings